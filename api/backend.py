@@ -0,0 +1,160 @@
+# coding=utf-8
+import os
+
+from api.comExecutor import ComExecutor, ComProxy
+
+
+# Creon COM 객체를 만들어주는 backend 의 기본 클래스
+class CreonBackend:
+    """
+    CpStockChart, CpCodeMgr, CpStockUniWeek, autoLogin 은 COM 객체를 직접 Dispatch 하지 않고
+    backend.dispatch(prog_id) 로 받아서 사용한다.
+    """
+    name = None
+    # True 면 dispatch 로 만든 객체를 만든 스레드(COM 스레드)에서만 호출할 수 있음
+    apartment_threaded = False
+
+    def __init__(self):
+        self._cp_status = None
+        self._executor = None
+
+    @property
+    def executor(self):
+        """COM 객체를 만들고 호출하는 전용 스레드 (처음 사용할 때 시작)"""
+        if self._executor is None:
+            self._executor = ComExecutor(self)
+        return self._executor
+
+    def dispatch(self, prog_id):
+        """
+        prog_id('CpSysDib.StockChart' 등)에 해당하는 객체 반환
+        executor 스레드에서 호출해야 한다. (create_object 참고)
+        """
+        raise NotImplementedError
+
+    def dispatch_with_events(self, prog_id, events_class):
+        """실시간 이벤트(OnReceived)를 받는 객체 반환. executor 스레드에서 호출해야 한다."""
+        raise NotImplementedError("{} backend 는 실시간 구독을 지원하지 않습니다.".format(self.name))
+
+    def create_object(self, prog_id):
+        """executor 스레드에서 객체를 만든다. 만든 객체의 호출도 executor 를 거쳐야 함"""
+        return self.executor.call(self.dispatch, prog_id)
+
+    def wrap(self, obj):
+        """다른 스레드에서 바로 호출해도 되도록 필요한 경우 ComProxy 로 감싼다"""
+        if self.apartment_threaded:
+            return ComProxy(self.executor, obj)
+        return obj
+
+    def cp_status(self):
+        """연결 상태와 요청 제한을 알려주는 CpUtil.CpCybos 객체 (backend 마다 하나, 어느 스레드에서나 사용 가능)"""
+        if self._cp_status is None:
+            self._cp_status = self.wrap(self.create_object('CpUtil.CpCybos'))
+        return self._cp_status
+
+    def start_client(self, id, pwd, pwdcert):
+        """로그인되어 있지 않을 때 클라이언트(CYBOS Plus)를 실행"""
+        raise NotImplementedError
+
+    def kill_client(self):
+        """실행 중인 클라이언트를 강제 종료"""
+        pass
+
+    def thread_init(self):
+        """executor 스레드가 시작할 때 호출"""
+        pass
+
+    def thread_uninit(self):
+        """executor 스레드가 끝날 때 호출"""
+        pass
+
+    def pump_messages(self):
+        """대기 중인 COM 메시지 처리 (executor 스레드에서 호출됨)"""
+        pass
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+# 실제 Creon Plus 에 연결하는 backend (Windows, 32bit python, pywin32 필요)
+class Win32ComBackend(CreonBackend):
+    name = 'creon'
+    apartment_threaded = True
+
+    def dispatch(self, prog_id):
+        import win32com.client
+        return win32com.client.Dispatch(prog_id)
+
+    def dispatch_with_events(self, prog_id, events_class):
+        import win32com.client
+        return win32com.client.DispatchWithEvents(prog_id, events_class)
+
+    def start_client(self, id, pwd, pwdcert):
+        from pywinauto import application
+        app = application.Application()
+        app.start(
+                    'C:\\Daishin\\Starter\\ncStarter.exe /prj:cp /id:{id} /pwd:{pwd} /pwdcert:{pwdcert} /autostart'.format(
+                        id=id, pwd=pwd, pwdcert=pwdcert)
+                )
+
+    def kill_client(self):
+        print("########## 기존 CYBOS 프로세스 강제 종료")
+        os.system('taskkill /IM ncStarter* /F /T')
+        os.system('taskkill /IM CpStart* /F /T')
+        os.system('taskkill /IM DibServer* /F /T')
+        os.system('wmic process where "name like \'%ncStarter%\'" call terminate')
+        os.system('wmic process where "name like \'%CpStart%\'" call terminate')
+        os.system('wmic process where "name like \'%DibServer%\'" call terminate')
+
+    def thread_init(self):
+        import pythoncom
+        pythoncom.CoInitialize()  # STA
+
+    def thread_uninit(self):
+        import pythoncom
+        pythoncom.CoUninitialize()
+
+    def pump_messages(self):
+        import pythoncom
+        while True:
+            msg = pythoncom.PumpWaitingMessages()
+            if not msg:
+                break
+
+
+g_backend = None
+
+
+def create_backend(name, **kwargs):
+    """
+    :param name: 'creon', 'simulator' 또는 'replay'
+    :param kwargs: SimulatorBackend / ReplayBackend 생성 인자
+    """
+    if name == 'creon':
+        return Win32ComBackend()
+    if name == 'simulator':
+        from api.simulator import SimulatorBackend
+        return SimulatorBackend(**kwargs)
+    if name == 'replay':
+        from api.recorder import ReplayBackend
+        return ReplayBackend(**kwargs)
+    raise ValueError("Invalid backend name provided: {}".format(name))
+
+
+def get_backend():
+    """
+    프로세스 전체에서 사용하는 backend 반환
+    set_backend 로 지정하지 않았다면 환경변수 CREON_BACKEND (기본값 'creon') 로 생성
+    """
+    global g_backend
+    if g_backend is None:
+        g_backend = create_backend(os.environ.get('CREON_BACKEND', 'creon'))
+    return g_backend
+
+
+def set_backend(backend):
+    global g_backend
+    g_backend = backend
+    return backend
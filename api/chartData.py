@@ -0,0 +1,152 @@
+# coding=utf-8
+from types import MappingProxyType
+from typing import NamedTuple, Mapping
+
+import numpy as np
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+# 요청 항목별 저장 타입
+# 봉 데이터는 date int64 (분봉은 YYYYMMDDHHMM), 가격 int32, 거래량/거래대금 int64 로 고정
+COLUMN_DTYPES = {
+    'date': np.int64,
+    'time': np.int32,
+    'open': np.int32,
+    'high': np.int32,
+    'low': np.int32,
+    'close': np.int32,
+    'volume': np.int64,
+    'value': np.int64,
+    'marketC': np.int64,
+    'diff': np.int64,
+    'diff_rate': np.float64,
+    'shares': np.int64,
+}
+
+
+def column_dtypes(columns, code=''):
+    """
+    요청 항목들의 dtype 반환
+    업종(U001, U201 등) 지수는 가격이 소수점을 가지므로 float 로 받는다.
+    """
+    dtypes = {}
+    for col in columns:
+        if col in PRICE_COLUMNS and code.startswith('U'):
+            dtypes[col] = np.float64
+        else:
+            dtypes[col] = COLUMN_DTYPES.get(col, np.float64)
+    return dtypes
+
+
+# BlockRequest 로 받은 페이지를 컬럼 단위로 미리 할당된 배열에 채우는 클래스
+class ChartPageDecoder:
+    def __init__(self, com_obj, columns, capacity, count_header=3, code=''):
+        """
+        :param com_obj: GetHeaderValue / GetDataValue 를 제공하는 Creon 객체
+        :param columns: SetInputValue(5, ...) 로 요청한 순서대로의 항목 이름
+        :param capacity: 처음 할당할 행 수. 부족하면 두 배씩 늘린다.
+        :param count_header: 받아온 데이터 개수가 들어있는 header type (StockChart: 3, StockUniWeek: 1)
+        :param code: 종목코드 (지수 여부 판단용)
+        """
+        # COM 메소드 조회 비용을 줄이기 위해 bound method 를 캐시
+        self._get_header = com_obj.GetHeaderValue
+        self._get_data = com_obj.GetDataValue
+        self.columns = tuple(columns)
+        self.count_header = count_header
+        self.dtypes = column_dtypes(self.columns, code)
+        self.size = 0
+        self.page_count = 0
+        capacity = max(int(capacity), 1)
+        self._buffers = {col: np.empty(capacity, dtype=self.dtypes[col]) for col in self.columns}
+
+    @property
+    def capacity(self):
+        return len(self._buffers[self.columns[0]])
+
+    def _reserve(self, n):
+        needed = self.size + n
+        if needed <= self.capacity:
+            return
+        new_capacity = max(needed, self.capacity * 2)
+        for col, buf in self._buffers.items():
+            new_buf = np.empty(new_capacity, dtype=buf.dtype)
+            new_buf[:self.size] = buf[:self.size]
+            self._buffers[col] = new_buf
+
+    def decode_page(self, limit=None):
+        """
+        현재 페이지를 컬럼 하나씩 통째로 읽어 버퍼 뒤에 이어붙인다.
+        :param limit: 최대 읽을 행 수
+        :return: 읽은 행 수
+        """
+        n = self._get_header(self.count_header)  # 받아온 데이터 개수
+        if limit is not None:
+            n = min(n, limit)
+        if n <= 0:
+            return 0
+        self._reserve(n)
+        get_data = self._get_data
+        start = self.size
+        for col_idx, col in enumerate(self.columns):
+            self._buffers[col][start:start + n] = np.fromiter(
+                (get_data(col_idx, i) for i in range(n)), dtype=self.dtypes[col], count=n)
+        self.size += n
+        self.page_count += 1
+        return n
+
+    def truncate(self, size):
+        """앞에서부터 size 행만 남긴다"""
+        self.size = min(self.size, size)
+
+    def column(self, col):
+        """지금까지 받은 데이터의 view"""
+        return self._buffers[col][:self.size]
+
+    def last(self, col):
+        """가장 마지막(가장 오래된) 행의 값"""
+        return self._buffers[col][self.size - 1]
+
+    def take(self):
+        """
+        받은 데이터를 복사해서 {항목: ndarray} 로 반환하고 비운다 (페이지 단위로 버퍼를 다시 사용할 때)
+        """
+        data = {col: buf[:self.size].copy() for col, buf in self._buffers.items()}
+        self.size = 0
+        return data
+
+    def result(self):
+        """
+        받은 데이터를 {항목: ndarray} 로 반환
+        버퍼가 실제 데이터보다 크면 남는 공간을 버리기 위해 복사한다.
+        """
+        data = {}
+        for col, buf in self._buffers.items():
+            data[col] = buf if self.size == len(buf) else buf[:self.size].copy()
+        return data
+
+
+# 차트 요청 결과. 요청마다 새로 만들어지고 변경할 수 없으므로 여러 종목의 요청/저장이 겹쳐도 안전하다.
+class ChartResult(NamedTuple):
+    code: str  # 종목코드
+    frequency: str  # 'D','W','M':일/주/월봉, 'm':분봉, 'T':틱봉, 'U':시간외 단일가 일자별
+    columns: Mapping  # {항목: 읽기 전용 ndarray}, 최신 -> 과거 순서
+    oldest_date: int
+    newest_date: int
+    page_count: int
+
+    @classmethod
+    def from_columns(cls, code, frequency, columns, page_count):
+        """
+        :param columns: {항목: ndarray}, 'date' 항목이 있어야 하며 최신 -> 과거 순서
+        :return: 데이터가 없으면 None
+        """
+        if len(columns['date']) == 0:
+            return None
+        for arr in columns.values():
+            arr.flags.writeable = False
+        dates = columns['date']
+        return cls(code, frequency, MappingProxyType(columns), int(dates[-1]), int(dates[0]), page_count)
+
+    @property
+    def size(self):
+        return len(self.columns['date'])
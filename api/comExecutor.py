@@ -0,0 +1,126 @@
+# coding=utf-8
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+
+
+# Creon COM 객체를 하나의 STA(single-threaded apartment) 스레드에서만 만들고 호출하는 실행기
+class ComExecutor:
+    """
+    BlockRequest 처럼 서버 응답까지 멈추는 호출을 전용 스레드에서 실행하여
+    이벤트 루프는 그동안 DB 저장, 텔레그램 전송 등을 계속 처리할 수 있다.
+    작업 사이와 대기 중에는 backend.pump_messages() 로 COM 메시지를 처리한다.
+    """
+    def __init__(self, backend, pump_interval=0.05, name='creon-com'):
+        """
+        :param backend: thread_init / thread_uninit / pump_messages 를 제공하는 CreonBackend
+        :param pump_interval: 작업이 없을 때 메시지를 처리하는 주기(초)
+        """
+        self.backend = backend
+        self.pump_interval = pump_interval
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._submit_lock = threading.Lock()  # 초기화 실패 기록과 submit 사이
+        self._init_error = None  # thread_init 에서 난 예외. 이후의 모든 호출에 전달
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return self
+
+    def in_worker(self):
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def _fail_pending(self, error):
+        """스레드가 시작하지 못했을 때 대기 중인 호출을 모두 error 로 끝낸다"""
+        with self._submit_lock:
+            self._init_error = error
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    return
+                if item is not None and item[2].set_running_or_notify_cancel():
+                    item[2].set_exception(error)
+
+    def _run(self):
+        try:
+            self.backend.thread_init()  # pythoncom.CoInitialize 등
+        except BaseException as e:  # pywin32 가 없거나 CoInitialize 실패
+            self._fail_pending(e)
+            return
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.pump_interval)
+                except queue.Empty:
+                    self.backend.pump_messages()
+                    continue
+                if item is None:
+                    break
+                func, args, future = item
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(func(*args))
+                    except BaseException as e:  # exit() 로 인한 SystemExit 도 호출한 쪽에 전달
+                        future.set_exception(e)
+                self.backend.pump_messages()
+        finally:
+            self.backend.thread_uninit()
+
+    def submit(self, func, *args):
+        """
+        COM 스레드에서 func(*args) 를 실행
+        :return: concurrent.futures.Future
+        """
+        self.start()
+        future = Future()
+        with self._submit_lock:
+            if self._init_error is not None:
+                future.set_exception(self._init_error)
+            else:
+                self._queue.put((func, args, future))
+        return future
+
+    def run(self, func, *args):
+        """코루틴에서 await 할 수 있는 future 반환"""
+        return asyncio.wrap_future(self.submit(func, *args))
+
+    def call(self, func, *args):
+        """결과가 나올 때까지 기다리는 동기 호출. COM 스레드 안에서 부르면 바로 실행"""
+        if self.in_worker():
+            return func(*args)
+        return self.submit(func, *args).result()
+
+    def shutdown(self, wait=True):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        if wait and not self.in_worker():
+            self._thread.join()
+        self._thread = None
+
+
+# 다른 스레드에서 COM 객체의 속성/메소드를 사용할 때 COM 스레드로 대신 호출해주는 객체
+class ComProxy:
+    def __init__(self, executor, obj):
+        object.__setattr__(self, '_executor', executor)
+        object.__setattr__(self, '_obj', obj)
+
+    def __getattr__(self, name):
+        executor = self._executor
+        attr = executor.call(getattr, self._obj, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args):
+            return executor.call(attr, *args)
+        return call
+
+    def __setattr__(self, name, value):
+        self._executor.call(setattr, self._obj, name, value)
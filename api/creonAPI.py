@@ -1,37 +1,51 @@
 # coding=utf-8
-import win32com.client
 import time
 from datetime import datetime
 from typing import TYPE_CHECKING
 import asyncio
+import numpy as np
+
+from api.backend import get_backend
+from api.rateLimiter import get_rate_limiter
+from api.chartData import ChartPageDecoder, ChartResult
 
 if TYPE_CHECKING:
     from creon_datareader_v1_0 import MainWindow
-    
-g_objCpStatus = win32com.client.Dispatch('CpUtil.CpCybos')
-
-def pump_messages():
-    while True:
-        msg = win32com.client.pythoncom.PumpWaitingMessages()
-        if not msg:
-            break
-        
+
+# 디코더 버퍼를 처음 할당할 때의 최대 행 수 (부족하면 두 배씩 늘어남)
+DECODER_INITIAL_ROWS = 4096
+
 # original_func 콜하기 전에 PLUS 연결 상태 체크하는 데코레이터
+# COM 메시지 처리는 backend 의 executor 스레드가 담당한다.
 def check_PLUS_status(original_func):
     def wrapper(*args, **kwargs):
-        if not g_objCpStatus.IsConnect:
+        if not get_backend().cp_status().IsConnect:
             print("PLUS가 정상적으로 연결되지 않음.")  # 연결 실패 메시지 출력
             raise ConnectionError("PLUS가 정상적으로 연결되지 않음.")  # 예외 발생
         print("already connected.")
-        pump_messages()  # 메시지 루프 처리 추가
         return original_func(*args, **kwargs)
     return wrapper
 
 
 # 서버로부터 과거의 차트 데이터 가져오는 클래스
 class CpStockChart:
-    def __init__(self):
-        self.objStockChart = win32com.client.Dispatch("CpSysDib.StockChart")
+    def __init__(self, rate_limiter=None, backend=None):
+        """
+        :param rate_limiter: 지정하지 않으면 프로세스 공유 rate limiter 사용
+        :param backend: 지정하지 않으면 get_backend() (실제 Creon 또는 시뮬레이터)
+        """
+        backend = backend or get_backend()
+        # objStockChart 는 executor 스레드에서만 사용한다 (_prepare_*, _request_page)
+        self.executor = backend.executor
+        self.objStockChart = backend.create_object("CpSysDib.StockChart")
+        self.rate_limiter = rate_limiter or get_rate_limiter(backend.cp_status())
+        # 하나의 COM 객체에 입력값 설정 ~ 연속 조회가 섞이지 않도록 요청 단위로 잠금
+        self._request_lock = None
+
+    def _lock(self):
+        if self._request_lock is None:
+            self._request_lock = asyncio.Lock()
+        return self._request_lock
     
     def _check_rq_status(self):
         """
@@ -47,25 +61,113 @@ class CpStockChart:
             print("통신상태 오류[{}]{} 종료합니다..".format(rqStatus, rqRet))
             exit()
 
-    async def apply_delay(self):
-        current_time = datetime.now().time()
-        if (current_time >= datetime.strptime("09:00", "%H:%M").time() and current_time <= datetime.strptime("09:10", "%H:%M").time()) or (current_time >= datetime.strptime("15:20", "%H:%M").time() and current_time <= datetime.strptime("15:30", "%H:%M").time()):
-            await asyncio.sleep(0.7)  # 바쁜 시간대 딜레이
-        else:
-            await asyncio.sleep(0.25)  # 일반 시간대 딜레이
+    def _request_page(self, decoder, limit):
+        """
+        executor 스레드에서 실행: BlockRequest 후 통신상태 검사, 받은 페이지를 decoder 에 채움
+        :return: (읽은 행 수, 연속 조회 여부)
+        """
+        self.objStockChart.BlockRequest()  # 요청! 후 응답 대기
+        self._check_rq_status()  # 통신상태 검사
+        return decoder.decode_page(limit), self.objStockChart.Continue
+
+    async def _block_request(self, decoder, limit=None):
+        """
+        공유 rate limiter 를 거쳐 executor 스레드에서 한 페이지 요청
+        시간당 RQ 제한으로 인해 장애가 발생하지 않도록 남은 요청 수가 없을 때만 기다린다.
+        응답을 기다리는 동안 이벤트 루프는 다른 작업(DB 저장 등)을 처리한다.
+        """
+        await self.rate_limiter.acquire()
+        try:
+            return await self.executor.run(self._request_page, decoder, limit)
+        finally:
+            self.rate_limiter.release()
+
+
+    async def _iter_pages(self, decoder, count, caller, from_date, start_date, oldest_date, progress):
+        """
+        페이지를 하나씩 요청하여 decoder 에 채우고, 한 페이지를 받을 때마다 yield 한다.
+        :param oldest_date: decoder 에 받은 가장 오래된 행의 date 를 반환하는 함수
+        :param progress: caller.return_status_msg 형식 ('{} / {}')
+        """
+        rcv_count = 0
+        while start_date or count > rcv_count:
+            # 요청! 후 응답 대기. 정확히 count 개수만큼 받기 위해 남은 개수까지만 읽음
+            rcv_batch_len, has_next = await self._block_request(decoder, None if start_date else count - rcv_count)
+            if rcv_batch_len == 0:  # 데이터가 없는 경우
+                return
+
+            # rcv_batch_len 만큼 받은 데이터의 가장 오래된 date
+            rcv_oldest_date = oldest_date(decoder)
+            rcv_count += rcv_batch_len
+            if caller:
+                caller.return_status_msg = progress.format(rcv_count, count)
+            yield rcv_batch_len
+
+            # 서버가 가진 모든 데이터를 요청한 경우 break.
+            # self.objStockChart.Continue 는 개수로 요청한 경우
+            # count만큼 이미 다 받았더라도 계속 1의 값을 가지고 있어서
+            # while 조건문에서 count > rcv_count를 체크해줘야 함.
+            if not has_next:
+                break
+            if rcv_oldest_date < from_date:
+                break
 
+    @staticmethod
+    def _oldest_dwm(decoder):
+        return decoder.last('date')
+
+    @staticmethod
+    def _oldest_mt(decoder):
+        return int(decoder.last('date')) * 10000 + int(decoder.last('time'))
+
+    @staticmethod
+    def _merge_minute(rcv_data):
+        # 분봉의 경우 날짜와 시간을 합쳐 YYYYMMDDHHMM (int64) 로 변환
+        rcv_data['date'] = rcv_data['date'] * 10000 + rcv_data.pop('time')
+        return rcv_data
 
     # 차트 요청 - 최근일 부터 개수 기준
-    async def RequestDWM(self, code, dwm, count, caller: 'MainWindow', from_date=0):
+    async def RequestDWM(self, code, dwm, count, caller: 'MainWindow' = None, from_date=0, start_date=0, end_date=0):
         """
         :param code: 종목코드
         :param dwm: 'D':일봉, 'W':주봉, 'M':월봉
-        :param count: 요청할 데이터 개수
-        :return: None
+        :param count: 요청할 데이터 개수 (기간으로 받는 경우 사용하지 않음)
+        :param caller: 진행 상황(return_status_msg)을 표시할 인스턴스
+        :param start_date: 0 이 아니면 start_date ~ end_date 기간으로 받기 (YYYYMMDD)
+        :param end_date: 요청 종료일 (YYYYMMDD), 0 이면 오늘
+        :return: ChartResult, 데이터가 없으면 None
+        """
+        async with self._lock():
+            decoder = await self.executor.run(self._prepare_dwm, code, dwm, count, start_date, end_date)
+            async for _ in self._iter_pages(decoder, count, caller, from_date, start_date, self._oldest_dwm, '{} / {}'):
+                pass
+            return ChartResult.from_columns(code, dwm, decoder.result(), decoder.page_count)
+
+    def _set_range(self, count, start_date, end_date):
+        """개수 또는 기간 입력값 설정"""
+        # 이전 요청의 종료일이 남아있지 않도록 항상 지정
+        self.objStockChart.SetInputValue(2, end_date or int(datetime.now().strftime('%Y%m%d')))  # 요청 종료일
+        if start_date:
+            self.objStockChart.SetInputValue(1, ord('1'))  # 기간으로 받기
+            self.objStockChart.SetInputValue(3, start_date)  # 요청 시작일
+        else:
+            self.objStockChart.SetInputValue(1, ord('2'))  # 개수로 받기
+            self.objStockChart.SetInputValue(4, count)  # 최근 count개
+
+    async def StreamDWM(self, code, dwm, count, caller: 'MainWindow' = None, from_date=0, start_date=0, end_date=0):
         """
+        RequestDWM 과 같지만 한 페이지를 받을 때마다 그 페이지만 ChartResult 로 yield 한다 (최신 페이지부터).
+        전체 기간을 받아도 메모리에는 한 페이지만 남는다.
+        """
+        async with self._lock():
+            decoder = await self.executor.run(self._prepare_dwm, code, dwm, count, start_date, end_date)
+            async for _ in self._iter_pages(decoder, count, caller, from_date, start_date, self._oldest_dwm, '{} / {}'):
+                yield ChartResult.from_columns(code, dwm, decoder.take(), 1)
+
+    def _prepare_dwm(self, code, dwm, count, start_date, end_date):
+        """executor 스레드에서 실행: 입력값 설정 후 decoder 반환"""
         self.objStockChart.SetInputValue(0, code)  # 종목코드
-        self.objStockChart.SetInputValue(1, ord('2'))  # 개수로 받기
-        self.objStockChart.SetInputValue(4, count)  # 최근 count개
+        self._set_range(count, start_date, end_date)
 
         # 요청항목
         self.objStockChart.SetInputValue(5, [0, # 날짜 (ulong)
@@ -83,57 +185,44 @@ class CpStockChart:
         self.objStockChart.SetInputValue(6, ord(dwm))  # '차트 주기 - 일/주/월
         self.objStockChart.SetInputValue(9, ord('1'))  # 수정주가 사용
 
-        rcv_data = {}
-        for col in rq_column:
-            rcv_data[col] = []
-
-        rcv_count = 0
-        while count > rcv_count:
-            self.objStockChart.BlockRequest()  # 요청! 후 응답 대기
-            self._check_rq_status()  # 통신상태 검사
-            await self.apply_delay() # 시간당 RQ 제한으로 인해 장애가 발생하지 않도록 딜레이를 줌
-            # time.sleep(0.25)
-
-            rcv_batch_len = self.objStockChart.GetHeaderValue(3)  # 받아온 데이터 개수
-            rcv_batch_len = min(rcv_batch_len, count - rcv_count)  # 정확히 count 개수만큼 받기 위함
-            for i in range(rcv_batch_len):
-                for col_idx, col in enumerate(rq_column):
-                    rcv_data[col].append(self.objStockChart.GetDataValue(col_idx, i))
-
-            if len(rcv_data['date']) == 0:  # 데이터가 없는 경우
-                # print(code, '데이터 없음')
-                return False
-
-            # rcv_batch_len 만큼 받은 데이터의 가장 오래된 date
-            rcv_oldest_date = rcv_data['date'][-1]
-            rcv_count += rcv_batch_len
-            caller.return_status_msg = '{} / {}'.format(rcv_count, count)
-            
-            # 서버가 가진 모든 데이터를 요청한 경우 break.
-            # self.objStockChart.Continue 는 개수로 요청한 경우
-            # count만큼 이미 다 받았더라도 계속 1의 값을 가지고 있어서
-            # while 조건문에서 count > rcv_count를 체크해줘야 함.
-            if not self.objStockChart.Continue:
-                break
-            if rcv_oldest_date < from_date:
-                break
-            
-        caller.rcv_data = rcv_data  # 받은 데이터를 caller의 멤버에 저장
-        return True
+        return ChartPageDecoder(self.objStockChart, rq_column, min(count, DECODER_INITIAL_ROWS), code=code)
 
     # 차트 요청 - 분간, 틱 차트
-    async def RequestMT(self, code, dwm, tick_range, count, caller: 'MainWindow', from_date=0):
+    async def RequestMT(self, code, dwm, tick_range, count, caller: 'MainWindow' = None, from_date=0, start_date=0, end_date=0):
         """
         :param code: 종목 코드
         :param dwm: 'm':분봉, 'T':틱봉
         :param tick_range: 1분봉 or 5분봉, ...
-        :param count: 요청할 데이터 개수
-        :param caller: 이 메소드 호출한 인스턴스. 결과 데이터를 caller의 멤버로 전달하기 위함
-        :return:
+        :param count: 요청할 데이터 개수 (기간으로 받는 경우 사용하지 않음)
+        :param caller: 진행 상황(return_status_msg)을 표시할 인스턴스
+        :param start_date: 0 이 아니면 start_date ~ end_date 기간으로 받기 (YYYYMMDD)
+        :param end_date: 요청 종료일 (YYYYMMDD), 0 이면 오늘
+        :return: ChartResult, 데이터가 없으면 None
+        """
+        async with self._lock():
+            decoder = await self.executor.run(self._prepare_mt, code, dwm, tick_range, count, start_date, end_date)
+            async for _ in self._iter_pages(decoder, count, caller, from_date, start_date, self._oldest_mt,
+                                            '{} / {}(maximum)'):
+                pass
+            if decoder.size == 0:
+                return None
+            return ChartResult.from_columns(code, dwm, self._merge_minute(decoder.result()), decoder.page_count)
+
+    async def StreamMT(self, code, dwm, tick_range, count, caller: 'MainWindow' = None, from_date=0, start_date=0, end_date=0):
+        """
+        RequestMT 와 같지만 한 페이지를 받을 때마다 그 페이지만 ChartResult 로 yield 한다 (최신 페이지부터).
+        20만개 분봉을 받아도 메모리에는 한 페이지만 남는다.
         """
+        async with self._lock():
+            decoder = await self.executor.run(self._prepare_mt, code, dwm, tick_range, count, start_date, end_date)
+            async for _ in self._iter_pages(decoder, count, caller, from_date, start_date, self._oldest_mt,
+                                            '{} / {}(maximum)'):
+                yield ChartResult.from_columns(code, dwm, self._merge_minute(decoder.take()), 1)
+
+    def _prepare_mt(self, code, dwm, tick_range, count, start_date, end_date):
+        """executor 스레드에서 실행: 입력값 설정 후 decoder 반환"""
         self.objStockChart.SetInputValue(0, code)  # 종목코드
-        self.objStockChart.SetInputValue(1, ord('2'))  # 개수로 받기
-        self.objStockChart.SetInputValue(4, count)  # 조회 개수
+        self._set_range(count, start_date, end_date)
         # 요청항목
         self.objStockChart.SetInputValue(5, [0, # 날짜(ulong)
                                             1, # 시간(long) - hhmm
@@ -151,52 +240,13 @@ class CpStockChart:
         self.objStockChart.SetInputValue(7, tick_range)  # 분틱차트 주기
         self.objStockChart.SetInputValue(9, ord('1'))  # 수정주가 사용
 
-        rcv_data = {}
-        for col in rq_column:
-            rcv_data[col] = []
-
-        rcv_count = 0
-        while count > rcv_count:
-            self.objStockChart.BlockRequest()  # 요청! 후 응답 대기
-            self._check_rq_status()  # 통신상태 검사
-            await self.apply_delay() # 시간당 RQ 제한으로 인해 장애가 발생하지 않도록 딜레이를 줌
-            # time.sleep(0.25)  
-
-            rcv_batch_len = self.objStockChart.GetHeaderValue(3)  # 받아온 데이터 개수
-            rcv_batch_len = min(rcv_batch_len, count - rcv_count)  # 정확히 count 개수만큼 받기 위함
-            for i in range(rcv_batch_len):
-                for col_idx, col in enumerate(rq_column):
-                    rcv_data[col].append(self.objStockChart.GetDataValue(col_idx, i))
-
-            if len(rcv_data['date']) == 0:  # 데이터가 없는 경우
-                # print(code, '데이터 없음')
-                return False
-
-            # len 만큼 받은 데이터의 가장 오래된 date
-            rcv_oldest_date = int('{}{:04}'.format(rcv_data['date'][-1], rcv_data['time'][-1]))
-            rcv_count += rcv_batch_len
-            caller.return_status_msg = '{} / {}(maximum)'.format(rcv_count, count)
-
-            # 서버가 가진 모든 데이터를 요청한 경우 break.
-            # self.objStockChart.Continue 는 개수로 요청한 경우
-            # count만큼 이미 다 받았더라도 계속 1의 값을 가지고 있어서
-            # while 조건문에서 count > rcv_count를 체크해줘야 함.
-            if not self.objStockChart.Continue:
-                break
-            if rcv_oldest_date < from_date:
-                break
-
-        # 분봉의 경우 날짜와 시간을 하나의 문자열로 합친 후 int로 변환
-        rcv_data['date'] = list(map(lambda x, y: int('{}{:04}'.format(x, y)),
-                 rcv_data['date'], rcv_data['time']))
-        del rcv_data['time']
-        caller.rcv_data = rcv_data  # 받은 데이터를 caller의 멤버에 저장
-        return True
+        return ChartPageDecoder(self.objStockChart, rq_column, min(count, DECODER_INITIAL_ROWS), code=code)
     
 # 종목코드 관리하는 클래스
 class CpCodeMgr:
-    def __init__(self):
-        self.objCodeMgr = win32com.client.Dispatch("CpUtil.CpCodeMgr")
+    def __init__(self, backend=None):
+        backend = backend or get_backend()
+        self.objCodeMgr = backend.wrap(backend.create_object("CpUtil.CpCodeMgr"))
 
     # 마켓에 해당하는 종목코드 리스트 반환하는 메소드
     def get_code_list(self, market):
@@ -228,8 +278,17 @@ class CpCodeMgr:
         return code_status
 
 class CpStockUniWeek:
-    def __init__(self):
-        self.objStockUniWeek = win32com.client.Dispatch("CpSysDib.StockUniWeek")
+    def __init__(self, rate_limiter=None, backend=None):
+        backend = backend or get_backend()
+        self.executor = backend.executor
+        self.objStockUniWeek = backend.create_object("CpSysDib.StockUniWeek")
+        self.rate_limiter = rate_limiter or get_rate_limiter(backend.cp_status())
+        self._request_lock = None
+
+    def _lock(self):
+        if self._request_lock is None:
+            self._request_lock = asyncio.Lock()
+        return self._request_lock
 
     def _check_rq_status(self):
         rqStatus = self.objStockUniWeek.GetDibStatus()
@@ -238,54 +297,124 @@ class CpStockUniWeek:
             print(f"통신상태 오류[{rqStatus}]{rqRet}")
             raise ConnectionError(f"통신상태 오류[{rqStatus}]{rqRet}")
             
-    async def apply_delay(self):
-        current_time = datetime.now().time()
-        if (current_time >= datetime.strptime("09:00", "%H:%M").time() and current_time <= datetime.strptime("09:10", "%H:%M").time()) or \
-        (current_time >= datetime.strptime("15:20", "%H:%M").time() and current_time <= datetime.strptime("15:30", "%H:%M").time()):
-            await asyncio.sleep(0.7)
-        else:
-            await asyncio.sleep(0.25)
+    def _request_page(self, decoder, limit):
+        """executor 스레드에서 실행: BlockRequest 후 받은 페이지를 decoder 에 채움"""
+        self.objStockUniWeek.BlockRequest()
+        self._check_rq_status()
+        return decoder.decode_page(limit), self.objStockUniWeek.Continue
+
+    async def _block_request(self, decoder, limit):
+        await self.rate_limiter.acquire()
+        try:
+            return await self.executor.run(self._request_page, decoder, limit)
+        finally:
+            self.rate_limiter.release()
+
+    def _prepare(self, code, count, rq_column):
+        """executor 스레드에서 실행: 입력값 설정 후 decoder 반환"""
+        self.objStockUniWeek.SetInputValue(0, code)
+        return ChartPageDecoder(self.objStockUniWeek, rq_column, count, count_header=1, code=code)
 
     async def request_stock_data(self, code, count, caller=None, from_date=0):
-        self.objStockUniWeek.SetInputValue(0, code)
+        """
+        :return: ChartResult(frequency='U'), 데이터가 없으면 None
+        """
+        async with self._lock():
+            return await self._request_stock_data(code, count, caller, from_date)
 
+    async def _request_stock_data(self, code, count, caller, from_date):
         rq_column = ('date', 'open', 'high', 'low', 'close','diff', 'diff_rate')
-        rcv_data2 = {}
-        rcv_data2 = {col: [] for col in rq_column}
+        decoder = await self.executor.run(self._prepare, code, count, rq_column)
 
         rcv_count = 0
         while count > rcv_count:
-            self.objStockUniWeek.BlockRequest()
-            self._check_rq_status()
-            await self.apply_delay()
-
-            rcv_batch_len = self.objStockUniWeek.GetHeaderValue(1)
-            rcv_batch_len = min(rcv_batch_len, count - rcv_count)
-
-            for i in range(rcv_batch_len):
-                item_date = self.objStockUniWeek.GetDataValue(0, i)
-                if item_date < from_date:
-                    break
-
-                for col_idx, col in enumerate(rq_column):
-                    rcv_data2[col].append(self.objStockUniWeek.GetDataValue(col_idx, i))
-
-            if len(rcv_data2['date']) == 0:
+            page_start = decoder.size
+            rcv_batch_len, has_next = await self._block_request(decoder, count - rcv_count)
+            # from_date 보다 오래된 행은 버림 (최신 -> 과거 순서)
+            older = (decoder.column('date')[page_start:] < from_date).nonzero()[0]
+            if len(older) > 0:
+                decoder.truncate(page_start + older[0])
+
+            if decoder.size == 0:
                 # print(code, '데이터 없음')
-                return False
+                return None
 
-            rcv_oldest_date = rcv_data2['date'][-1]
+            rcv_oldest_date = decoder.last('date')
             rcv_count += rcv_batch_len
             if caller:
                 caller.return_status_msg = '{} / {}'.format(rcv_count, count)
 
-            if not self.objStockUniWeek.Continue:
+            if not has_next:
                 break
-            if rcv_oldest_date < from_date:
+            if rcv_oldest_date < from_date or len(older) > 0:
                 break
 
-        if caller:
-            caller.rcv_data2 = rcv_data2
-        # await self.apply_delay()
-        return True
+        return ChartResult.from_columns(code, 'U', decoder.result(), decoder.page_count)
+
 
+
+# 여러 종목의 현재 시세를 한 번에 조회하는 클래스 (장 마감 후에는 당일 일봉과 같음)
+class CpMarketEye:
+    # 한 번에 요청할 수 있는 최대 종목 수
+    MAX_CODES = 200
+    # 요청 필드 번호와 항목. MarketEye 는 필드 번호 순서로 돌려주므로 번호 순으로 둔다.
+    FIELDS = ((1, 'time'),  # 시간(hhmm)
+              (4, 'close'),  # 현재가
+              (5, 'open'),  # 시가
+              (6, 'high'),  # 고가
+              (7, 'low'),  # 저가
+              (10, 'volume'),  # 거래량
+              (11, 'value'),  # 거래대금
+              (20, 'shares'))  # 상장주식수
+
+    def __init__(self, rate_limiter=None, backend=None):
+        backend = backend or get_backend()
+        self.executor = backend.executor
+        self.objMarketEye = backend.create_object("CpSysDib.MarketEye")
+        self.rate_limiter = rate_limiter or get_rate_limiter(backend.cp_status())
+        self._request_lock = None
+
+    def _lock(self):
+        if self._request_lock is None:
+            self._request_lock = asyncio.Lock()
+        return self._request_lock
+
+    def _check_rq_status(self):
+        rqStatus = self.objMarketEye.GetDibStatus()
+        rqRet = self.objMarketEye.GetDibMsg1()
+        if rqStatus != 0:
+            print(f"통신상태 오류[{rqStatus}]{rqRet}")
+            raise ConnectionError(f"통신상태 오류[{rqStatus}]{rqRet}")
+
+    def _request_chunk(self, codes):
+        """executor 스레드에서 실행: codes(최대 MAX_CODES 개) 요청 후 {항목: ndarray} 반환"""
+        self.objMarketEye.SetInputValue(0, [field for field, _ in self.FIELDS])
+        self.objMarketEye.SetInputValue(1, list(codes))
+        self.objMarketEye.BlockRequest()
+        self._check_rq_status()
+        decoder = ChartPageDecoder(self.objMarketEye, [col for _, col in self.FIELDS], len(codes), count_header=2)
+        decoder.decode_page()
+        return decoder.result()
+
+    async def request(self, codes, caller: 'MainWindow' = None):
+        """
+        :param codes: 종목코드 목록 (업종 코드 제외)
+        :param caller: 진행 상황(return_status_msg)을 표시할 인스턴스
+        :return: {'code': 종목코드 list, 항목: ndarray}, codes 와 같은 순서
+        """
+        codes = list(codes)
+        chunks = []
+        async with self._lock():
+            for i in range(0, len(codes), self.MAX_CODES):
+                chunk = codes[i:i + self.MAX_CODES]
+                await self.rate_limiter.acquire()
+                try:
+                    chunks.append(await self.executor.run(self._request_chunk, chunk))
+                finally:
+                    self.rate_limiter.release()
+                if caller:
+                    caller.return_status_msg = '{} / {}'.format(min(i + self.MAX_CODES, len(codes)), len(codes))
+        data = {'code': codes}
+        for _, col in self.FIELDS:
+            data[col] = np.concatenate([chunk[col] for chunk in chunks]) if chunks else np.empty(0, np.int64)
+        return data
@@ -0,0 +1,130 @@
+# coding=utf-8
+import asyncio
+import time
+
+# CpUtil.CpCybos.GetLimitRemainCount 의 limitType
+LT_TRADE_REQUEST = 0  # 주문 관련 RQ
+LT_NONTRADE_REQUEST = 1  # 시세 관련 RQ (StockChart, StockUniWeek 등)
+LT_SUBSCRIBE = 2  # 실시간 시세 요청
+
+
+# Creon 조회 요청 제한을 관리하는 토큰 버킷
+class CpRateLimiter:
+    """
+    시세 조회(BlockRequest) 전에 acquire(), 응답을 받은 후 release() 를 호출한다.
+    - status(CpUtil.CpCybos)가 있으면 서버가 알려주는 남은 요청 수와 제한 해제까지 남은 시간을 그대로 사용
+      -> 남은 요청이 있으면 바로 보내고(burst), 다 쓴 경우에만 창이 갱신될 때까지 기다린다.
+    - status 가 없거나 값을 읽을 수 없으면 capacity / window 기준의 토큰 버킷으로 동작
+    - clock, sleep 을 주입할 수 있어 가짜 시계로 테스트 가능
+    """
+    def __init__(self, capacity=60, window=15.0, status=None, limit_type=LT_NONTRADE_REQUEST,
+                 margin=0.05, clock=time.monotonic, sleep=asyncio.sleep):
+        """
+        :param capacity: window 초 동안 보낼 수 있는 요청 수 (Creon 시세 조회: 15초당 60건)
+        :param window: 제한 창의 길이(초)
+        :param status: GetLimitRemainCount / LimitRequestRemainTime 을 제공하는 CpCybos 객체
+        :param limit_type: GetLimitRemainCount 에 넘길 제한 종류
+        :param margin: 서버 기준 대기 시간에 더해줄 여유 시간(초)
+        """
+        self.capacity = capacity
+        self.window = window
+        self.status = status
+        self.limit_type = limit_type
+        self.margin = margin
+        self._clock = clock
+        self._sleep = sleep
+
+        self._tokens = float(capacity)
+        self._last = clock()
+        self._inflight = 0  # acquire 후 아직 release 되지 않은 요청 수
+
+        # 통계
+        self.request_count = 0
+        self.wait_count = 0
+        self.total_wait = 0.0
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(float(self.capacity), self._tokens + elapsed * self.capacity / self.window)
+            self._last = now
+
+    def server_budget(self):
+        """
+        서버가 알려주는 (남은 요청 수, 제한 해제까지 남은 시간(초))
+        :return: 알 수 없으면 (None, None)
+        """
+        if self.status is None:
+            return None, None
+        try:
+            remain = self.status.GetLimitRemainCount(self.limit_type)
+            remain_time = self.status.LimitRequestRemainTime / 1000.0
+        except Exception:
+            return None, None
+        if remain is None or remain < 0:
+            return None, None
+        return remain, max(remain_time, 0.0)
+
+    def reserve(self):
+        """
+        요청 1건을 예약한다. 예약에 성공하면 0, 아니면 다시 시도하기 전까지 기다려야 하는 시간(초)을 반환
+        await 없이 한 번에 판단하므로 여러 코루틴이 동시에 불러도 같은 토큰을 두 번 쓰지 않는다.
+        """
+        self._refill()
+        remain, remain_time = self.server_budget()
+        if remain is not None:
+            # 서버 값에는 아직 응답을 받지 못한 요청이 반영되지 않았을 수 있음
+            if remain - self._inflight > 0:
+                self._tokens = max(self._tokens - 1, 0.0)
+                self._inflight += 1
+                return 0.0
+            if self._inflight > 0 and remain > 0:
+                # 보낸 요청의 결과가 반영될 때까지 잠시 기다린다
+                return self.margin
+            return remain_time + self.margin
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self._inflight += 1
+            return 0.0
+        return (1 - self._tokens) * self.window / self.capacity
+
+    async def acquire(self):
+        """요청을 보낼 수 있을 때까지 필요한 만큼만 기다린다"""
+        while True:
+            wait = self.reserve()
+            if wait <= 0:
+                self.request_count += 1
+                return
+            self.wait_count += 1
+            self.total_wait += wait
+            await self._sleep(wait)
+
+    def release(self):
+        """acquire 한 요청의 응답을 받은 후 호출"""
+        if self._inflight > 0:
+            self._inflight -= 1
+
+    def stats(self):
+        return {
+            'request_count': self.request_count,
+            'wait_count': self.wait_count,
+            'total_wait': round(self.total_wait, 3),
+        }
+
+
+g_rateLimiter = None
+
+
+def get_rate_limiter(status=None):
+    """
+    프로세스 전체에서 공유하는 rate limiter 반환
+    :param status: 처음 생성할 때 사용할 CpCybos 객체
+    """
+    global g_rateLimiter
+    if g_rateLimiter is None:
+        g_rateLimiter = CpRateLimiter(status=status)
+    elif status is not None and g_rateLimiter.status is None:
+        g_rateLimiter.status = status
+    return g_rateLimiter
@@ -0,0 +1,214 @@
+# coding=utf-8
+import asyncio
+from typing import NamedTuple
+
+import numpy as np
+
+from api.backend import get_backend
+from api.chartData import column_dtypes
+from api.rateLimiter import LT_SUBSCRIBE
+
+BAR_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'value')
+MARKET_CLOSE_LABEL = 1530  # 장 마감 동시호가 체결은 15:30 분봉
+REALTIME_SESSION_COLLECTION = 'sp_1min_realtime'  # sp_common 에 날짜별 실시간 수집 기록
+
+
+def incomplete_session_codes(db_handler, date):
+    """
+    date 에 실시간 수집기가 장 전체를 받지 못했으면 그 날 구독했던 종목코드 (저녁 배치가 당일 분봉을 다시 받는다)
+    기록이 없거나 장 전체를 받은 날은 빈 set
+    """
+    if not date:
+        return set()
+    session = db_handler.find_item({'date': date}, 'sp_common', REALTIME_SESSION_COLLECTION)
+    if not session or session.get('complete'):
+        return set()
+    return set(session['codes'])
+
+
+# 실시간 체결 1건
+class Tick(NamedTuple):
+    code: str
+    time: int  # hhmmss
+    price: int
+    volume: int  # 순간 체결 수량
+
+
+def bar_label(hhmmss):
+    """
+    체결 시각이 속한 분봉의 시각(hhmm). Creon 분봉은 끝나는 시각으로 표시한다.
+    09:00:30 체결 -> 0901 분봉, 15:30 이후 체결 -> 1530 분봉
+    """
+    hh, mm = divmod(hhmmss // 100, 100)
+    minutes = hh * 60 + mm + 1
+    label = (minutes // 60) * 100 + minutes % 60
+    return min(label, MARKET_CLOSE_LABEL)
+
+
+# 실시간 체결로 1분봉을 만드는 클래스
+class MinuteBarBuilder:
+    def __init__(self, date):
+        """
+        :param date: 장 날짜 (YYYYMMDD)
+        """
+        self.date = date
+        self._bars = {}  # 종목코드 -> 만들고 있는 분봉 [hhmm, open, high, low, close, volume, value]
+        self._closed = {}  # 종목코드 -> 완성된 분봉 목록
+        self.tick_count = 0
+        self.late_ticks = 0  # 이미 지난 분봉에 해당하는 늦은 체결 (버림)
+
+    def on_tick(self, tick):
+        self.tick_count += 1
+        label = bar_label(tick.time)
+        price = tick.price
+        bar = self._bars.get(tick.code)
+        if bar is not None and bar[0] == label:
+            if price > bar[2]:
+                bar[2] = price
+            if price < bar[3]:
+                bar[3] = price
+            bar[4] = price
+            bar[5] += tick.volume
+            bar[6] += price * tick.volume
+            return
+        if bar is not None:
+            if label < bar[0]:
+                self.late_ticks += 1
+                return
+            self._closed.setdefault(tick.code, []).append(bar)
+        self._bars[tick.code] = [label, price, price, price, price, tick.volume, price * tick.volume]
+
+    def close_bars(self, now_hhmmss):
+        """now_hhmmss 시점에 이미 끝난 분봉을 완성 처리 (체결이 없어서 닫히지 않은 분봉)"""
+        current = bar_label(now_hhmmss)
+        for code in [code for code, bar in self._bars.items() if bar[0] < current]:
+            self._closed.setdefault(code, []).append(self._bars.pop(code))
+
+    def close_all(self):
+        """장 마감 후 남은 분봉을 모두 완성 처리"""
+        for code, bar in self._bars.items():
+            self._closed.setdefault(code, []).append(bar)
+        self._bars = {}
+
+    def pop_closed(self):
+        """
+        완성된 분봉을 꺼낸다
+        :return: {종목코드: {'date': int64 ndarray(YYYYMMDDHHMM), 항목: ndarray}}, 과거 -> 최신 순서
+        """
+        closed, self._closed = self._closed, {}
+        dtypes = column_dtypes(BAR_COLUMNS)
+        result = {}
+        for code, bars in closed.items():
+            rows = list(zip(*bars))
+            cols = {'date': np.array(rows[0], dtype=np.int64) + self.date * 10000}
+            for i, col in enumerate(BAR_COLUMNS, 1):
+                cols[col] = np.array(rows[i], dtype=dtypes[col])
+            result[code] = cols
+        return result
+
+
+# 실시간 체결 이벤트 공급자의 기본 클래스
+class TickSource:
+    def subscribe_limit(self):
+        """구독 가능한 종목 수"""
+        raise NotImplementedError
+
+    async def start(self, codes, on_tick):
+        """
+        :param codes: 구독할 종목코드 목록
+        :param on_tick: 체결마다 이벤트 루프 스레드에서 호출할 함수 on_tick(Tick)
+        """
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+
+# Creon DsCbo1.StockCur 실시간 구독
+class _StockCurEvents:
+    def set_params(self, client, on_tick):
+        self.client = client
+        self.on_tick = on_tick
+
+    def OnReceived(self):
+        client = self.client
+        if client.GetHeaderValue(19) != ord('2'):  # 예상체결(동시호가)은 제외, '2':장중 체결
+            return
+        self.on_tick(Tick(client.GetHeaderValue(0), client.GetHeaderValue(18),
+                          client.GetHeaderValue(13), client.GetHeaderValue(17)))
+
+
+class CreonTickSource(TickSource):
+    """
+    종목마다 StockCur 객체를 만들어 Subscribe 한다.
+    이벤트는 backend 의 COM 스레드에서 메시지 처리 중에 들어오므로 이벤트 루프로 넘겨서 처리한다.
+    """
+    def __init__(self, backend=None):
+        self.backend = backend or get_backend()
+        self._objects = []
+
+    def subscribe_limit(self):
+        """남은 실시간 구독 가능 종목 수"""
+        return self.backend.cp_status().GetLimitRemainCount(LT_SUBSCRIBE)
+
+    async def start(self, codes, on_tick):
+        loop = asyncio.get_event_loop()
+
+        def post(tick):
+            loop.call_soon_threadsafe(on_tick, tick)
+
+        def subscribe():
+            for code in codes:
+                obj = self.backend.dispatch_with_events('DsCbo1.StockCur', _StockCurEvents)
+                obj.set_params(obj, post)
+                obj.SetInputValue(0, code)
+                obj.Subscribe()
+                self._objects.append(obj)
+        await self.backend.executor.run(subscribe)
+
+    async def stop(self):
+        def unsubscribe():
+            for obj in self._objects:
+                obj.Unsubscribe()
+            self._objects = []
+        await self.backend.executor.run(unsubscribe)
+
+
+# 테스트용: 미리 준비한 체결을 흘려보내는 공급자
+class FakeTickSource(TickSource):
+    def __init__(self, ticks=(), interval=0.0, limit=400):
+        """
+        :param ticks: 순서대로 보낼 Tick 목록
+        :param interval: 체결 사이 간격(초)
+        :param limit: 구독 가능 종목 수
+        """
+        self.ticks = list(ticks)
+        self.interval = interval
+        self.limit = limit
+        self.codes = []
+        self._on_tick = None
+        self._task = None
+
+    def subscribe_limit(self):
+        return self.limit
+
+    async def start(self, codes, on_tick):
+        self.codes = list(codes)
+        self._on_tick = on_tick
+        self._task = asyncio.ensure_future(self._play())
+
+    async def _play(self):
+        codes = set(self.codes)
+        for tick in self.ticks:
+            if tick.code in codes:
+                self._on_tick(tick)
+            await asyncio.sleep(self.interval)
+
+    def push(self, tick):
+        """직접 체결 1건을 보냄"""
+        self._on_tick(tick)
+
+    async def stop(self):
+        if self._task is not None:
+            await self._task
+            self._task = None
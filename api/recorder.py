@@ -0,0 +1,314 @@
+# coding=utf-8
+import json
+import os
+import struct
+import zlib
+
+from api.backend import CreonBackend
+
+# 페이지 단위로 기록할 Request/Reply 객체: prog_id -> 받아온 데이터 개수가 들어있는 header type
+PAGED_OBJECTS = {
+    'CpSysDib.StockChart': 3,
+    'CpSysDib.StockUniWeek': 1,
+    'CpSysDib.MarketEye': 2,
+}
+# 호출 결과를 기록할 객체의 메소드
+RECORDED_CALLS = {
+    'CpUtil.CpCodeMgr': ('GetStockListByMarket', 'CodeToName', 'GetStockMarketKind',
+                         'GetStockStatusKind', 'GetStockSectionKind'),
+}
+UNIWEEK_FIELD_COUNT = 8
+
+_LENGTH = struct.Struct('<I')
+
+
+def _plain(value):
+    """COM 에서 받은 tuple 등을 JSON 으로 저장할 수 있는 값으로 변환"""
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    return value
+
+
+def request_key(prog_id, inputs, loose=False):
+    """
+    요청을 구분하는 key
+    :param loose: True 면 종목코드/차트 구분/주기만 사용 (개수, 기간이 다른 요청도 같은 것으로 취급)
+    """
+    if loose:
+        inputs = {k: v for k, v in inputs.items() if k in (0, 6, 7)}
+    return json.dumps([prog_id, sorted((int(k), _plain(v)) for k, v in inputs.items())])
+
+
+# capture 파일: [4바이트 길이 + zlib 압축 JSON] 레코드의 나열
+class CaptureWriter:
+    def __init__(self, path):
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self._file = open(path, 'ab')
+
+    def write(self, record):
+        data = zlib.compress(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 6)
+        self._file.write(_LENGTH.pack(len(data)))
+        self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_capture(path):
+    """capture 파일의 레코드를 순서대로 반환"""
+    with open(path, 'rb') as f:
+        while True:
+            head = f.read(_LENGTH.size)
+            if len(head) < _LENGTH.size:
+                break
+            (length,) = _LENGTH.unpack(head)
+            yield json.loads(zlib.decompress(f.read(length)).decode('utf-8'))
+
+
+# 실제 객체를 감싸서 요청 입력값과 받은 페이지를 그대로 기록하는 객체
+class RecordingObject:
+    def __init__(self, obj, prog_id, recorder):
+        self._obj = obj
+        self._prog_id = prog_id
+        self._recorder = recorder
+        self._inputs = {}
+        self._query_id = None
+        self._page_no = 0
+
+    def __getattr__(self, name):
+        return getattr(self._obj, name)
+
+    def SetInputValue(self, type, value):
+        self._inputs[type] = _plain(value)
+        self._query_id = None
+        return self._obj.SetInputValue(type, value)
+
+    def BlockRequest(self):
+        ret = self._obj.BlockRequest()
+        if self._query_id is None:
+            self._query_id = self._recorder.next_query_id()
+            self._page_no = 0
+        obj = self._obj
+        status = obj.GetDibStatus()
+        count = obj.GetHeaderValue(PAGED_OBJECTS[self._prog_id]) if status == 0 else 0
+        if self._prog_id == 'CpSysDib.StockChart':
+            n_fields = len(self._inputs.get(5, [0]))
+            header = {t: _plain(obj.GetHeaderValue(t)) for t in (0, 1, 2, 3)} if status == 0 else {}
+        elif self._prog_id == 'CpSysDib.MarketEye':
+            n_fields = len(self._inputs.get(0, [0]))
+            header = {t: _plain(obj.GetHeaderValue(t)) for t in (0, 1, 2)} if status == 0 else {}
+        else:
+            n_fields = UNIWEEK_FIELD_COUNT
+            header = {t: _plain(obj.GetHeaderValue(t)) for t in (0, 1)} if status == 0 else {}
+        get_data = obj.GetDataValue
+        columns = [[get_data(f, i) for i in range(count)] for f in range(n_fields)]
+        self._recorder.write({
+            'kind': 'page',
+            'prog_id': self._prog_id,
+            'query': self._query_id,
+            'page': self._page_no,
+            'inputs': sorted(self._inputs.items()),
+            'ret': ret,
+            'status': status,
+            'msg': obj.GetDibMsg1(),
+            'continue': int(obj.Continue),
+            'header': sorted(header.items()),
+            'columns': columns,
+        })
+        self._page_no += 1
+        return ret
+
+
+# 메소드 호출 결과를 기록하는 객체 (CpCodeMgr)
+class RecordingCallObject:
+    def __init__(self, obj, prog_id, recorder):
+        self._obj = obj
+        self._prog_id = prog_id
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        attr = getattr(self._obj, name)
+        if name not in RECORDED_CALLS.get(self._prog_id, ()):
+            return attr
+
+        def call(*args):
+            result = attr(*args)
+            self._recorder.write({'kind': 'call', 'prog_id': self._prog_id, 'method': name,
+                                  'args': _plain(args), 'result': _plain(result)})
+            return result
+        return call
+
+
+# 다른 backend 를 감싸서 모든 응답을 capture 파일에 기록하는 backend
+class RecordingBackend(CreonBackend):
+    name = 'record'
+
+    def __init__(self, inner, path):
+        """
+        :param inner: 실제로 요청을 보낼 backend (Win32ComBackend 등)
+        :param path: capture 파일 경로 (이미 있으면 뒤에 이어서 기록)
+        """
+        super().__init__()
+        self.inner = inner
+        self.path = path
+        self._writer = CaptureWriter(path)
+        self._query_id = 0
+
+    def next_query_id(self):
+        self._query_id += 1
+        return '{}-{}'.format(os.getpid(), self._query_id)
+
+    def write(self, record):
+        self._writer.write(record)
+
+    def dispatch(self, prog_id):
+        obj = self.inner.dispatch(prog_id)
+        if prog_id in PAGED_OBJECTS:
+            return RecordingObject(obj, prog_id, self)
+        if prog_id in RECORDED_CALLS:
+            return RecordingCallObject(obj, prog_id, self)
+        return obj
+
+    @property
+    def apartment_threaded(self):
+        return self.inner.apartment_threaded
+
+    def start_client(self, id, pwd, pwdcert):
+        self.inner.start_client(id, pwd, pwdcert)
+
+    def kill_client(self):
+        self.inner.kill_client()
+
+    def thread_init(self):
+        self.inner.thread_init()
+
+    def thread_uninit(self):
+        self.inner.thread_uninit()
+
+    def pump_messages(self):
+        self.inner.pump_messages()
+        self._writer.flush()
+
+    def close(self):
+        super().close()
+        self._writer.close()
+
+
+# 조회 제한이 없는 CpUtil.CpCybos
+class ReplayCybos:
+    IsConnect = 1
+    LimitRequestRemainTime = 0
+
+    def GetLimitRemainCount(self, limit_type):
+        return 1000000
+
+
+# 기록된 페이지를 그대로 돌려주는 Request/Reply 객체
+class ReplayObject:
+    def __init__(self, backend, prog_id):
+        self._backend = backend
+        self._prog_id = prog_id
+        self._inputs = {}
+        self._changed = True
+        self._pages = []
+        self._page = None
+        self.Continue = 0
+
+    def SetInputValue(self, type, value):
+        self._inputs[type] = _plain(value)
+        self._changed = True
+
+    def BlockRequest(self):
+        if self._changed:
+            self._changed = False
+            self._pages = list(self._backend.find_pages(self._prog_id, self._inputs))
+        if not self._pages:
+            self._page = {'ret': 3, 'status': -1, 'msg': 'capture 에 없는 요청입니다.', 'continue': 0,
+                          'header': {}, 'columns': []}
+        else:
+            self._page = self._pages.pop(0)
+        self.Continue = self._page['continue']
+        return self._page['ret']
+
+    def GetDibStatus(self):
+        return self._page['status']
+
+    def GetDibMsg1(self):
+        return self._page['msg']
+
+    def GetHeaderValue(self, type):
+        return self._page['header'].get(type, 0)
+
+    def GetDataValue(self, type, index):
+        return self._page['columns'][type][index]
+
+
+# 기록된 호출 결과를 돌려주는 CpCodeMgr
+class ReplayCallObject:
+    def __init__(self, backend, prog_id):
+        self._backend = backend
+        self._prog_id = prog_id
+
+    def __getattr__(self, name):
+        def call(*args):
+            return self._backend.find_call(self._prog_id, name, args)
+        return call
+
+
+# capture 파일의 응답을 조회 제한 없이 다시 돌려주는 backend
+class ReplayBackend(CreonBackend):
+    name = 'replay'
+
+    def __init__(self, path, loose=True):
+        """
+        :param path: RecordingBackend 로 기록한 capture 파일
+        :param loose: 입력값이 정확히 같은 요청이 없으면 같은 종목/차트 구분의 마지막 요청을 대신 사용
+        """
+        super().__init__()
+        self.loose = loose
+        self._queries = {}  # query id -> [page, ...]
+        self._exact = {}  # request key -> query id (마지막 기록)
+        self._loose = {}
+        self._calls = {}
+        for record in read_capture(path):
+            if record['kind'] == 'call':
+                key = (record['prog_id'], record['method'], json.dumps(record['args']))
+                self._calls[key] = record['result']
+                continue
+            inputs = {int(k): v for k, v in record['inputs']}
+            record['header'] = {int(k): v for k, v in record['header']}
+            self._queries.setdefault(record['query'], []).append(record)
+            self._exact[request_key(record['prog_id'], inputs)] = record['query']
+            self._loose[request_key(record['prog_id'], inputs, loose=True)] = record['query']
+
+    @property
+    def codes(self):
+        """capture 에 들어있는 종목코드 목록"""
+        return sorted({dict((int(k), v) for k, v in pages[0]['inputs']).get(0) for pages in self._queries.values()
+                       if pages[0]['prog_id'] != 'CpSysDib.MarketEye'})
+
+    def find_pages(self, prog_id, inputs):
+        query = self._exact.get(request_key(prog_id, inputs))
+        if query is None and self.loose:
+            query = self._loose.get(request_key(prog_id, inputs, loose=True))
+        return sorted(self._queries.get(query, []), key=lambda page: page['page'])
+
+    def find_call(self, prog_id, method, args):
+        return self._calls.get((prog_id, method, json.dumps(_plain(args))))
+
+    def dispatch(self, prog_id):
+        if prog_id == 'CpUtil.CpCybos':
+            return ReplayCybos()
+        if prog_id in PAGED_OBJECTS:
+            return ReplayObject(self, prog_id)
+        if prog_id in RECORDED_CALLS:
+            return ReplayCallObject(self, prog_id)
+        raise ValueError("Replay backend does not support {}".format(prog_id))
+
+    def start_client(self, id, pwd, pwdcert):
+        pass
@@ -0,0 +1,485 @@
+# coding=utf-8
+import datetime
+import random
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from api.backend import CreonBackend
+
+MINUTES_PER_DAY = 381  # 09:01 ~ 15:20 (380개) + 15:30 종가 1개
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def _uniform(seed, idx, salt):
+    """(seed, idx, salt) 에 대해 항상 같은 [0, 1) 난수 배열 (splitmix64)"""
+    with np.errstate(over='ignore'):  # uint64 곱셈의 overflow 는 의도된 것
+        x = np.asarray(idx).astype(np.uint64) * _GOLDEN
+        x ^= np.uint64((seed * 1000003 + salt * 7919) & 0xFFFFFFFFFFFFFFFF)
+        x ^= x >> np.uint64(30)
+        x *= _MIX1
+        x ^= x >> np.uint64(27)
+        x *= _MIX2
+        x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def weekday_calendar(start_date, end_date):
+    """start_date ~ end_date 사이의 평일을 YYYYMMDD int 배열로 반환 (공휴일은 고려하지 않음)"""
+    start = np.datetime64(datetime.datetime.strptime(str(start_date), '%Y%m%d').date())
+    end = np.datetime64(datetime.datetime.strptime(str(end_date), '%Y%m%d').date())
+    days = np.arange(start, end + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+    days = days[(days.astype(np.int64) + 3) % 7 < 5]  # 1970-01-01 은 목요일
+    years = days.astype('datetime64[Y]').astype(np.int64) + 1970
+    months = days.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    mdays = (days - days.astype('datetime64[M]')).astype(np.int64) + 1
+    return years * 10000 + months * 100 + mdays
+
+
+def minute_time(minute_idx):
+    """하루 중 분봉 순번(0~380)을 hhmm 으로 변환"""
+    minute_idx = np.asarray(minute_idx, dtype=np.int64)
+    elapsed = minute_idx + 1
+    hhmm = (9 + elapsed // 60) * 100 + elapsed % 60
+    return np.where(minute_idx >= MINUTES_PER_DAY - 1, 1530, hhmm)
+
+
+# 종목별로 결정적인(deterministic) 가격을 만들어주는 클래스
+class SimMarket:
+    def __init__(self, end_date, start_date=19900102, n_kospi=900, n_kosdaq=1700,
+                 halted_ratio=0.02, minute_days=500, seed=0):
+        """
+        :param end_date: 가장 최근 거래일 (YYYYMMDD)
+        :param minute_days: 분봉을 제공하는 최근 거래일 수
+        """
+        self.seed = seed
+        self.calendar = weekday_calendar(start_date, end_date)
+        self.minute_days = minute_days
+        self.codes = {
+            1: ['A{:06d}'.format(10 + i * 10) for i in range(n_kospi)],
+            2: ['A{:06d}'.format(100005 + i * 10) for i in range(n_kosdaq)],
+        }
+        self.market_kind = {}
+        for market, codes in self.codes.items():
+            for code in codes:
+                self.market_kind[code] = market
+        self.halted_ratio = halted_ratio
+
+    def code_seed(self, code):
+        return zlib.crc32(code.encode()) ^ self.seed
+
+    def is_index(self, code):
+        return code.startswith('U')
+
+    def status(self, code):
+        """0:정상, 1:거래정지, 2:거래중단"""
+        return 1 if _uniform(self.code_seed(code), 0, 99) < self.halted_ratio else 0
+
+    def name(self, code):
+        if code == 'U001':
+            return 'KOSPI'
+        if code == 'U201':
+            return 'KOSDAQ'
+        return '시뮬{}'.format(code[1:])
+
+    def day_index(self, date, side='right'):
+        """
+        date(YYYYMMDD) 에 해당하는 calendar 위치
+        side='right': date 이하의 마지막 거래일, side='left': date 이상의 첫 거래일
+        """
+        if side == 'right':
+            return int(np.searchsorted(self.calendar, date, side='right')) - 1
+        return int(np.searchsorted(self.calendar, date, side='left'))
+
+    def listing_index(self, code):
+        """상장일 calendar 위치. 30% 정도는 최근에 상장된 것으로 처리"""
+        seed = self.code_seed(code)
+        if self.is_index(code) or _uniform(seed, 1, 98) >= 0.3:
+            return 0
+        return int(_uniform(seed, 2, 97) * (len(self.calendar) - 1))
+
+    def shares(self, code):
+        """상장주식수"""
+        return 1000000 + self.code_seed(code) % 100000000
+
+    def minute_start_index(self, code):
+        return max(self.listing_index(code), len(self.calendar) - self.minute_days)
+
+    def daily(self, code, day_idx):
+        """day_idx(calendar 위치 배열)에 해당하는 일봉 {항목: ndarray}"""
+        seed = self.code_seed(code)
+        day_idx = np.asarray(day_idx, dtype=np.int64)
+        t = day_idx.astype(np.float64)
+        phase = (seed % 1000) / 1000.0 * 2 * np.pi
+        base = (1000 + seed % 2000) if self.is_index(code) else (2000 + seed % 80000)
+        trend = 0.35 * np.sin(t / 480 + phase) + 0.15 * np.sin(t / 61 + phase * 3) + 0.05 * np.sin(t / 7.3 + phase * 7)
+        close = base * np.exp(trend + 0.03 * (_uniform(seed, day_idx, 1) - 0.5))
+        open_ = close * (1 + 0.02 * (_uniform(seed, day_idx, 2) - 0.5))
+        high = np.maximum(open_, close) * (1 + 0.015 * _uniform(seed, day_idx, 3))
+        low = np.minimum(open_, close) * (1 - 0.015 * _uniform(seed, day_idx, 4))
+        volume = (1000 + 2000000 * _uniform(seed, day_idx, 5) * (1.2 + np.sin(t / 23 + phase))).astype(np.int64)
+        prices = [open_, high, low, close]
+        if self.is_index(code):
+            prices = [np.round(p, 2) for p in prices]
+        else:
+            prices = [np.round(p).astype(np.int64) for p in prices]
+        shares = self.shares(code)
+        return {
+            'date': self.calendar[day_idx],
+            'time': np.zeros(len(day_idx), dtype=np.int64),
+            'open': prices[0],
+            'high': prices[1],
+            'low': prices[2],
+            'close': prices[3],
+            'volume': volume,
+            'value': (volume * prices[3]).astype(np.int64),
+            'marketC': (prices[3] * shares).astype(np.int64),
+        }
+
+    def minute(self, code, minute_pos):
+        """minute_pos(= day_idx * 381 + 분봉 순번) 배열에 해당하는 1분봉 {항목: ndarray}"""
+        seed = self.code_seed(code)
+        minute_pos = np.asarray(minute_pos, dtype=np.int64)
+        day_idx = minute_pos // MINUTES_PER_DAY
+        minute_idx = minute_pos % MINUTES_PER_DAY
+        day = self.daily(code, day_idx)
+        o = day['open'].astype(np.float64)
+        c = day['close'].astype(np.float64)
+        h = day['high'].astype(np.float64)
+        l = day['low'].astype(np.float64)
+        frac = (minute_idx + 1) / float(MINUTES_PER_DAY)
+        swing = (h - l) * 0.3 * np.sin(minute_idx / 17.0 + (seed % 360))
+        close = np.clip(o + (c - o) * frac + swing * (1 - frac) + (h - l) * 0.1 * (_uniform(seed, minute_pos, 11) - 0.5), l, h)
+        close = np.where(minute_idx == MINUTES_PER_DAY - 1, c, close)
+        open_ = np.clip(close * (1 + 0.002 * (_uniform(seed, minute_pos, 12) - 0.5)), l, h)
+        high = np.minimum(np.maximum(open_, close) * (1 + 0.001 * _uniform(seed, minute_pos, 13)), h)
+        low = np.maximum(np.minimum(open_, close) * (1 - 0.001 * _uniform(seed, minute_pos, 14)), l)
+        volume = (day['volume'] / MINUTES_PER_DAY * (0.5 + _uniform(seed, minute_pos, 15))).astype(np.int64)
+        prices = [open_, high, low, close]
+        if self.is_index(code):
+            prices = [np.round(p, 2) for p in prices]
+        else:
+            prices = [np.round(p).astype(np.int64) for p in prices]
+        return {
+            'date': day['date'],
+            'time': minute_time(minute_idx),
+            'open': prices[0],
+            'high': prices[1],
+            'low': prices[2],
+            'close': prices[3],
+            'volume': volume,
+            'value': (volume * prices[3]).astype(np.int64),
+            'marketC': day['marketC'],
+        }
+
+
+# 요청 제한과 접속 상태를 관리하는 CpUtil.CpCybos
+class SimCybos:
+    def __init__(self, limit=60, window=15.0, clock=time.monotonic):
+        self.IsConnect = 1
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+        self._window_start = None
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def _roll(self):
+        now = self._clock()
+        if self._window_start is None or now - self._window_start >= self.window:
+            self._window_start = now
+            self._used = 0
+        return now
+
+    def consume(self):
+        """요청 1건을 사용. 제한을 넘으면 False"""
+        with self._lock:
+            self._roll()
+            if self._used >= self.limit:
+                return False
+            self._used += 1
+            return True
+
+    def GetLimitRemainCount(self, limit_type):
+        with self._lock:
+            self._roll()
+            return self.limit - self._used
+
+    @property
+    def LimitRequestRemainTime(self):
+        with self._lock:
+            now = self._roll()
+            return int(max(self.window - (now - self._window_start), 0) * 1000)
+
+
+# CpUtil.CpCodeMgr
+class SimCodeMgr:
+    def __init__(self, market):
+        self.market = market
+
+    def GetStockListByMarket(self, market):
+        return tuple(self.market.codes.get(market, []))
+
+    def CodeToName(self, code):
+        return self.market.name(code)
+
+    def GetStockMarketKind(self, code):
+        return self.market.market_kind.get(code, 0)
+
+    def GetStockStatusKind(self, code):
+        return self.market.status(code)
+
+    def GetStockSectionKind(self, code):
+        return 1  # 주권
+
+
+# Request/Reply 객체의 공통 동작: 입력값, 페이지, 통신상태, 지연/오류 주입
+class SimRequestObject:
+    page_size = 2856
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.market = backend.market
+        self._inputs = {}
+        self._inputs_changed = True
+        self._rows = None  # 남은 행 위치 (최신 -> 과거)
+        self._page = {}
+        self._page_len = 0
+        self._header = {}
+        self._dib_status = 0
+        self._dib_msg = ''
+        self.Continue = 0
+
+    def SetInputValue(self, type, value):
+        self._inputs[type] = value
+        self._inputs_changed = True
+
+    def GetDibStatus(self):
+        return self._dib_status
+
+    def GetDibMsg1(self):
+        return self._dib_msg
+
+    def GetHeaderValue(self, type):
+        return self._header.get(type, 0)
+
+    def GetDataValue(self, type, index):
+        return self._page[type][index]
+
+    def _fail(self, msg, ret):
+        self._dib_status = -1
+        self._dib_msg = msg
+        self._page = {}
+        self._page_len = 0
+        self._header = {}
+        self.Continue = 0
+        return ret
+
+    def BlockRequest(self):
+        backend = self.backend
+        backend.request_count += 1
+        if not backend.cp_status().consume():
+            backend.throttled_count += 1
+            return self._fail('조회 요청 제한 개수를 초과하였습니다.', 4)
+        if backend.latency > 0:
+            backend.sleep(backend.latency * (0.5 + backend.random.random()))
+        if backend.error_rate > 0 and backend.random.random() < backend.error_rate:
+            backend.error_count += 1
+            return self._fail('시뮬레이터 통신 오류', 1)
+
+        if self._inputs_changed:
+            self._inputs_changed = False
+            self._rows = self._plan_rows()
+            if self._rows is None:
+                return self._fail('지원하지 않는 입력값입니다.', 3)
+
+        rows, self._rows = self._rows[:self.page_size], self._rows[self.page_size:]
+        self._page = self._make_page(rows)
+        self._page_len = len(rows)
+        self._dib_status = 0
+        self._dib_msg = '정상처리되었습니다.'
+        self.Continue = 1 if len(self._rows) > 0 else 0
+        return 0
+
+    def _plan_rows(self):
+        """요청에 해당하는 모든 행 위치를 최신 -> 과거 순서로 반환"""
+        raise NotImplementedError
+
+    def _make_page(self, rows):
+        """{GetDataValue type: 값 list}"""
+        raise NotImplementedError
+
+
+# CpSysDib.StockChart
+class SimStockChart(SimRequestObject):
+    # SetInputValue(5, ...) 필드 번호 -> 항목
+    FIELDS = {0: 'date', 1: 'time', 2: 'open', 3: 'high', 4: 'low', 5: 'close', 8: 'volume', 9: 'value', 13: 'marketC'}
+
+    def _plan_rows(self):
+        code = self._inputs.get(0)
+        chart = chr(self._inputs.get(6, ord('D')))
+        if chart not in ('D', 'm') or (chart == 'm' and self._inputs.get(7, 1) != 1):
+            return None
+        self._chart = chart
+        self._code = code
+        market = self.market
+        end_date = self._inputs.get(2, 0) or int(market.calendar[-1])
+        end_day = market.day_index(end_date)
+        if chart == 'D':
+            first, last = market.listing_index(code), end_day
+        else:
+            first = market.minute_start_index(code) * MINUTES_PER_DAY
+            last = end_day * MINUTES_PER_DAY + MINUTES_PER_DAY - 1
+        if self._inputs.get(1, ord('2')) == ord('1'):  # 기간으로 받기
+            start_day = market.day_index(self._inputs.get(3, 0), side='left')
+            first = max(first, start_day if chart == 'D' else start_day * MINUTES_PER_DAY)
+        else:  # 개수로 받기
+            first = max(first, last - self._inputs.get(4, 0) + 1)
+        if last < first:
+            return np.empty(0, dtype=np.int64)
+        return np.arange(last, first - 1, -1, dtype=np.int64)
+
+    def _make_page(self, rows):
+        if self._chart == 'D':
+            data = self.market.daily(self._code, rows)
+        else:
+            data = self.market.minute(self._code, rows)
+        fields = list(self._inputs.get(5, [0]))
+        self._header = {0: self._code, 1: len(fields), 2: tuple(fields), 3: len(rows)}
+        page = {}
+        for type, field in enumerate(fields):
+            col = self.FIELDS.get(field)
+            page[type] = data[col].tolist() if col else [0] * len(rows)
+        return page
+
+
+# CpSysDib.StockUniWeek (시간외 단일가 일자별)
+class SimStockUniWeek(SimRequestObject):
+    page_size = 60
+    history_days = 250
+
+    def _plan_rows(self):
+        code = self._inputs.get(0)
+        market = self.market
+        last = len(market.calendar) - 1
+        first = max(market.listing_index(code) + 1, last - self.history_days + 1)
+        self._code = code
+        return np.arange(last, first - 1, -1, dtype=np.int64)
+
+    def _make_page(self, rows):
+        seed = self.market.code_seed(self._code)
+        close = self.market.daily(self._code, rows)['close'].astype(np.float64)
+        prev_close = self.market.daily(self._code, rows - 1)['close'].astype(np.float64)
+        uni_close = np.round(close * (1 + 0.02 * (_uniform(seed, rows, 21) - 0.5)))
+        diff = uni_close - close
+        diff_rate = np.round(diff / prev_close * 100, 2)
+        self._header = {0: self._code, 1: len(rows)}
+        return {
+            0: self.market.calendar[rows].tolist(),
+            1: close.astype(np.int64).tolist(),
+            2: np.maximum(close, uni_close).astype(np.int64).tolist(),
+            3: np.minimum(close, uni_close).astype(np.int64).tolist(),
+            4: uni_close.astype(np.int64).tolist(),
+            5: diff.astype(np.int64).tolist(),
+            6: diff_rate.tolist(),
+            7: [ord('2')] * len(rows),
+        }
+
+
+# CpSysDib.MarketEye (여러 종목의 현재 시세를 한 번에 조회)
+class SimMarketEye(SimRequestObject):
+    page_size = 200
+    # 필드 번호 -> 항목. 실제와 같이 요청 순서와 관계없이 필드 번호 순서로 돌려준다.
+    FIELDS = {0: 'code', 1: 'time', 4: 'close', 5: 'open', 6: 'high', 7: 'low', 10: 'volume', 11: 'value', 20: 'shares'}
+
+    def _plan_rows(self):
+        codes = list(self._inputs.get(1, []))
+        if len(codes) > self.page_size:
+            return None
+        self._codes = codes
+        return np.arange(len(codes), dtype=np.int64)
+
+    def _make_page(self, rows):
+        market = self.market
+        last = len(market.calendar) - 1
+        fields = sorted(self._inputs.get(0, [0]))
+        self._header = {0: len(fields), 1: tuple(fields), 2: len(rows)}
+        columns = {field: [] for field in fields}
+        for row in rows:
+            code = self._codes[row]
+            listed = code in market.market_kind and market.listing_index(code) <= last
+            day = market.daily(code, [last]) if listed else None
+            for field in fields:
+                col = self.FIELDS.get(field)
+                if col == 'code':
+                    value = code
+                elif col == 'time':
+                    value = 1530 if listed else 0
+                elif col == 'shares':
+                    value = market.shares(code) if listed else 0
+                elif col and listed:
+                    value = int(day[col][0])
+                else:
+                    value = 0
+                columns[field].append(value)
+        return {type: columns[field] for type, field in enumerate(fields)}
+
+
+# Creon Plus 없이 동작하는 시뮬레이터 backend
+class SimulatorBackend(CreonBackend):
+    """
+    - 수천 종목의 결정적인 합성 OHLCV 제공 (같은 인자면 언제나 같은 데이터)
+    - SetInputValue / BlockRequest / GetHeaderValue / GetDataValue / Continue 연속 조회 지원
+    - limit / window 로 실제와 같은 조회 제한 적용 (초과 시 GetDibStatus() == -1)
+    - latency(초), error_rate 로 지연과 통신 오류 주입
+    """
+    name = 'simulator'
+
+    def __init__(self, end_date=None, n_kospi=900, n_kosdaq=1700, minute_days=500, limit=60, window=15.0,
+                 latency=0.0, error_rate=0.0, seed=0, clock=time.monotonic, sleep=time.sleep):
+        super().__init__()
+        if end_date is None:
+            today = datetime.date.today()
+            while today.weekday() >= 5:
+                today -= datetime.timedelta(days=1)
+            end_date = int(today.strftime('%Y%m%d'))
+        self.market = SimMarket(end_date, n_kospi=n_kospi, n_kosdaq=n_kosdaq, minute_days=minute_days, seed=seed)
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.clock = clock
+        self.sleep = sleep
+
+        # 통계
+        self.request_count = 0
+        self.throttled_count = 0
+        self.error_count = 0
+
+    def dispatch(self, prog_id):
+        if prog_id == 'CpUtil.CpCybos':
+            # 조회 제한은 프로세스 전체에서 공유되므로 항상 같은 객체를 반환
+            if self._cp_status is None:
+                self._cp_status = SimCybos(self.limit, self.window, self.clock)
+            return self._cp_status
+        if prog_id == 'CpUtil.CpCodeMgr':
+            return SimCodeMgr(self.market)
+        if prog_id == 'CpSysDib.StockChart':
+            return SimStockChart(self)
+        if prog_id == 'CpSysDib.StockUniWeek':
+            return SimStockUniWeek(self)
+        if prog_id == 'CpSysDib.MarketEye':
+            return SimMarketEye(self)
+        raise ValueError("Simulator does not support {}".format(prog_id))
+
+    def start_client(self, id, pwd, pwdcert):
+        self.cp_status().IsConnect = 1
+
+    def kill_client(self):
+        self.cp_status().IsConnect = 0
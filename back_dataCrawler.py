@@ -15,7 +15,7 @@ from pymongo import UpdateOne
 import pandas as pd
 import tqdm
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 
 
 log = setup_logger()  # 로거 설정
@@ -46,7 +46,7 @@ class MainWindow():
         self.db_view_model = None
 
         # 시간외단일가 수집 잘 못 했을 때 삭제하는 코드
-        # self.db_handler.delete_column("sp_day", "diff_rate")
+        # python -m util.maintenance --unset diff_rate --db sp_day
         # sp_day 의 특정 날짜의 수집 데이터 삭제하기
         # condition = {"date": 20240516}
         # collections = self.db_handler.list_collections("sp_day")
@@ -57,7 +57,7 @@ class MainWindow():
         self.code_name_list_update()
         print("종목코드 및 종목명 업데이트 완료")  # self.sv_code_df
         return
-        # self.db_name = ['sp_day', 'sp_1min','sp_week', 'sp_month']
+        # 주봉, 월봉은 python -m util.resampler 로 sp_day 에서 만든다
         # self.db_name = ['sp_day','sp_1min']
         self.db_name = ['sp_1min', 'sp_day']
         # self.db_name = ['sp_day']
@@ -175,16 +175,8 @@ class MainWindow():
         if db_latest_list:
             if self.db_name == 'sp_1min': # 1분봉인 경우
                 print("======== 1min 수집중 입니다.========")
-            elif self.db_name == 'sp_3min': # 3분봉인 경우
-                print("======== 3min 수집중 입니다.======== ")
-            elif self.db_name == 'sp_5min': # 5분봉인 경우
-                print("======== 5min 수집중 입니다.======== ")
             elif self.db_name == 'sp_day': # 일봉인 경우    
                 print("======== 일봉 수집중 입니다.======== ")
-            elif self.db_name == 'sp_week': # 주봉인 경우    
-                print("======== 주봉 수집중 입니다.======== ")
-            elif self.db_name == 'sp_month': # 월봉인 경우
-                print("======== 월봉 수집중 입니다.======== ")
             elif self.db_name == None:
                 print("======== 없는 DB 입니다.======== ")
             else: # 그 외 다른값인 경우
@@ -205,30 +197,12 @@ class MainWindow():
             count = 2000  # 서버 데이터 최대 reach 약 18.5만 이므로 (18/02/25 기준)
             tick_range = 1
             columns=['open', 'high', 'low', 'close', 'volume', 'value'] # 2024.05.05
-        elif self.db_name == 'sp_3min': # 3분봉
-            tick_unit = '분봉'
-            count = 2000
-            tick_range = 3
-            columns=['open', 'high', 'low', 'close', 'volume', 'value'] # 2024.05.05
-        elif self.db_name == 'sp_5min': # 5분봉
-            tick_unit = '분봉'
-            count = 2000
-            tick_range = 5
-            columns=['open', 'high', 'low', 'close', 'volume', 'value'] # 2024.05.05
         elif self.db_name == 'sp_day': # 일봉
             tick_unit = '일봉'
             count = 14  # 10000개면 현재부터 1980년 까지의 데이터에 해당함. 충분.
             tick_range = 1
             columns=['open', 'high', 'low', 'close', 'volume', 'value', 'marketC'] # 2024.05.05
-        elif self.db_name == 'sp_week': # 주봉
-            tick_unit = '주봉'
-            count = 2000 # 2000
-            columns=['open', 'high', 'low', 'close', 'volume', 'value'] # 2024.05.05
-        elif self.db_name == 'sp_month': # 월봉
-            tick_unit = '월봉'
-            count = 500 # 500
-            columns=['open', 'high', 'low', 'close', 'volume', 'value'] # 2024.05.05
-        else: # 없음
+        else: # 3/5분봉, 주봉, 월봉은 util.resampler 가 DB 의 1분봉/일봉으로 만든다
             raise ValueError("Invalid database name provided")
         
         # 분봉/일봉에 대해서만 아래 코드가 효과가 있음.
@@ -238,15 +212,7 @@ class MainWindow():
             if tick_unit == '일봉':
                 latest_date = latest_date // 10000  # 나머지를 버리고 정수 부분만 반환
                 log.info("일봉일 때 10000 으로 나누고 정수 반환값 : %s", latest_date)
-            elif tick_unit == '월봉':
-                latest_date = latest_date // 1000000  # 나머지를 버리고 정수 부분만 반환
-                latest_date = latest_date * 100
-                log.info("월봉일 때 10000 으로 나누고 곱하기 100 후 정수 반환값 : %s", latest_date)
-            elif tick_unit == '주봉':
-                latest_date = latest_date // 10000
-                latest_date = int(self.get_weekly_date(latest_date))
-                log.info("주봉일 때 연도와 주차 반환값 : %s", latest_date)
-                
+
             # 이미 DB 데이터가 최신인 종목들은 가져올 목록에서 제외한다
             already_up_to_date_codes = db_code_df[db_code_df['갱신날짜'] == latest_date]['종목코드'].values
             log.info("이미 데이터가 최신인 종목들 : %s", already_up_to_date_codes)
@@ -281,12 +247,6 @@ class MainWindow():
             elif tick_unit == '일봉':  # 일봉 데이터 받기
                 if self.objStockChart.RequestDWM(code[0], 'D', count, self, from_date) == False:
                     continue
-            elif tick_unit == '주봉':  #주봉 데이터 받기
-                if self.objStockChart.RequestDWM(code[0], 'W', count, self, from_date) == False:
-                    continue
-            elif tick_unit == '월봉':  # 월봉 데이터 받기
-                if self.objStockChart.RequestDWM(code[0], 'M', count, self, from_date) == False:
-                    continue
             
             df = pd.DataFrame(self.rcv_data, columns=columns, index=self.rcv_data['date'])
             df = df.loc[:from_date].iloc[:-1] if from_date != 0 else df
@@ -321,27 +281,6 @@ class MainWindow():
         self.connect_code_list_view()
         print("============= 가격 데이터 수집 완료 ===================")
         
-    def get_weekly_date(self, latest_date):
-        latest_date_str = str(latest_date)
-        date_object = datetime.strptime(latest_date_str, '%Y%m%d')
-        
-        # 해당 월의 첫 날
-        first_day_of_month = datetime(date_object.year, date_object.month, 1)
-        
-        # 해당 월의 첫 번째 일요일 찾기
-        first_sunday = first_day_of_month + timedelta(days=(6 - first_day_of_month.weekday()))
-        
-        # 주차 계산 (첫 일요일 이전 날짜들은 첫 주차로 계산)
-        if date_object < first_sunday:
-            week_of_month = 1
-        else:
-            week_of_month = ((date_object - first_sunday).days // 7) + 1
-        
-        # 날짜 형식 YYYYMMWW (WW는 주차 * 10)
-        formatted_date = f"{date_object.year}{date_object.month:02}{week_of_month * 10}"
-        
-        return formatted_date
-
     # sp_day 에 marketC 컬럼을 추가
     def update_marketC_col(self):
         
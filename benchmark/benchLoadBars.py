@@ -0,0 +1,76 @@
+# coding=utf-8
+"""
+저장된 분봉을 읽는 속도 비교: find_items (문서 dict 목록 -> DataFrame) / load_bars (컬럼 배열) / iter_bars
+시뮬레이터로 한 종목의 분봉을 만들어 임시 DB 에 저장한 뒤 같은 범위를 읽는다.
+
+python benchmark/benchLoadBars.py --mongo mongodb://localhost:27017 --days 500
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from api.creonAPI import CpStockChart
+from api.rateLimiter import CpRateLimiter
+from api.simulator import SimulatorBackend
+from util.MongoDBHandler import MongoDBHandler, BAR_FIELDS, declare_index
+from util.barStore import TickerBarStore
+from util.chartFrame import chart_bars
+
+BENCH_DB = 'bench_load_bars'
+CODE = 'A000010'
+
+declare_index(BENCH_DB, [('date', 1)], 'date_1', unique=True)
+
+
+async def make_pages(days):
+    backend = SimulatorBackend(end_date=20240809, n_kospi=1, n_kosdaq=0, minute_days=days, sleep=lambda s: None)
+    chart = CpStockChart(CpRateLimiter(capacity=10 ** 9, window=1.0), backend)
+    return [chart_bars(page, list(BAR_FIELDS)) async for page in chart.StreamMT(CODE, 'm', 1, 200000)]
+
+
+def find_items_frame(handler):
+    docs = handler.find_items({}, db_name=BENCH_DB, collection_name=CODE, sort=[('date', 1)], projection={'_id': 0})
+    df = pd.DataFrame(docs)
+    df.index = pd.to_datetime(df['date'].astype(str), format='%Y%m%d%H%M')
+    return df
+
+
+def load_bars_frame(handler):
+    return handler.load_bars(CODE, freq=BENCH_DB, as_frame=True)
+
+
+def iter_bars_rows(handler):
+    return sum(len(bars['date']) for bars in handler.iter_bars(CODE, freq=BENCH_DB))
+
+
+def main(args):
+    handler = MongoDBHandler('bulk', uri=args.mongo)
+    handler._client.drop_database(BENCH_DB)
+    store = TickerBarStore(handler, BENCH_DB)
+    for bars in asyncio.run(make_pages(args.days)):
+        store.write(store.prepare(CODE, bars, watermark=0))
+    rows = handler._client[BENCH_DB][CODE].count_documents({})
+    print("{}행".format(rows))
+    try:
+        for name, func in (('find_items', find_items_frame), ('load_bars', load_bars_frame),
+                           ('iter_bars', iter_bars_rows)):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                func(handler)
+            elapsed = (time.perf_counter() - start) / args.repeat
+            print("{:<11} {:>8.3f}s {:>12.0f} rows/s".format(name, elapsed, rows / elapsed))
+    finally:
+        handler._client.drop_database(BENCH_DB)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mongo', default='mongodb://localhost:27017', help='측정할 MongoDB URI')
+    parser.add_argument('--days', type=int, default=500, help='분봉 거래일 수 (하루 381행)')
+    parser.add_argument('--repeat', type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,70 @@
+# coding=utf-8
+"""
+MongoDBHandler 연결 설정(safe / bulk)별로 처음 전체 기간 분봉을 적재하는 속도(documents/sec)를 비교한다.
+시뮬레이터로 한 종목의 분봉을 만든 뒤 종목코드만 바꿔 여러 종목을 TickerBarStore 로 저장한다.
+bulk 는 인덱스를 지우고 적재한 뒤 다시 만드는 시간까지 포함한다.
+
+python benchmark/benchMongoProfile.py --mongo mongodb://localhost:27017 --codes 20 --days 500
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.creonAPI import CpStockChart
+from api.rateLimiter import CpRateLimiter
+from api.simulator import SimulatorBackend
+from util.MongoDBHandler import MongoDBHandler, MONGO_PROFILES, declare_index
+from util.barStore import TickerBarStore
+from util.chartFrame import chart_bars
+
+BENCH_DB = 'bench_mongo_profile'
+COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'value']
+
+declare_index(BENCH_DB, [('date', 1)], 'date_1', unique=True)
+
+
+async def make_pages(days):
+    """한 종목의 분봉 페이지 목록 (최신 페이지부터)"""
+    backend = SimulatorBackend(end_date=20240809, n_kospi=1, n_kosdaq=0, minute_days=days, sleep=lambda s: None)
+    chart = CpStockChart(CpRateLimiter(capacity=10 ** 9, window=1.0), backend)
+    return [chart_bars(page, COLUMNS) async for page in chart.StreamMT('A000010', 'm', 1, 200000)]
+
+
+def load(profile, uri, pages, n_codes):
+    handler = MongoDBHandler(profile, uri=uri)
+    handler._client.drop_database(BENCH_DB)
+    store = TickerBarStore(handler, BENCH_DB)
+    start = time.perf_counter()
+    with handler.bulk_load(BENCH_DB):
+        for i in range(n_codes):
+            code = 'A{:06d}'.format(i)
+            for bars in pages:
+                store.write(store.prepare(code, bars, watermark=0))
+    handler.wait_index_builds()
+    elapsed = time.perf_counter() - start
+    handler._client.drop_database(BENCH_DB)
+    return store.stats, elapsed
+
+
+def main(args):
+    pages = asyncio.run(make_pages(args.days))
+    rows = sum(len(bars['date']) for bars in pages) * args.codes
+    print("종목 {}개 x {}행 = {}행".format(args.codes, rows // args.codes, rows))
+    for profile in args.profile or list(MONGO_PROFILES):
+        stats, elapsed = load(profile, args.mongo, pages, args.codes)
+        print("[{}] {:>8.2f}s {:>10.0f} docs/s (insert {}, upsert {})".format(
+            profile, elapsed, rows / elapsed, stats.inserted, stats.upserted))
+        for line in stats.report():
+            print("    " + line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mongo', default='mongodb://localhost:27017', help='측정할 MongoDB URI')
+    parser.add_argument('--codes', type=int, default=20, help='적재할 종목 수')
+    parser.add_argument('--days', type=int, default=500, help='종목당 분봉 거래일 수 (하루 381행)')
+    parser.add_argument('--profile', choices=list(MONGO_PROFILES), action='append', help='측정할 profile (기본: 전체)')
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+# coding=utf-8
+"""
+capture 파일을 조회 제한 없이 replay 하여 가격 수집 파이프라인(fetch_price -> transform_price -> write_price)의
+요청(디코딩) -> 컬럼 배열 -> 저장 문서 생성 -> DB 저장 단계별 시간을 측정한다.
+--insert 를 주면 새 종목을 처음 받는 경우처럼 unique date 인덱스에 insert_many 로 저장한다 (기본은 upsert).
+
+python benchmark/benchReplay.py capture.bin --freq m --mongo mongodb://localhost:27017 [--insert]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.creonAPI import CpStockChart
+from api.rateLimiter import CpRateLimiter
+from api.recorder import ReplayBackend
+from util.chartFrame import chart_bars, bar_documents, upsert_operation
+
+COLUMNS = {
+    'm': ['open', 'high', 'low', 'close', 'volume', 'value'],
+    'D': ['open', 'high', 'low', 'close', 'volume', 'value', 'marketC'],
+}
+
+
+async def run(args):
+    backend = ReplayBackend(args.capture)
+    chart = CpStockChart(CpRateLimiter(capacity=10 ** 9, window=1.0), backend)
+    collection_db = None
+    if args.mongo:
+        from pymongo import MongoClient
+        collection_db = MongoClient(args.mongo)['bench_replay']
+
+    elapsed = {'request': 0.0, 'bars': 0.0, 'documents': 0.0, 'write': 0.0}
+    rows = 0
+    codes = backend.codes[:args.limit] if args.limit else backend.codes
+    for code in codes:
+        t0 = time.perf_counter()
+        if args.freq == 'm':
+            result = await chart.RequestMT(code, 'm', 1, 200000)
+        else:
+            result = await chart.RequestDWM(code, 'D', 14)
+        t1 = time.perf_counter()
+        elapsed['request'] += t1 - t0
+        if not result:
+            continue
+        bars = chart_bars(result, COLUMNS[args.freq])
+        t2 = time.perf_counter()
+        docs = bar_documents(bars)
+        operations = docs if args.insert else [upsert_operation(doc) for doc in docs]
+        t3 = time.perf_counter()
+        if collection_db is not None and operations:
+            collection_db[code].create_index('date', name='date_1', unique=True)
+            if args.insert:
+                collection_db[code].insert_many(operations, ordered=False)
+            else:
+                collection_db[code].bulk_write(operations, ordered=False)
+        t4 = time.perf_counter()
+        elapsed['bars'] += t2 - t1
+        elapsed['documents'] += t3 - t2
+        elapsed['write'] += t4 - t3
+        rows += len(bars['date'])
+
+    if collection_db is not None:
+        collection_db.client.drop_database('bench_replay')
+
+    total = sum(elapsed.values())
+    print("종목 {}개, {}행".format(len(codes), rows))
+    for stage, seconds in elapsed.items():
+        if stage == 'write' and collection_db is None:
+            continue
+        share = seconds / total * 100 if total else 0
+        print("{:<12} {:>9.3f}s {:>6.1f}%  {:>12.0f} rows/s".format(stage, seconds, share, rows / seconds if seconds else 0))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('capture', help='RecordingBackend 로 기록한 capture 파일')
+    parser.add_argument('--freq', choices=['m', 'D'], default='m')
+    parser.add_argument('--mongo', default=None, help='DB 저장까지 측정할 MongoDB URI')
+    parser.add_argument('--insert', action='store_true', help='upsert 대신 insert_many 로 저장')
+    parser.add_argument('--limit', type=int, default=0, help='측정할 최대 종목 수')
+    asyncio.run(run(parser.parse_args()))
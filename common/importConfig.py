@@ -1,11 +1,14 @@
 import configparser
 import os
 
+# 프로젝트 경로. Windows 수집 PC 가 아닌 곳(시뮬레이터 등)에서는 환경변수로 지정
+BASE_DIR = os.environ.get('STOCK_API_CRAWLING_HOME', 'C:\\Dev\\stock-api-crawling')
+
 class importConfig:
     def __init__(self):
         self.config = configparser.ConfigParser()
         # config.ini 파일의 경로를 지정
-        self.config.read(os.path.join('C:\\Dev\\stock-api-crawling\\config', 'config.ini'))
+        self.config.read(os.path.join(BASE_DIR, 'config', 'config.ini'))
 
     def select_section(self, section):
         # 각 섹션에 맞는 값을 딕셔너리로 반환
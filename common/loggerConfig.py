@@ -1,4 +1,6 @@
 import logging
+import os
+from common.importConfig import BASE_DIR
 
 def setup_logger():
     # 로거 생성
@@ -6,7 +8,7 @@ def setup_logger():
     logger.setLevel(logging.INFO)  # 로그 레벨 설정
 
     # 파일 핸들러 설정
-    file_handler = logging.FileHandler('C:\\Dev\\stock-api-crawling\\log\\statusbar.log', encoding='utf-8')
+    file_handler = logging.FileHandler(os.path.join(BASE_DIR, 'log', 'statusbar.log'), encoding='utf-8')
     formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     file_handler.setFormatter(formatter)
 
@@ -1,24 +1,54 @@
 import sys
+import os
 import gc
+import argparse
 import asyncio
+from functools import partial
+import numpy as np
 import pandas as pd
 import tqdm
 from datetime import datetime, timedelta, time as dt_time
 from time import sleep
 
-from api.creonAPI import CpStockChart, CpCodeMgr, CpStockUniWeek
+from api.backend import create_backend, set_backend
+from api.recorder import RecordingBackend
+from api.creonAPI import CpStockChart, CpCodeMgr, CpStockUniWeek, CpMarketEye
 from common.loggerConfig import setup_logger
 from util.autoLogin import autoLogin
 from util.MongoDBHandler import MongoDBHandler
-from util.utils import is_market_open, available_latest_date, preformat_cjk
-from pymongo import UpdateOne
+from util.utils import is_market_open, available_latest_date, preformat_cjk, gap_start_date, fetch_range
+from util.chartFrame import chart_to_frame, chart_bars
+from util.pipeline import Pipeline
+from util.watermark import WatermarkStore
+from util.barStore import open_bar_store, FieldUpdates
+from util.dailySnapshot import DailySnapshotStore
+from util.resampler import Resampler, RESAMPLE_TARGETS
+from util.codeMaster import diff_code_master, outtime_worklist
+from util.maintenance import MaintenanceRunner, DeleteDay, UnsetField
+from api.realtime import incomplete_session_codes
 from util.alarm.selfTelegram import selfTelegram
 
 log = setup_logger()  # 로거 설정
 
 class MainWindow():
-    def __init__(self):
+    def __init__(self, backend=None, mongo_profile='safe', minute_layout='document', day_layout='document',
+                 minute_partition='year', resample=tuple(RESAMPLE_TARGETS), rebuild_watermarks=False):
+        """
+        :param backend: Creon backend (지정하지 않으면 환경변수 CREON_BACKEND 기준, 기본 실제 Creon)
+        :param mongo_profile: MongoDB 연결 설정 ('safe': 매일 수집, 'bulk': 처음 전체 기간 적재)
+        :param minute_layout: 분봉 저장 방식 ('document': sp_1min 에 분봉 1개 = 문서 1개,
+                              'bucket': sp_1min_bucket 에 종목/날짜 1개 = 문서 1개,
+                              'timeseries': sp_1min_ts.bars time-series 컬렉션 하나,
+                              'partition': 기간별 DB sp_1min_pYYYY(MM) 의 종목별 컬렉션)
+        :param day_layout: 일봉 저장 방식 ('document' 또는 'timeseries')
+        :param minute_partition: 'partition' 저장의 기간 ('year' 또는 'month')
+        :param resample: 분봉/일봉을 저장한 뒤 DB 에서 만들 bar (sp_3min, sp_5min, sp_15min, sp_60min, sp_week, sp_month)
+        :param rebuild_watermarks: watermark 가 비어 있는데 가격 데이터가 있으면 컬렉션을 조회해서 다시 만든다
+                                   (False 면 오래 걸리는 전체 조회 대신 오류로 멈춘다)
+        """
         super().__init__()
+        if backend is not None:
+            set_backend(backend)
         # AutoLogin 클래스를 사용하여 로그인
         self.autoLogin = autoLogin()
         self.bot = selfTelegram()
@@ -27,12 +57,24 @@ class MainWindow():
         self.objStockChart = CpStockChart()
         self.objCodeMgr = CpCodeMgr()
         self.objStockUniWeek = CpStockUniWeek()
+        self.objMarketEye = CpMarketEye()
         
         # Initialize MongoDBHandler
-        self.db_handler = MongoDBHandler()
+        self.db_handler = MongoDBHandler(mongo_profile)
+        # 종목별 저장 현황 (최근/최초 날짜, 행 수 등). 시작할 때 한 번 읽고 저장할 때마다 갱신
+        self.watermarks = WatermarkStore(self.db_handler)
+        self.load_watermarks(rebuild_watermarks)
+        # 수집 데이터 종류별 저장소. self.db_name 은 데이터 종류, store.db_name 은 실제 저장하는 DB
+        # 날짜별 전 종목 일봉 (sp_snapshot.sp_day). sp_day 를 저장할 때마다 같이 갱신
+        self.snapshots = DailySnapshotStore(self.db_handler)
+        self.snapshots.ensure_index()
+        self.stores = {
+            'sp_1min': open_bar_store(self.db_handler, 'sp_1min', minute_layout, self.watermarks, minute_partition),
+            'sp_day': open_bar_store(self.db_handler, 'sp_day', day_layout, self.watermarks, snapshots=self.snapshots),
+        }
+        # N분봉, 주봉, 월봉은 API 로 받지 않고 저장된 1분봉/일봉으로 만든다
+        self.resampler = Resampler(self.db_handler, self.stores, self.watermarks, resample)
 
-        self.rcv_data = dict()  # RQ후 받아온 데이터 저장 멤버
-        self.rcv_data2 = dict()
         self.update_status_msg = ''  # log 에 출력할 메세지 저장 멤버
         self.return_status_msg = ''  # log 에 출력할 메세지 저장 멤버
         
@@ -44,7 +86,13 @@ class MainWindow():
         
         # self.delete_outTime_column()
         
-        self.semaphore = asyncio.Semaphore(1) # 동시에 실행할 수 있는 최대 호출 수 설정
+        # 동시에 처리할 수 있는 최대 종목 수 설정
+        # 요청 결과는 종목마다 별도의 ChartResult 로 반환되므로 한 종목의 저장과 다음 종목의 요청이 겹쳐도 안전함
+        # (같은 COM 객체에 대한 요청은 CpStockChart / CpStockUniWeek 내부에서 하나씩 처리)
+        self.concurrency = 4
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        # 가격 수집 파이프라인의 단계 사이 queue 크기 (가득 차면 앞 단계가 기다림)
+        self.pipeline_queue_size = 8
         self.loop = asyncio.get_event_loop()
         
         self.loop.run_until_complete(self.initialize())
@@ -59,12 +107,14 @@ class MainWindow():
             self.db_name = db_name
             self.connect_code_list_view()
             await self.update_price_db()
+            await self.update_resampled()
             if self.db_name == 'sp_day':
                 print("======== 시간외 단일가 수집 중 입니다. ========")
-                self.semaphore = asyncio.Semaphore(1) # 동시에 실행할 수 있는 최대 호출 수 설정
+                self.semaphore = asyncio.Semaphore(self.concurrency)
                 await self.schedule_outTime()
                 print("======== 시간외 단일가 수집완료 ========")
                 await self.bot.send(f"[수집기] 시간외 업데이트 완료")
+            self.snapshots.flush()
  
     async def code_name_list_update(self):
         # 1. API 서버에서 종목코드와 종목명 가져오기
@@ -97,76 +147,44 @@ class MainWindow():
         latest_date = available_latest_date()
         latest_date = latest_date // 10000
         
-        # 3. MongoDB에 데이터 upsert 하지만 오늘 날짜에 이미 업데이트된 항목은 제외
-        for idx, row in self.sv_code_df.iterrows():
-            condition = {'stock_code': row['종목코드']}
-            
-            # 현재 날짜에 이미 업데이트된 항목 제외
-            existing_item = self.db_handler.find_item(condition, db_name='sp_common', collection_name='sp_all_code_name')
-            if existing_item and existing_item.get('date') == latest_date:
-                continue
-                
-            update_value = {
-                '$set': {
-                    'date': latest_date,
-                    'stock_name': row['종목명'],
-                    'stock_code': row['종목코드'],
-                    'market_kind': row['소속부'],
-                    'stock_status': row['종목상태']
-                },
-                '$setOnInsert': {
-                    'sp_1min': None,
-                    'sp_day': None,
-                    'sp_week': None,
-                    'sp_month': None
-                }
-            }
-            self.db_handler.upsert_item(condition, update_value, db_name='sp_common', collection_name='sp_all_code_name')
-        
-        # 4. Local MongoDB의 sp_day DB에서 종목코드 컬렉션 목록 가져오기
+        # 3. sp_all_code_name 을 한 번 읽어서 서버 목록과 비교하고 바뀐 종목만 한 번에 쓴다
+        existing = self.db_handler.find_items({}, db_name='sp_common', collection_name='sp_all_code_name',
+                                              projection={'_id': 0, 'stock_code': 1, 'date': 1, 'stock_name': 1,
+                                                          'market_kind': 1, 'stock_status': 1})
+        server_rows = zip(self.sv_code_df['종목코드'], self.sv_code_df['종목명'],
+                          self.sv_code_df['소속부'], self.sv_code_df['종목상태'])
+        # 4. Local MongoDB의 sp_day DB에 컬렉션이 있지만 sp_all_code_name 에 없는 종목코드도 추가
         local_code_list = self.db_handler.list_collections('sp_day')
-        # 5. sp_all_code_name 컬렉션에서 현재 존재하는 종목코드 목록 가져오기
-        existing_codes = self.db_handler.find_items_distinct(db_name='sp_common', collection_name='sp_all_code_name', distinct_col='stock_code')
-        # 6. sp_all_code_name에 없는 종목코드 추가
-        for code in local_code_list:
-            if code not in existing_codes:
-                condition = {'stock_code': code}
-                update_value = {
-                    '$set': {
-                        'date': latest_date,
-                        'stock_name': '없음',
-                        'stock_code': code,
-                        'market_kind': 0,
-                        'stock_status': 2
-                    },
-                    '$setOnInsert': {
-                        'sp_1min': None,
-                        'sp_day': None,
-                        'sp_week': None,
-                        'sp_month': None
-                    }
-                }
-                self.db_handler.upsert_item(condition, update_value, db_name='sp_common', collection_name='sp_all_code_name')
+        diff = diff_code_master(existing, server_rows, local_code_list, latest_date)
+        self.db_handler.bulk_write(diff.operations, db_name='sp_common', collection_name='sp_all_code_name')
+        log.info("종목 마스터 갱신 %s", diff.counts())
+
+    def load_watermarks(self, rebuild=False):
+        self.watermarks.ensure_index()
+        if self.watermarks.load() > 0 or not self.watermarks.has_price_data():
+            return  # 저장된 가격 데이터가 없으면 처음 수집이므로 만들 것이 없음
+        # watermark 만 비어 있으면 모든 가격 컬렉션을 조회해야 하므로 명시적으로 요청했을 때만 만든다
+        if not rebuild:
+            log.error("watermark(sp_common.sp_watermark) 가 비어 있습니다. --rebuild-watermarks 로 실행하거나 "
+                      "python -m util.watermark --rebuild 로 먼저 만드세요.")
+            raise RuntimeError("watermark 가 비어 있음")
+        log.info("watermark 가 없어 가격 컬렉션을 조회해서 생성합니다.")
+        count = self.watermarks.rebuild()
+        log.info("watermark %s 종목 생성", count)
 
     def connect_code_list_view(self):
-        db_code_list = self.db_handler._client[self.db_name].list_collection_names()
+        store = self.stores[self.db_name]
+        db_code_list = store.codes()
         db_name_list = list(map(self.objCodeMgr.get_code_name, db_code_list))
         if len(db_name_list) == 0:
             log.info("%s 는 업데이트 된 종목 없음", self.db_name)
         else:
             log.info(db_name_list)
-            for code in db_code_list:
-                indexes = self.db_handler._client[self.db_name][code].index_information()
-                if 'date_1' not in indexes:
-                    self.db_handler._client[self.db_name][code].create_index('date', name='date_1')
-                    log.info("Index on 'date' created.")
-                else:
-                    log.info("Index on 'date' already exists.")
+            # 선언된 인덱스가 없는 컬렉션은 백그라운드에서 만든다
+            missing = store.ensure_indexes()
+            log.info("%s 인덱스 생성 필요 컬렉션: %s", store.db_name, missing)
         
-        db_latest_list = []
-        for db_code in db_code_list:
-            latest_entry = self.db_handler.find_item({}, self.db_name, db_code, sort=[('date', -1)], projection={'date': 1})
-            db_latest_list.append(latest_entry['date'] if latest_entry else None)
+        db_latest_list = [self.watermarks.latest(store.db_name, db_code) for db_code in db_code_list]
         
         if db_latest_list:
             if self.db_name == 'sp_1min':
@@ -253,20 +271,34 @@ class MainWindow():
             latest_date = latest_date // 10000
             print("updated latest_date : ", latest_date)
         
+        if tick_unit == '일봉':
+            fetch_code_df = await self.update_daily_snapshot(fetch_code_df, db_code_df, latest_date)
+
         tqdm_range = tqdm.tqdm(total=len(fetch_code_df), ncols=100)
         
-        tasks = []
-        for i in range(len(fetch_code_df)):
-            code = fetch_code_df.iloc[i]
-            # self.update_status_msg = '[{}] {}'.format(code[0], code[1])
-            self.update_status_msg = '[{}] {}'.format(code['종목코드'], code['종목명'])
-            tqdm_range.set_description(preformat_cjk(self.update_status_msg, 25))
-            tasks.append(self.update_price_for_code(code, tick_unit, count, columns, tick_range, latest_date, tqdm_range))
-            
-        await asyncio.gather(*tasks)
-        
+        # 요청(fetch) -> upsert 변환(transform) -> DB 저장(write) 단계를 queue 로 연결하여
+        # 한 종목을 변환/저장하는 동안에도 다음 종목의 요청이 계속 나가도록 한다.
+        refetch_codes = self.incomplete_realtime_codes(latest_date) if tick_unit == '분봉' else set()
+        store = self.stores[self.db_name]
+        pipeline = Pipeline(maxsize=self.pipeline_queue_size)
+        pipeline.add_stage('fetch', partial(self.fetch_price, tick_unit=tick_unit, count=count, tick_range=tick_range,
+                                            latest_date=latest_date, refetch_codes=refetch_codes, store=store,
+                                            tqdm_range=tqdm_range))
+        pipeline.add_stage('transform', partial(self.transform_price, columns=columns, store=store))
+        pipeline.add_stage('write', partial(self.write_price, latest_date=latest_date, store=store, tqdm_range=tqdm_range))
+        codes = (fetch_code_df.iloc[i] for i in range(len(fetch_code_df)))
+        # bulk profile 이면 인덱스를 지우고 적재한 뒤 다시 만든다
+        with store.bulk_load():
+            await pipeline.run(codes)
+
         tqdm_range.close()
-        
+        gc.collect()
+        for line in pipeline.report():
+            log.info("[%s 파이프라인] %s", self.db_name, line)
+        for line in store.stats.report():
+            log.info("[%s 저장] %s", self.db_name, line)
+        await self.loop.run_in_executor(None, self.db_handler.wait_index_builds)
+
         if self.db_name == 'sp_1min':
             print(f"======== 분봉 가격 데이터 수집 완료 ========")
             await self.bot.send(f"[수집기] 분봉 업데이트 완료")
@@ -274,57 +306,133 @@ class MainWindow():
             print(f"======== 일봉 가격 데이터 수집 완료 ========")
             await self.bot.send(f"[수집기] 일봉 업데이트 완료")
 
-    async def update_price_for_code(self, code, tick_unit, count, columns, tick_range, latest_date, tqdm_range):
-        async with self.semaphore:
-            # await self.objStockChart.apply_delay()
-            from_date = 0
-            if code['종목코드'] in self.db_code_df['종목코드'].tolist():
-                latest_date_entry = self.db_handler.find_item({}, self.db_name, code['종목코드'], sort=[('date', -1)])
-                from_date = latest_date_entry['date'] if latest_date_entry else 0
-            # 현재 업데이트 중인 종목을 tqdm에 표시
-            tqdm_range.set_description(f"{code['종목명']}({code['종목코드']}) 처리")
-
-            if tick_unit == '분봉':
-                success = await self.objStockChart.RequestMT(code['종목코드'], 'm', tick_range, count, self, from_date)
-            elif tick_unit == '일봉':
-                success = await self.objStockChart.RequestDWM(code['종목코드'], 'D', count, self, from_date)
-
-            if not success or 'date' not in self.rcv_data or len(self.rcv_data['date']) == 0:
-                tqdm_range.set_description(f"{code['종목명']}({code['종목코드']}) 데이터 없음")
-                tqdm_range.update(1)
-                return  # 데이터가 없는 경우 건너뜀
-            
-            df = pd.DataFrame(self.rcv_data, columns=columns, index=self.rcv_data['date'])
-            df = df.loc[:from_date].iloc[:-1] if from_date != 0 else df
-            df = df.iloc[::-1]
-            df.reset_index(inplace=True)
-            df.rename(columns={'index': 'date'}, inplace=True)
-
-            df.drop_duplicates(subset='date', keep='last', inplace=True)
-
-            indexes = self.db_handler._client[self.db_name][code['종목코드']].index_information()
-            if 'date_1' not in indexes:
-                self.db_handler._client[self.db_name][code['종목코드']].create_index('date', name='date_1')
-                log.info("Index on 'date' created.")
-
-            operations = [
-                UpdateOne({'date': rec['date']}, {'$set': rec}, upsert=True) 
-                for rec in df.to_dict('records')]
-            if operations:
-                self.db_handler._client[self.db_name][code['종목코드']].bulk_write(operations, ordered=False)
-
-            del df
-            gc.collect()
-            
-            # 수집이 완료되면 sp_all_code_name 에 각 DB 의 컬렉션명으로 수집완료 처리
-            self.db_handler.update_item(
-                {'stock_code': code['종목코드']},
-                {'$set': {self.db_name: latest_date}},
-                db_name='sp_common',
-                collection_name='sp_all_code_name'
-            )
-            tqdm_range.set_description(f"{code['종목명']}({code['종목코드']}) 완료")
-            tqdm_range.update(1)  # 한 종목 코드 완료 시 프로그레스바 업데이트
+    async def update_daily_snapshot(self, fetch_code_df, db_code_df, latest_date):
+        """
+        DB 에 전 거래일까지 저장된 종목은 MarketEye 로 200 종목씩 당일 시세를 받아 일봉으로 저장
+        장 마감 후 당일(latest_date == 오늘)에만 현재 시세가 당일 일봉과 같으므로 그 외에는 그대로 반환
+        :return: 종목별 차트 요청이 필요한 나머지 종목 (새 종목, 빠진 기간이 하루보다 긴 종목 등)
+        """
+        if latest_date != int(datetime.now().strftime('%Y%m%d')):
+            return fetch_code_df
+        stored = {code: int(date) for code, date in zip(db_code_df['종목코드'], db_code_df['갱신날짜']) if pd.notna(date)}
+        codes = [code for code in fetch_code_df['종목코드']
+                 if code.startswith('A') and code in stored and gap_start_date(stored[code]) == latest_date]
+        if not codes:
+            return fetch_code_df
+
+        snapshot = await self.objMarketEye.request(codes, self)
+        written = await self.loop.run_in_executor(None, self.write_daily_snapshot, snapshot, latest_date)
+        log.info("MarketEye 로 일봉 %s 종목 저장, 차트 요청 %s 종목", len(written), len(fetch_code_df) - len(written))
+        return fetch_code_df[~fetch_code_df['종목코드'].isin(written)]
+
+    def write_daily_snapshot(self, snapshot, latest_date):
+        """MarketEye 시세를 latest_date 일봉으로 upsert 하고 수집완료 처리. 저장한 종목코드 목록 반환"""
+        # 장 마감 시세가 아닌 종목(체결 없음 등)은 차트로 받는다
+        valid = (snapshot['time'] >= 1530) & (snapshot['close'] > 0)
+        marketC = snapshot['close'].astype(np.int64) * snapshot['shares']
+        columns = ('open', 'high', 'low', 'close', 'volume', 'value')
+        store = self.stores[self.db_name]
+        dates = np.array([latest_date], dtype=np.int64)
+        written = []
+        for i in np.flatnonzero(valid):
+            code = str(snapshot['code'][i])
+            bars = {'date': dates, 'marketC': marketC[i:i + 1]}
+            bars.update((col, snapshot[col][i:i + 1]) for col in columns)
+            store.write(store.prepare(code, bars), fields=('marketC',))
+            written.append(code)
+        if written:
+            self.db_handler.update_items({'stock_code': {'$in': written}}, {'$set': {self.db_name: latest_date}},
+                                         db_name='sp_common', collection_name='sp_all_code_name')
+        return written
+
+    def incomplete_realtime_codes(self, latest_date):
+        """
+        latest_date 에 실시간 수집기(realtimeCrawler)가 장 전체를 받지 못한 경우 구독했던 종목코드
+        이 종목들은 DB 의 마지막 분봉이 당일이더라도 당일 분봉을 다시 받는다.
+        """
+        codes = incomplete_session_codes(self.db_handler, latest_date)
+        if codes:
+            log.info("실시간 수집이 완전하지 않은 날(%s)의 분봉 %s 종목을 다시 받음", latest_date, len(codes))
+        return codes
+
+    async def fetch_price(self, code, tick_unit, count, tick_range, latest_date, refetch_codes, store, tqdm_range):
+        """
+        파이프라인 fetch 단계: DB 에 없는 기간의 차트 데이터를 페이지 단위로 요청
+        받은 페이지마다 (code, from_date, watermark, ChartResult) 를 넘기고, 마지막에 ChartResult 자리에 None 을 넘긴다.
+        전체 기간을 받는 종목도 한 번에 메모리에 올리지 않고 페이지마다 바로 저장한다.
+        """
+        self.update_status_msg = '[{}] {}'.format(code['종목코드'], code['종목명'])
+        watermark = self.watermarks.latest(store.db_name, code['종목코드'], 0)
+        # 현재 업데이트 중인 종목을 tqdm에 표시
+        tqdm_range.set_description(f"{code['종목명']}({code['종목코드']}) 처리")
+
+        # DB 에 데이터가 있으면 개수로 받아서 from_date 를 만날 때까지 넘기지 않고, 빠진 기간만 요청한다
+        # 실시간 수집이 중간에 끊긴 날은 하루 전체를 다시 받음
+        from_date, start_date, end_date = fetch_range(watermark, latest_date, code['종목코드'] in refetch_codes)
+        if start_date and end_date and start_date > end_date:
+            # 빠진 기간이 없으면 요청하지 않고 수집완료 처리만 함
+            self.mark_price_updated(code['종목코드'], latest_date)
+            tqdm_range.set_description(f"{code['종목명']}({code['종목코드']}) 최신")
+            tqdm_range.update(1)
+            return
+        if tick_unit == '분봉':
+            pages = self.objStockChart.StreamMT(code['종목코드'], 'm', tick_range, count, self, from_date,
+                                                start_date, end_date)
+        else:
+            pages = self.objStockChart.StreamDWM(code['종목코드'], 'D', count, self, from_date, start_date, end_date)
+
+        page_count = 0
+        async for result in pages:
+            page_count += 1
+            yield code, from_date, watermark, result
+
+        if page_count == 0:
+            tqdm_range.set_description(f"{code['종목명']}({code['종목코드']}) 데이터 없음")
+            tqdm_range.update(1)
+            return  # 데이터가 없는 경우 건너뜀
+        yield code, from_date, watermark, None
+
+    async def transform_price(self, item, columns, store):
+        """파이프라인 transform 단계: 한 페이지 -> 새 bar(insert) / 겹치는 bar(upsert) 묶음 (별도 스레드에서 실행)"""
+        code, from_date, watermark, result = item
+        fields = ('marketC',) if 'marketC' in columns else ()
+        if result is None:  # 종목의 마지막
+            return code, None, fields
+
+        def transform():
+            return store.prepare(code['종목코드'], chart_bars(result, columns, from_date), watermark)
+        batch = await self.loop.run_in_executor(None, transform)
+        return code, batch, fields
+
+    async def write_price(self, item, latest_date, store, tqdm_range):
+        """파이프라인 write 단계: 페이지를 DB 에 저장하고, 종목의 마지막이면 수집완료 처리 (별도 스레드에서 실행)"""
+        code, batch, fields = item
+        if batch is not None:
+            # 페이지는 최신 -> 과거 순서로 오므로 watermark 는 종목의 모든 페이지를 저장한 뒤에 기록한다
+            await self.loop.run_in_executor(None, partial(store.write, batch, fields, defer=True))
+            return
+
+        await self.loop.run_in_executor(None, store.commit, code['종목코드'], fields)
+        await self.loop.run_in_executor(None, self.mark_price_updated, code['종목코드'], latest_date)
+        tqdm_range.set_description(f"{code['종목명']}({code['종목코드']}) 완료")
+        tqdm_range.update(1)  # 한 종목 코드 완료 시 프로그레스바 업데이트
+
+    def mark_price_updated(self, stock_code, latest_date):
+        # 수집이 완료되면 sp_all_code_name 에 각 DB 의 컬렉션명으로 수집완료 처리
+        self.db_handler.update_item(
+            {'stock_code': stock_code},
+            {'$set': {self.db_name: latest_date}},
+            db_name='sp_common',
+            collection_name='sp_all_code_name'
+        )
+
+    async def update_resampled(self):
+        # 방금 저장한 원본(self.db_name)으로 만드는 bar 를 가장 최근 구간부터 갱신
+        targets = self.resampler.targets(self.db_name)
+        if not targets:
+            return
+        rows = await self.loop.run_in_executor(None, self.resampler.update, self.db_name)
+        log.info("%s 갱신: %s 행 추가", ', '.join(targets), rows)
 
     async def schedule_outTime(self):
         # 현재 시간을 확인
@@ -381,21 +489,10 @@ class MainWindow():
             
             # 로컬 DB 에 저장된 종목의 marketC 컬럼 Data 가 어느시점까지 저장되어 있는지 체크
             # 없으면 처음부터 받고, 있으면 가장 최근까지 채워진 날짜를 검사해서 그 이후로 이어서 받는다.
-            db_marketC_latest_dates = []
-            # 각 종목 코드별로 MongoDB에서 marketC 컬럼의 최신 날짜를 확인
-            for db_code in db_code_df['종목코드'].tolist():
-                latest_entry = self.db_handler.find_item(
-                    {'marketC': {'$exists': True}},  # marketC 컬럼이 있는 문서만 대상
-                    self.db_name,
-                    db_code,
-                    sort=[('date', -1)],
-                    projection={'date': 1}
-                )
-                if latest_entry:
-                    db_marketC_latest_dates.append(latest_entry['date'])
-                    # print("latest_entry : ", latest_entry)
-                else:
-                    db_marketC_latest_dates.append(None)  # marketC 데이터가 없는 경우 None을 추가
+            # 각 종목 코드별 marketC 컬럼의 최신 날짜 (watermark)
+            store = self.stores[self.db_name]
+            db_marketC_latest_dates = [self.watermarks.field_date(store.db_name, db_code, 'marketC')
+                                       for db_code in db_code_df['종목코드'].tolist()]
 
             # 최신 데이터가 있는 종목 코드 확인
             already_up_to_date_codes = [
@@ -427,168 +524,143 @@ class MainWindow():
 
         await asyncio.gather(*tasks)
         tqdm_range.close()
+        self.snapshots.flush()
 
     async def update_marketC_for_code(self, code, tick_unit, count, columns, tick_range, tqdm_range):
         async with self.semaphore:
             # await self.objStockChart.apply_delay()
-            from_date = 0
-            if code['종목코드'] in self.db_code_df['종목코드'].tolist():
-                # marketC 컬럼이 있는 문서 중 가장 최신의 날짜를 찾음
-                latest_date_entry = self.db_handler.find_item(
-                    {'marketC': {'$exists': True}}, 
-                    self.db_name, 
-                    code['종목코드'], 
-                    sort=[('date', -1)],
-                    projection={'date': 1}
-                )
-                from_date = latest_date_entry['date'] if latest_date_entry else 0
+            # marketC 컬럼이 있는 문서 중 가장 최신의 날짜
+            store = self.stores[self.db_name]
+            from_date = self.watermarks.field_date(store.db_name, code['종목코드'], 'marketC', 0)
             if tick_unit == '일봉':  # 일봉 데이터 받기
-                success = await self.objStockChart.RequestDWM(code['종목코드'], 'D', count, self, from_date)
-                if not success:
+                start_date = gap_start_date(from_date) if from_date else 0
+                result = await self.objStockChart.RequestDWM(code['종목코드'], 'D', count, self, from_date, start_date)
+                if not result:
                     return
             
-            df = pd.DataFrame(self.rcv_data, columns=columns, index=self.rcv_data['date'])
-            df = df.loc[:from_date].iloc[:-1] if from_date != 0 else df
-            df = df.iloc[::-1]
-            df.reset_index(inplace=True)
-            df.rename(columns={'index': 'date'}, inplace=True)
-
-            # 'date' 열을 기준으로 중복된 데이터 제거
-            df.drop_duplicates(subset='date', keep='last', inplace=True)
+            df = chart_to_frame(result, columns, from_date)
 
             # MongoDB에 데이터 삽입
-            operations = [
-                UpdateOne({'date': rec['date']}, {'$set': {'marketC': rec['marketC']}}, upsert=False)
-                for rec in df[['date', 'marketC']].to_dict('records') if 'marketC' in rec
-            ]
-            if operations:
-                self.db_handler._client[self.db_name][code['종목코드']].bulk_write(operations, ordered=False)
+            rows = [{'date': rec['date'], 'marketC': rec['marketC']}
+                    for rec in df[['date', 'marketC']].to_dict('records') if 'marketC' in rec]
+            if rows:
+                store.update_fields(code['종목코드'], rows)
+                self.watermarks.record_field(store.db_name, code['종목코드'], 'marketC', df['date'].values)
 
             del df
             gc.collect()
             tqdm_range.update(1)  # 한 종목 코드 완료 시 프로그레스바 업데이트
 
     async def handle_outTime(self):
-        all_collections = self.db_handler._client['sp_day'].list_collection_names()
-        # 제외할 collection 이름들
-        exclude_collections = {'U001', 'U201'}
-        
-        # sp_common DB의 sp_all_code_name 컬렉션에서 stock_code가 sp_day의 컬렉션명인 데이터 조회
-        for collection in all_collections:
-            stock_info = self.db_handler.find_item(
-                {'stock_code': collection}, 
-                db_name='sp_common', 
-                collection_name='sp_all_code_name', 
-                projection={'stock_status': 1, '_id': 0}
-            )
-            if stock_info and stock_info.get('stock_status', 0) != 0:
-                exclude_collections.add(collection)
-        
-        # stock_status 가 0 이 아닌 종목을 제외한 collection 이름 목록을 생성합니다.
-        collections = [col for col in all_collections if col not in exclude_collections]
-        
-        outTimeData = []
-        for code in collections:
-            # if not is_market_open(): # 장 중이 아니라면
-            price_latest = self.db_handler.find_item({}, 'sp_day', code, sort=[('date', -1)]) 
-            price_lastest_date = price_latest['date'] # DB 의 최근 일봉 가격 업데이트 날짜
-
-            latest_entry_with_diff_rate = self.db_handler.find_item(
-                {'diff_rate': {'$exists': True}}, 'sp_day', code, sort=[('date', -1)]
-            )
-
-            if latest_entry_with_diff_rate and latest_entry_with_diff_rate['date'] >= price_lastest_date:
-                continue
-
-            condition = {'stock_code': code}
-            stock_name = self.db_handler.find_item(
-                condition, 
-                db_name='sp_common', 
-                collection_name='sp_all_code_name',
-                projection={'stock_name': 1, '_id': 0}
-            )
-            outTimeData.append({'종목코드': code, '종목명': stock_name['stock_name'] if stock_name else None})
-
-        fetch_code_df = pd.DataFrame(outTimeData)
+        store = self.stores['sp_day']
+        # 종목 마스터를 한 번에 읽고, 받을 종목과 시작 날짜는 메모리의 watermark 로 정한다
+        master_docs = self.db_handler.find_items({}, db_name='sp_common', collection_name='sp_all_code_name',
+                                                 projection={'stock_code': 1, 'stock_name': 1, 'stock_status': 1,
+                                                             '_id': 0})
+        fetch_code_df = pd.DataFrame(outtime_worklist(store.codes(), master_docs, self.watermarks, store.db_name),
+                                     columns=['종목코드', '종목명', 'from_date'])
         cnt_fetch_code_df = len(fetch_code_df)
         print("시간외 업데이트 필요한 종목의 수 (fetch_code_df) : ", cnt_fetch_code_df)
         await self.bot.send(f"[수집기] 시간외 업데이트 시작: {cnt_fetch_code_df}개")
         
         count = 200
         tqdm_range = tqdm.tqdm(total=len(fetch_code_df), ncols=100)
+        # diff_rate 는 종목마다 저장하지 않고 여러 종목을 모아서 unordered bulk_write 로 저장
+        updates = FieldUpdates(store, 'diff_rate')
 
         tasks = []
         for i in range(len(fetch_code_df)):
             code = fetch_code_df.iloc[i]
             self.return_status_msg = '[{}] {}'.format(code['종목코드'], code['종목명'])
             tqdm_range.set_description(self.return_status_msg)
-            tasks.append(self.update_outTime_for_code(code, count, tqdm_range))
+            tasks.append(self.update_outTime_for_code(code, count, tqdm_range, updates))
 
         await asyncio.gather(*tasks)
+        await self.loop.run_in_executor(None, updates.flush)
         tqdm_range.close()
+        log.info("시간외 단일가 diff_rate %s 건 저장", updates.written)
         
-    async def update_outTime_for_code(self, code, count, tqdm_range):
+    async def update_outTime_for_code(self, code, count, tqdm_range, updates):
         async with self.semaphore:
             # await self.objStockUniWeek.apply_delay()
-            from_date = 0
-            # diff_rate가 없는 가장 최신의 date를 찾음
-            latest_entry_with_diff_rate = self.db_handler.find_item({'diff_rate': {'$exists': True}}, 'sp_day', code['종목코드'], sort=[('date', -1)])
-            # 해당 종목코드의 데이터 중 가장 오래된 날짜를 찾음
-            earliest_entry = self.db_handler.find_item({}, 'sp_day', code['종목코드'], sort=[('date', 1)])
-            
-            # 데이터가 존재하지 않으면 diff_rate를 요청하지 않음
-            if not earliest_entry:
-                tqdm_range.set_description(f"[{code['종목명']}({code['종목코드']})] 데이터 없음")
-                tqdm_range.update(1)
-                return
-
-            if latest_entry_with_diff_rate:
-                from_date = latest_entry_with_diff_rate['date']
-            else:
-                from_date = earliest_entry['date']
+            # diff_rate 가 있는 가장 최신의 date, 없으면 해당 종목코드의 데이터 중 가장 오래된 날짜 (outtime_worklist)
+            from_date = int(code['from_date'])
 
-            success = await self.objStockUniWeek.request_stock_data(code['종목코드'], count, self, from_date)
+            result = await self.objStockUniWeek.request_stock_data(code['종목코드'], count, self, from_date)
 
-            if not success:
+            if not result:
                 tqdm_range.set_description(f"[{code['종목명']}({code['종목코드']})] 데이터 없음")
                 tqdm_range.update(1)
                 return
 
-            df = pd.DataFrame(self.rcv_data2)
+            df = pd.DataFrame(dict(result.columns))
             if 'date' in df.columns:
                 df = df[df['date'] > from_date].iloc[::-1]
                 df.reset_index(inplace=True, drop=True)
 
                 df.drop_duplicates(subset='date', keep='last', inplace=True)
                 df.dropna(subset=['date'], inplace=True)  # date 컬럼이 null인 행 제거
-                operations = [
-                    UpdateOne({'date': rec['date']}, {'$set': {'diff_rate': rec['diff_rate']}}, upsert=False)
-                    for rec in df.to_dict('records')
-                ]
-                if operations:
-                    self.db_handler._client['sp_day'][code['종목코드']].bulk_write(operations, ordered=False)
+                rows = [{'date': rec['date'], 'diff_rate': rec['diff_rate']} for rec in df.to_dict('records')]
+                if rows and updates.add(code['종목코드'], rows):
+                    await self.loop.run_in_executor(None, updates.flush)
             
             del df
             gc.collect()
             tqdm_range.set_description(f"{code['종목명']}({code['종목코드']}) 업데이트 완료")
             tqdm_range.update(1)  # 한 종목 코드 완료 시 프로그레스바 업데이트
-        
+
     # sp_day 의 특정 날짜의 수집 데이터 삭제하기
     def delete_outTime_column(self):
         target_date = 20240808
-        collections = self.db_handler.list_collections("sp_day")
-        print(f"sp_day collections: {collections}")
-        for collection in collections:
-            condition = {"date": target_date}
-            result = self.db_handler.delete_items(condition, db_name="sp_day", collection_name=collection)
-            print(f"Deleted {result.deleted_count} documents from collection {collection} in sp_day")
-
-        sp_1min_collections = self.db_handler.list_collections("sp_1min")
-        print(f"sp_1min collections: {sp_1min_collections}")
-        for collection in sp_1min_collections:
-            condition = {"date": {"$gte": target_date * 10000, "$lt": (target_date + 1) * 10000}}
-            result = self.db_handler.delete_items(condition, db_name="sp_1min", collection_name=collection)
-            print(f"Deleted {result.deleted_count} documents from collection {collection} in sp_1min")
+        # 종목별로 여러 스레드에서 지우고, 중단되면 다시 실행했을 때 끝난 종목은 건너뛴다 (util.maintenance)
+        runner = MaintenanceRunner(self.db_handler)
+        for db_name in ('sp_day', 'sp_1min'):
+            store = self.stores[db_name]
+            result = runner.run(DeleteDay(store, target_date))
+            print(f"Deleted {result.count} documents of {target_date} in {store.db_name}")
+
+    # sp_day 의 모든 종목에서 항목 하나 삭제하기 (시간외 단일가 diff_rate 를 다시 받을 때 등)
+    def delete_column(self, column_name, db_name='sp_day'):
+        store = self.stores[db_name]
+        runner = MaintenanceRunner(self.db_handler)
+        result = runner.run(UnsetField(self.db_handler, store.db_name, column_name, watermarks=self.watermarks))
+        print(f"Unset {column_name} in {result.count} documents of {store.db_name}")
             
 if __name__ == "__main__":
-    MainWindow()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', choices=['creon', 'simulator', 'replay'], default=os.environ.get('CREON_BACKEND', 'creon'))
+    parser.add_argument('--capture', default=None, help='replay 할 capture 파일')
+    parser.add_argument('--record', default=None, help='받은 응답을 모두 기록할 capture 파일')
+    parser.add_argument('--mongo-profile', choices=['safe', 'bulk'], default='safe',
+                        help='MongoDB 연결 설정 (bulk: 처음 전체 기간을 적재할 때)')
+    parser.add_argument('--minute-layout', choices=['document', 'bucket', 'timeseries', 'partition'], default='document',
+                        help='분봉 저장 방식 (bucket: sp_1min_bucket 에 종목/날짜별 한 문서, '
+                             'timeseries: sp_1min_ts.bars time-series 컬렉션, partition: 기간별 DB)')
+    parser.add_argument('--minute-partition', choices=['year', 'month'], default='year',
+                        help='--minute-layout partition 의 기간 (sp_1min_p2024 / sp_1min_p202408)')
+    parser.add_argument('--day-layout', choices=['document', 'timeseries'], default='document',
+                        help='일봉 저장 방식 (timeseries: sp_day_ts.bars time-series 컬렉션)')
+    parser.add_argument('--rebuild-watermarks', action='store_true',
+                        help='watermark 가 비어 있으면 가격 컬렉션을 조회해서 다시 만든다 (오래 걸림)')
+    parser.add_argument('--resample', nargs='*', choices=list(RESAMPLE_TARGETS), default=list(RESAMPLE_TARGETS),
+                        help='저장된 1분봉/일봉으로 만들 bar (값 없이 주면 만들지 않음)')
+    # 시뮬레이터 옵션
+    parser.add_argument('--sim-end-date', type=int, default=None, help='가장 최근 거래일 (YYYYMMDD)')
+    parser.add_argument('--sim-kospi', type=int, default=900, help='코스피 종목 수')
+    parser.add_argument('--sim-kosdaq', type=int, default=1700, help='코스닥 종목 수')
+    parser.add_argument('--sim-minute-days', type=int, default=500, help='분봉을 제공하는 최근 거래일 수')
+    parser.add_argument('--sim-latency', type=float, default=0.0, help='요청당 평균 지연(초)')
+    parser.add_argument('--sim-error-rate', type=float, default=0.0, help='통신 오류 비율')
+    args = parser.parse_args()
+
+    if args.backend == 'simulator':
+        backend = create_backend('simulator', end_date=args.sim_end_date, n_kospi=args.sim_kospi, n_kosdaq=args.sim_kosdaq,
+                                 minute_days=args.sim_minute_days, latency=args.sim_latency, error_rate=args.sim_error_rate)
+    elif args.backend == 'replay':
+        backend = create_backend('replay', path=args.capture)
+    else:
+        backend = create_backend('creon')
+    if args.record:
+        backend = RecordingBackend(backend, args.record)
+    MainWindow(backend, args.mongo_profile, args.minute_layout, args.day_layout, args.minute_partition, args.resample,
+               args.rebuild_watermarks)
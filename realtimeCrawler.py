@@ -0,0 +1,125 @@
+import os
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from api.backend import create_backend, set_backend
+from api.realtime import MinuteBarBuilder, CreonTickSource, REALTIME_SESSION_COLLECTION
+from common.loggerConfig import setup_logger
+from util.MongoDBHandler import MongoDBHandler
+from util.barStore import open_bar_store
+from util.watermark import WatermarkStore
+
+log = setup_logger()  # 로거 설정
+
+
+# 장중 실시간 체결로 1분봉을 만들어 sp_1min 에 저장하는 수집기
+class RealtimeCrawler:
+    """
+    장 마감(15:30) 시점에 당일 분봉이 이미 저장되어 있으므로 저녁 배치(dataCrawler)는 빠진 부분만 받는다.
+    장 시작 전부터 마감까지 끊김 없이 수집한 날은 sp_common.sp_1min_realtime 에 complete=True 로 기록되고,
+    그렇지 않은 날은 저녁 배치가 당일 분봉을 다시 받는다.
+    """
+    def __init__(self, source=None, db_handler=None, bot=None, now=datetime.now, sleep=asyncio.sleep, flush_delay=2.0,
+                 close_grace=60, minute_layout='document', minute_partition='year'):
+        """
+        :param source: TickSource (기본 CreonTickSource)
+        :param bot: send(msg) 코루틴이 있는 알림 (기본 selfTelegram, config.ini 의 TELEGRAM 설정 필요)
+        :param now: 현재 시각을 반환하는 함수 (테스트용)
+        :param sleep: 다음 저장까지 기다리는 코루틴 함수 (테스트용)
+        :param flush_delay: 매 분 몇 초 뒤에 완성된 분봉을 저장할지 (늦게 도착하는 체결 대기)
+        :param close_grace: 15:30 이후 마감 체결을 기다리는 시간(초)
+        :param minute_layout: 분봉 저장 방식 ('document', 'bucket', 'timeseries', 'partition', dataCrawler.py 와 같게)
+        """
+        self.source = source or CreonTickSource()
+        self.db_handler = db_handler or MongoDBHandler()
+        self.watermarks = WatermarkStore(self.db_handler)
+        # bucket 저장은 진행 중인 날의 bucket 뒤에 매 분 이어붙인다
+        self.store = open_bar_store(self.db_handler, 'sp_1min', minute_layout, self.watermarks, minute_partition)
+        if bot is None:
+            from util.alarm.selfTelegram import selfTelegram
+            bot = selfTelegram()
+        self.bot = bot
+        self.now = now
+        self.sleep = sleep
+        self.flush_delay = flush_delay
+        self.close_grace = close_grace
+        self.bar_count = 0
+
+    def load_universe(self):
+        """sp_all_code_name 의 정상 거래 종목 중 구독 가능 수만큼"""
+        items = self.db_handler.find_items({'market_kind': {'$in': [1, 2]}, 'stock_status': 0},
+                                           db_name='sp_common', collection_name='sp_all_code_name',
+                                           projection={'stock_code': 1})
+        codes = sorted(item['stock_code'] for item in items if item['stock_code'].startswith('A'))
+        limit = self.source.subscribe_limit()
+        if len(codes) > limit:
+            log.info("실시간 구독 제한 %s 개를 넘어 %s 개 종목은 저녁 배치로 수집", limit, len(codes) - limit)
+            codes = codes[:limit]
+        return codes
+
+    def _hhmmss(self):
+        now = self.now()
+        return now.hour * 10000 + now.minute * 100 + now.second
+
+    def _market_closed(self):
+        now = self.now()
+        return now >= now.replace(hour=15, minute=30, second=0, microsecond=0) + timedelta(seconds=self.close_grace)
+
+    async def _sleep_until_next_flush(self):
+        now = self.now()
+        await self.sleep(max(60 - now.second - now.microsecond / 1e6 + self.flush_delay, 0.0))
+
+    def _write(self, bars):
+        for code, cols in bars.items():
+            self.store.write(self.store.prepare(code, cols))
+        return sum(len(cols['date']) for cols in bars.values())
+
+    async def flush(self, builder):
+        """완성된 분봉을 sp_1min 에 저장 (별도 스레드에서 실행)"""
+        bars = builder.pop_closed()
+        if bars:
+            self.bar_count += await asyncio.get_event_loop().run_in_executor(None, self._write, bars)
+
+    async def run(self):
+        date = int(self.now().strftime('%Y%m%d'))
+        start = self._hhmmss()
+        codes = self.load_universe()
+        builder = MinuteBarBuilder(date)
+        self.store.load_index_snapshot()  # 이미 인덱스가 있는 종목은 저장할 때 다시 확인하지 않음
+        self.watermarks.load()  # watermark 이후의 분봉은 insert 로 저장
+        await self.source.start(codes, builder.on_tick)
+        await self.bot.send(f"[실시간 수집기] {len(codes)}개 종목 구독 시작")
+
+        complete = False
+        try:
+            while not self._market_closed():
+                await self._sleep_until_next_flush()
+                builder.close_bars(self._hhmmss())
+                await self.flush(builder)
+            complete = start <= 90000
+        finally:
+            await self.source.stop()
+            builder.close_all()
+            await self.flush(builder)
+            self.db_handler.upsert_item(
+                {'date': date},
+                {'$set': {'date': date, 'complete': complete, 'start': start, 'end': self._hhmmss(),
+                          'codes': codes, 'ticks': builder.tick_count}},
+                db_name='sp_common', collection_name=REALTIME_SESSION_COLLECTION)
+            self.db_handler.wait_index_builds()
+        log.info("실시간 수집 종료: 체결 %s 건, 분봉 %s 개, 늦은 체결 %s 건", builder.tick_count, self.bar_count, builder.late_ticks)
+        for line in self.store.stats.report():
+            log.info("[%s 저장] %s", self.store.db_name, line)
+        await self.bot.send(f"[실시간 수집기] 종료: 분봉 {self.bar_count}개 저장")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', choices=['creon'], default=os.environ.get('CREON_BACKEND', 'creon'))
+    parser.add_argument('--minute-layout', choices=['document', 'bucket', 'timeseries', 'partition'],
+                        default='document', help='분봉 저장 방식')
+    parser.add_argument('--minute-partition', choices=['year', 'month'], default='year')
+    args = parser.parse_args()
+    set_backend(create_backend(args.backend))
+    asyncio.run(RealtimeCrawler(minute_layout=args.minute_layout, minute_partition=args.minute_partition).run())
@@ -0,0 +1,188 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # util 모듈이 있는 경로를 추가
+import numpy as np
+import datetime
+from pymongo import UpdateOne
+from util.barStore import (TickerBarStore, BucketBarStore, TimeSeriesBarStore, PartitionedBarStore, WriteStats,
+                           FieldUpdates, split_days, bucket_document, bucket_append, open_bar_store, partition_range)
+from util.chartFrame import bar_datetimes
+from util.watermark import WatermarkStore
+
+
+def test_prepare_splits_at_watermark():
+    store = TickerBarStore(None, 'sp_day')
+    bars = {'date': np.array([20240807, 20240808, 20240809], dtype=np.int64),
+            'close': np.array([100, 101, 102], dtype=np.int32)}
+
+    batch = store.prepare('A000010', bars, watermark=20240808)
+    assert [doc['date'] for doc in batch.inserts] == [20240809]
+    assert [doc['date'] for doc in batch.upserts] == [20240807, 20240808]
+    assert not batch.new
+
+    batch = store.prepare('A000010', bars)  # 저장된 적 없는 종목
+    assert len(batch.inserts) == 3 and batch.upserts == [] and batch.new
+    assert type(batch.inserts[0]['close']) is int
+
+
+def test_bucket_document_per_day():
+    bars = {'date': np.array([202408080901, 202408080902, 202408090901], dtype=np.int64),
+            'close': np.array([100, 101, 102], dtype=np.int32)}
+    days = split_days(bars)
+    assert [day for day, _ in days] == [20240808, 20240809]
+    doc = bucket_document(*days[0])
+    assert doc == {'date': 20240808, 'n': 2, 'time': [901, 902], 'close': [100, 101]}
+
+
+def test_bucket_prepare_insert_append_merge():
+    store = BucketBarStore(None)
+    bars = {'date': np.array([202408070901, 202408080902, 202408080903, 202408090901], dtype=np.int64),
+            'close': np.array([100, 101, 102, 103], dtype=np.int32)}
+
+    batch = store.prepare('A000010', bars, watermark=202408080902)
+    assert [doc['date'] for doc in batch.inserts] == [20240809]
+    assert batch.appends == {} and batch.merges == [20240807, 20240808]  # 20240808 0902 는 이미 저장됨
+
+    batch = store.prepare('A000010', bars, watermark=202408080901)
+    assert batch.merges == [20240807]
+    assert batch.appends == {20240808: 2}
+    assert bucket_append(20240808, batch.days[20240808]) == UpdateOne(
+        {'date': 20240808}, {'$push': {'time': {'$each': [902, 903]}, 'close': {'$each': [101, 102]}}, '$inc': {'n': 2}})
+
+
+def test_bar_datetimes():
+    assert bar_datetimes([202408090901, 199001031530]).tolist() == [datetime.datetime(2024, 8, 9, 9, 1),
+                                                                    datetime.datetime(1990, 1, 3, 15, 30)]
+    assert bar_datetimes([20000229]).tolist() == [datetime.datetime(2000, 2, 29)]
+
+
+def test_timeseries_prepare_adds_meta():
+    store = TimeSeriesBarStore(None, 'sp_day')
+    assert store.db_name == 'sp_day_ts'
+    bars = {'date': np.array([20240808, 20240809], dtype=np.int64), 'close': np.array([100, 101], dtype=np.int32)}
+    batch = store.prepare('A000010', bars, watermark=20240808)
+    assert [doc['date'] for doc in batch.replaces] == [20240808]
+    assert batch.inserts == [{'date': 20240809, 'close': 101, 'code': 'A000010',
+                              'ts': datetime.datetime(2024, 8, 9)}]
+
+    assert isinstance(open_bar_store(None, 'sp_1min', 'timeseries'), TimeSeriesBarStore)
+    try:
+        open_bar_store(None, 'sp_day', 'bucket')
+        assert False
+    except ValueError:
+        pass
+
+
+def test_partition_prepare_routes_by_period():
+    assert partition_range('sp_1min_p2024', 'sp_1min_p') == (202400000000, 202499999999)
+    assert partition_range('sp_1min_p202408', 'sp_1min_p') == (202408000000, 202408999999)
+
+    store = PartitionedBarStore(None, 'month')
+    bars = {'date': np.array([202407311530, 202408010901, 202408010902], dtype=np.int64),
+            'close': np.array([100, 101, 102], dtype=np.int32)}
+    batch = store.prepare('A000010', bars, watermark=202407311530)
+    assert [name for name, _ in batch.parts] == ['sp_1min_p202407', 'sp_1min_p202408']
+    july, august = batch.parts[0][1], batch.parts[1][1]
+    assert len(july.upserts) == 1 and not july.new
+    assert len(august.inserts) == 2 and august.new  # watermark 이후 파티션은 새 컬렉션
+
+
+def test_write_stats_report():
+    stats = WriteStats()
+    stats.add(inserted=1000, insert_seconds=0.5)
+    stats.add(upserted=10, upsert_seconds=0.1, duplicates=2)
+    lines = stats.report()
+    assert len(lines) == 3 and '2000 rows/s' in lines[0]
+
+
+# update_fields_many / record_field 호출만 기록
+class _FieldStore:
+    db_name = 'sp_day'
+
+    def __init__(self):
+        self.writes = []
+        self.fields = []
+        self.watermarks = self
+
+    def update_fields_many(self, updates):
+        self.writes.append(updates)
+
+    def record_field(self, db_name, code, field, dates):
+        self.fields.append((code, field, dates))
+
+
+def test_field_updates_batch_across_codes():
+    store = _FieldStore()
+    updates = FieldUpdates(store, 'diff_rate', flush_size=3)
+    assert not updates.add('A000010', [{'date': 20240809, 'diff_rate': 0.5}])
+    assert updates.add('A000020', [{'date': 20240808, 'diff_rate': 0.1}, {'date': 20240809, 'diff_rate': 0.2}])
+    assert store.writes == []  # flush 는 호출한 쪽에서
+    assert updates.flush() == 3
+    assert [sorted(batch) for batch in store.writes] == [['A000010', 'A000020']]
+    assert store.fields == [('A000010', 'diff_rate', [20240809]), ('A000020', 'diff_rate', [20240808, 20240809])]
+    assert updates.flush() == 0 and updates.written == 3
+
+
+def test_field_operations_scope_by_layout():
+    rows = [{'date': 20240809, 'diff_rate': 0.5}]
+    assert TickerBarStore(None, 'sp_day').field_operations('A000010', rows) == [
+        UpdateOne({'date': 20240809}, {'$set': {'diff_rate': 0.5}})]
+    # time-series 는 모든 종목이 한 컬렉션에 있으므로 code 조건을 더한다
+    assert TimeSeriesBarStore(None, 'sp_day').field_operations('A000010', rows) == [
+        UpdateOne({'code': 'A000010', 'date': 20240809}, {'$set': {'diff_rate': 0.5}})]
+
+
+# insert_many 만 받는 종목 컬렉션과 watermark 컬렉션
+class _InsertCollection:
+    def __init__(self):
+        self.docs = []
+
+    def insert_many(self, docs, ordered=True):
+        self.docs.extend(docs)
+        return type('InsertManyResult', (), {'inserted_ids': list(range(len(docs)))})
+
+    def update_one(self, query, update, upsert=False):
+        pass
+
+
+class _BulkHandler:
+    profile = type('Profile', (), {'write_chunk': 1000})
+
+    def __init__(self):
+        self.collection = _InsertCollection()
+        self._client = {'sp_day': {'A000010': self.collection}, 'sp_common': {'sp_watermark': _InsertCollection()}}
+
+    def indexes_deferred(self, db_name):
+        return True  # bulk_load 중처럼 인덱스 확인 없이 insert
+
+
+def test_deferred_watermark_waits_for_commit():
+    handler = _BulkHandler()
+    watermarks = WatermarkStore(handler)
+    store = TickerBarStore(handler, 'sp_day', watermarks)
+    # 최신 페이지부터 저장
+    for dates in ([20240808, 20240809], [20240806, 20240807]):
+        bars = {'date': np.array(dates, dtype=np.int64), 'close': np.array([1, 2], dtype=np.int32)}
+        store.write(store.prepare('A000010', bars, watermark=0), defer=True)
+    # 종목을 다 받기 전에 멈추면 watermark 는 그대로라서 다음 실행에서 처음부터 다시 받는다
+    assert watermarks.get('sp_day', 'A000010') is None and len(handler.collection.docs) == 4
+
+    store.commit('A000010', ('marketC',))
+    mark = watermarks.get('sp_day', 'A000010')
+    assert (mark['earliest'], mark['latest'], mark['count'], mark['marketC_date']) == (20240806, 20240809, 4, 20240809)
+    store.commit('A000010')  # 모아 둔 것이 없으면 아무것도 하지 않음
+    assert watermarks.get('sp_day', 'A000010')['count'] == 4
+
+
+if __name__ == "__main__":
+    test_prepare_splits_at_watermark()
+    test_bucket_document_per_day()
+    test_bucket_prepare_insert_append_merge()
+    test_bar_datetimes()
+    test_timeseries_prepare_adds_meta()
+    test_partition_prepare_routes_by_period()
+    test_write_stats_report()
+    test_field_updates_batch_across_codes()
+    test_field_operations_scope_by_layout()
+    test_deferred_watermark_waits_for_commit()
+    print("ok")
@@ -0,0 +1,74 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # util 모듈이 있는 경로를 추가
+from pymongo import InsertOne, UpdateMany, UpdateOne
+from util.codeMaster import diff_code_master, outtime_worklist
+
+
+def test_diff_code_master():
+    existing = [
+        {'stock_code': 'A000010', 'stock_name': '가', 'market_kind': 1, 'stock_status': 0, 'date': 20240808},
+        {'stock_code': 'A000020', 'stock_name': '나', 'market_kind': 2, 'stock_status': 0, 'date': 20240808},
+        {'stock_code': 'A000030', 'stock_name': '다', 'market_kind': 2, 'stock_status': 0, 'date': 20240809},
+    ]
+    server_rows = [
+        ('A000010', '가', 1, 0),  # 그대로 (date 만 갱신)
+        ('A000020', '나', 2, 1),  # 거래정지
+        ('A000030', '다', 2, 0),  # 오늘 이미 갱신
+        ('A000040', '라', 1, 0),  # 신규
+    ]
+    diff = diff_code_master(existing, server_rows, ['A000010', 'A000040', 'A000090'], 20240809)
+
+    assert diff.counts() == {'added': 1, 'changed': 1, 'unchanged': 2, 'orphaned': 1}
+    assert diff.changed == ['A000020'] and diff.orphaned == ['A000090']
+    kinds = [type(op) for op in diff.operations]
+    assert kinds == [UpdateOne, InsertOne, UpdateMany, InsertOne]
+    assert diff.operations[1]._doc['sp_day'] is None
+    assert diff.operations[2]._filter == {'stock_code': {'$in': ['A000010']}}
+    assert diff.operations[3]._doc['stock_status'] == 2
+
+
+def test_no_writes_when_up_to_date():
+    existing = [{'stock_code': 'A000010', 'stock_name': '가', 'market_kind': 1, 'stock_status': 0, 'date': 20240809}]
+    diff = diff_code_master(existing, [('A000010', '가', 1, 0)], ['A000010'], 20240809)
+    assert diff.operations == []
+
+
+# 메모리에 읽어 둔 watermark 만 흉내낸다
+class _Watermarks:
+    def __init__(self, marks):
+        self.marks = marks
+
+    def latest(self, db_name, code, default=None):
+        return self.marks[code]['latest'] if code in self.marks else default
+
+    def earliest(self, db_name, code, default=None):
+        return self.marks[code]['earliest'] if code in self.marks else default
+
+    def field_date(self, db_name, code, field, default=None):
+        return self.marks.get(code, {}).get(field, default)
+
+
+def test_outtime_worklist():
+    master = [{'stock_code': 'A000010', 'stock_name': '가', 'stock_status': 0},
+              {'stock_code': 'A000020', 'stock_name': '나', 'stock_status': 1},
+              {'stock_code': 'A000030', 'stock_name': '다', 'stock_status': 0}]
+    watermarks = _Watermarks({
+        'A000010': {'latest': 20240809, 'earliest': 20200102, 'diff_rate': 20240807},
+        'A000020': {'latest': 20240809, 'earliest': 20200102},  # 거래정지
+        'A000030': {'latest': 20240809, 'earliest': 20200102, 'diff_rate': 20240809},  # 이미 최신
+        'A000040': {'latest': 20240809, 'earliest': 20230102},  # 마스터에 없음
+        'U001': {'latest': 20240809, 'earliest': 19900103},
+    })
+    codes = ['A000010', 'A000020', 'A000030', 'A000040', 'A000050', 'U001']
+    assert outtime_worklist(codes, master, watermarks, 'sp_day') == [
+        {'종목코드': 'A000010', '종목명': '가', 'from_date': 20240807},
+        {'종목코드': 'A000040', '종목명': None, 'from_date': 20230102},
+    ]
+
+
+if __name__ == "__main__":
+    test_diff_code_master()
+    test_no_writes_when_up_to_date()
+    test_outtime_worklist()
+    print("ok")
@@ -0,0 +1,76 @@
+import os
+import sys
+import asyncio
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # api 모듈이 있는 경로를 추가
+from api.comExecutor import ComExecutor, ComProxy
+from api.creonAPI import CpStockChart
+from api.rateLimiter import CpRateLimiter
+from api.simulator import SimulatorBackend
+
+
+def test_request_does_not_block_loop():
+    backend = SimulatorBackend(end_date=20240809, n_kospi=2, n_kosdaq=0, minute_days=1, latency=0.2)
+    chart = CpStockChart(CpRateLimiter(capacity=10 ** 6, window=1.0), backend)
+    ticks = []
+
+    async def ticker(done):
+        while not done.is_set():
+            ticks.append(1)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        done = asyncio.Event()
+        task = asyncio.ensure_future(ticker(done))
+        result = await chart.RequestDWM('A000010', 'D', 10)
+        done.set()
+        await task
+        return result
+
+    result = asyncio.run(main())
+    backend.close()
+    assert result.size == 10
+    assert len(ticks) >= 5  # 응답을 기다리는 동안 이벤트 루프가 다른 작업을 처리함
+
+
+def test_proxy_calls_on_com_thread():
+    backend = SimulatorBackend(end_date=20240809, n_kospi=2, n_kosdaq=0)
+    executor = backend.executor
+    threads = []
+
+    class Obj:
+        value = 1
+
+        def who(self):
+            threads.append(threading.current_thread())
+            return self.value
+
+    proxy = ComProxy(executor, executor.call(Obj))
+    proxy.value = 2
+    assert proxy.who() == 2
+    assert threads[0] is not threading.current_thread()
+    backend.close()
+
+
+def test_thread_init_error_reaches_callers():
+    # pywin32 가 없는 환경처럼 COM 스레드 초기화가 실패하는 backend
+    class Backend:
+        def thread_init(self):
+            raise ImportError('pythoncom')
+
+    executor = ComExecutor(Backend())
+    futures = [executor.submit(int, '1') for _ in range(3)]
+    for future in futures:
+        assert isinstance(future.exception(timeout=5), ImportError)
+    try:
+        executor.call(int, '1')
+        assert False, '초기화 예외가 전달되어야 함'
+    except ImportError:
+        pass
+
+
+if __name__ == "__main__":
+    test_request_does_not_block_loop()
+    test_proxy_calls_on_com_thread()
+    test_thread_init_error_reaches_callers()
+    print("ok")
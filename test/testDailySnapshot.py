@@ -0,0 +1,55 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # util 모듈이 있는 경로를 추가
+from util.dailySnapshot import DailySnapshotStore
+
+
+# bulk_write / delete_one 호출만 기록하는 컬렉션
+class _Collection:
+    def __init__(self):
+        self.writes = []
+        self.deleted = []
+
+    def bulk_write(self, operations, ordered=True):
+        self.writes.append(operations)
+
+    def delete_one(self, query):
+        self.deleted.append(query)
+
+
+class _Handler:
+    def __init__(self, collection):
+        self._client = {'sp_snapshot': {'sp_day': collection}}
+
+
+def test_record_groups_by_date():
+    collection = _Collection()
+    snapshots = DailySnapshotStore(_Handler(collection))
+    snapshots.record('A000010', [{'date': 20240808, 'close': 100, 'volume': 5, '_id': 1},
+                                 {'date': 20240809, 'close': 101}])
+    snapshots.record('A000020', [{'date': 20240809, 'diff_rate': 0.5}])
+    assert collection.writes == []
+
+    assert snapshots.flush() == 2
+    operations = {op._filter['date']: op for op in collection.writes[0]}
+    assert operations[20240808]._doc == {'$set': {'bars.A000010.close': 100, 'bars.A000010.volume': 5}}
+    assert operations[20240809]._doc == {'$set': {'bars.A000010.close': 101, 'bars.A000020.diff_rate': 0.5}}
+    assert operations[20240809]._upsert
+    assert snapshots.flush() == 0
+
+
+def test_flush_size_and_delete_day():
+    collection = _Collection()
+    snapshots = DailySnapshotStore(_Handler(collection), flush_size=3)
+    snapshots.record('A000010', [{'date': 20240808, 'close': 100}, {'date': 20240809, 'close': 101}])
+    snapshots.delete_day(20240809)  # 아직 저장하지 않은 변경도 버린다
+    assert collection.deleted == [{'date': 20240809}]
+    snapshots.record('A000020', [{'date': 20240808, 'close': 50, 'marketC': 7}])
+    assert len(collection.writes) == 1  # 모아 둔 값이 flush_size 에 닿아서 저장
+    assert [op._filter['date'] for op in collection.writes[0]] == [20240808]
+
+
+if __name__ == "__main__":
+    test_record_groups_by_date()
+    test_flush_size_and_delete_day()
+    print("ok")
@@ -0,0 +1,124 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # util 모듈이 있는 경로를 추가
+from util.maintenance import MaintenanceJob, MaintenanceRunner, DeleteDay
+
+
+# 실행 기록(checkpoint)을 dict 로 보관하는 컬렉션
+class _Collection:
+    def __init__(self):
+        self.docs = {}
+        self.indexes = []
+
+    def create_index(self, keys, unique=False, name=None):
+        self.indexes.append((name, unique))
+
+    def find(self, query, projection=None):
+        return [dict(job=job, unit=unit) for job, unit in self.docs if job == query['job']]
+
+    def update_one(self, query, update, upsert=False):
+        self.docs[(query['job'], query['unit'])] = update['$set']['count']
+
+    def delete_many(self, query):
+        self.docs = {key: count for key, count in self.docs.items() if key[0] != query['job']}
+
+
+class _Handler:
+    def __init__(self, collection):
+        self._client = {'sp_common': {'sp_maintenance': collection}}
+
+
+# fail 에 있는 종목에서 실패하는 작업
+class _Job(MaintenanceJob):
+    name = 'test'
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.applied = []
+        self.finished = False
+
+    def units(self):
+        return ['A000010', 'A000020', 'A000030']
+
+    def count(self, unit):
+        return 2
+
+    def apply(self, unit):
+        if unit in self.fail:
+            raise RuntimeError(unit)
+        self.applied.append(unit)
+        return 1
+
+    def finish(self):
+        self.finished = True
+
+
+def test_dry_run_counts_only():
+    collection = _Collection()
+    job = _Job()
+    result = MaintenanceRunner(_Handler(collection), workers=2).run(job, dry_run=True)
+    assert (result.units, result.skipped, result.count, result.dry_run) == (3, 0, 6, True)
+    assert job.applied == [] and not job.finished and collection.docs == {}
+
+
+def test_resume_skips_finished_units():
+    collection = _Collection()
+    runner = MaintenanceRunner(_Handler(collection), workers=1)
+    job = _Job(fail=['A000020'])
+    try:
+        runner.run(job)
+        assert False, '실패한 종목이 있으면 예외'
+    except RuntimeError:
+        pass
+    assert runner.finished_units(job) == set(job.applied) and not job.finished
+
+    # 다시 실행하면 끝난 종목은 건너뛰고, 모두 끝나면 기록을 지운다
+    job.fail = set()
+    done = set(job.applied)
+    result = runner.run(job)
+    assert result.skipped == len(done) and result.count == 3 - len(done)
+    assert sorted(job.applied) == ['A000010', 'A000020', 'A000030'] and job.finished
+    assert collection.docs == {}
+    assert collection.indexes[0] == ('job_1_unit_1', True)
+
+
+def test_throttle_sleeps_per_unit():
+    slept = []
+    runner = MaintenanceRunner(_Handler(_Collection()), workers=1, throttle=0.5, sleep=slept.append)
+    runner.run(_Job())
+    assert slept == [0.5, 0.5, 0.5]
+
+
+# delete_day / count_day 호출만 기록하는 store
+class _DayStore:
+    db_name = 'sp_day'
+    snapshots = None
+
+    def __init__(self):
+        self.deleted = []
+
+    def codes(self):
+        return ['A000010', 'A000020']
+
+    def count_day(self, date, code):
+        return 1
+
+    def delete_day(self, date, codes=None):
+        self.deleted.append((date, codes))
+        return len(codes)
+
+
+def test_delete_day_uses_store_per_code():
+    store = _DayStore()
+    runner = MaintenanceRunner(_Handler(_Collection()), workers=1)
+    assert runner.run(DeleteDay(store, 20240808), dry_run=True).count == 2 and store.deleted == []
+    assert runner.run(DeleteDay(store, 20240808)).count == 2
+    assert sorted(store.deleted) == [(20240808, ['A000010']), (20240808, ['A000020'])]
+
+
+if __name__ == "__main__":
+    test_dry_run_counts_only()
+    test_resume_skips_finished_units()
+    test_throttle_sleeps_per_unit()
+    test_delete_day_uses_store_per_code()
+    print("ok")
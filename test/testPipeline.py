@@ -0,0 +1,67 @@
+import os
+import sys
+import asyncio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # util 모듈이 있는 경로를 추가
+from util.pipeline import Pipeline
+
+
+def test_stages_overlap_with_backpressure():
+    written = []
+
+    async def fetch(i):
+        await asyncio.sleep(0.01)
+        return None if i == 3 else i  # None 은 다음 단계로 넘기지 않음
+
+    async def transform(i):
+        return i * 10
+
+    async def write(i):
+        await asyncio.sleep(0.03)
+        written.append(i)
+
+    pipeline = Pipeline(maxsize=2)
+    pipeline.add_stage('fetch', fetch).add_stage('transform', transform).add_stage('write', write, workers=2)
+    stats = asyncio.run(pipeline.run(range(10)))
+
+    assert sorted(written) == [i * 10 for i in range(10) if i != 3]
+    assert [s.items for s in stats] == [10, 9, 9]
+    assert stats[0].blocked > 0  # 저장이 느려 queue 가 가득 차면 fetch 가 기다림
+    assert max(s.max_depth for s in stats) <= 2
+    assert len(pipeline.report()) == 3
+
+
+def test_async_generator_stage():
+    written = []
+
+    async def pages(code):
+        for page in range(3):
+            yield code, page
+
+    async def write(item):
+        written.append(item)
+
+    pipeline = Pipeline(maxsize=1).add_stage('fetch', pages).add_stage('write', write)
+    stats = asyncio.run(pipeline.run(['A', 'B']))
+    assert written == [('A', 0), ('A', 1), ('A', 2), ('B', 0), ('B', 1), ('B', 2)]
+    assert [s.items for s in stats] == [2, 6]
+
+
+def test_stage_error_is_raised():
+    async def fail(i):
+        raise ValueError(i)
+
+    async def main():
+        await Pipeline().add_stage('fail', fail).run(range(3))
+    try:
+        asyncio.run(main())
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+if __name__ == "__main__":
+    test_stages_overlap_with_backpressure()
+    test_async_generator_stage()
+    test_stage_error_is_raised()
+    print("ok")
@@ -0,0 +1,90 @@
+import os
+import sys
+import asyncio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # api 모듈이 있는 경로를 추가
+from api.rateLimiter import CpRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+# 15초 창마다 limit 건을 허용하는 가짜 CpUtil.CpCybos
+class FakeCybos:
+    def __init__(self, clock, limit=60, window=15.0):
+        self.clock = clock
+        self.limit = limit
+        self.window = window
+        self.window_start = clock()
+        self.used = 0
+
+    def _roll(self):
+        if self.clock() - self.window_start >= self.window:
+            self.window_start = self.clock()
+            self.used = 0
+
+    def GetLimitRemainCount(self, limit_type):
+        self._roll()
+        return self.limit - self.used
+
+    @property
+    def LimitRequestRemainTime(self):
+        self._roll()
+        return int((self.window - (self.clock() - self.window_start)) * 1000)
+
+    def BlockRequest(self):
+        self._roll()
+        assert self.used < self.limit, "요청 제한 초과"
+        self.used += 1
+
+
+def run_requests(limiter, cybos, n):
+    async def main():
+        for _ in range(n):
+            await limiter.acquire()
+            cybos.BlockRequest()
+            limiter.release()
+    asyncio.run(main())
+
+
+def test_burst_while_budget_remains():
+    clock = FakeClock()
+    cybos = FakeCybos(clock)
+    limiter = CpRateLimiter(status=cybos, clock=clock, sleep=clock.sleep)
+    run_requests(limiter, cybos, 60)
+    assert clock.now == 0.0  # 남은 요청이 있는 동안은 전혀 기다리지 않음
+
+
+def test_wait_until_window_refresh():
+    clock = FakeClock()
+    cybos = FakeCybos(clock)
+    limiter = CpRateLimiter(status=cybos, clock=clock, sleep=clock.sleep, margin=0.0)
+    run_requests(limiter, cybos, 150)
+    assert 30.0 <= clock.now < 31.0  # 창 두 번만 기다림
+    assert limiter.request_count == 150
+
+
+def test_token_bucket_without_server_status():
+    clock = FakeClock()
+    limiter = CpRateLimiter(capacity=60, window=15.0, clock=clock, sleep=clock.sleep)
+
+    async def main():
+        for _ in range(61):
+            await limiter.acquire()
+            limiter.release()
+    asyncio.run(main())
+    assert abs(clock.now - 0.25) < 1e-9  # 61번째 요청은 토큰 1개가 찰 때까지만 대기
+
+
+if __name__ == "__main__":
+    test_burst_while_budget_remains()
+    test_wait_until_window_refresh()
+    test_token_bucket_without_server_status()
+    print("ok")
@@ -0,0 +1,192 @@
+import os
+import sys
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # api 모듈이 있는 경로를 추가
+from api.realtime import (Tick, MinuteBarBuilder, FakeTickSource, bar_label, incomplete_session_codes,
+                          REALTIME_SESSION_COLLECTION)
+from realtimeCrawler import RealtimeCrawler
+from util.chartFrame import price_upserts
+from util.utils import fetch_range
+
+
+def test_bar_label():
+    assert bar_label(90000) == 901
+    assert bar_label(90059) == 901
+    assert bar_label(95930) == 1000
+    assert bar_label(151959) == 1520
+    assert bar_label(153002) == 1530  # 장 마감 동시호가
+
+
+def test_builder_from_fake_feed():
+    ticks = [
+        Tick('A000010', 90001, 1000, 10),
+        Tick('A000020', 90002, 500, 1),
+        Tick('A000010', 90030, 1010, 5),
+        Tick('A000010', 90059, 990, 1),
+        Tick('A000010', 90101, 1005, 2),
+        Tick('A000010', 90058, 1, 1),  # 늦게 도착한 이전 분 체결
+        Tick('A000030', 90101, 1, 1),  # 구독하지 않은 종목
+    ]
+    source = FakeTickSource(ticks)
+    builder = MinuteBarBuilder(20240809)
+
+    async def main():
+        await source.start(['A000010', 'A000020'], builder.on_tick)
+        await source.stop()
+    asyncio.run(main())
+
+    builder.close_bars(90130)  # 09:01 분봉까지 완성, 09:02 분봉은 진행 중
+    bars = builder.pop_closed()
+    assert sorted(bars) == ['A000010', 'A000020']
+    a = bars['A000010']
+    assert list(a['date']) == [202408090901]
+    assert (a['open'][0], a['high'][0], a['low'][0], a['close'][0]) == (1000, 1010, 990, 990)
+    assert a['volume'][0] == 16
+    assert a['value'][0] == 1000 * 10 + 1010 * 5 + 990
+    assert builder.late_ticks == 1
+
+    builder.close_all()
+    last = builder.pop_closed()['A000010']
+    assert list(last['date']) == [202408090902]
+    assert price_upserts(last)[0]._doc['$set']['close'] == 1005
+
+
+# insert 한 문서만 보관하는 컬렉션
+class _Collection:
+    def __init__(self):
+        self.docs = []
+
+    def insert_many(self, docs, ordered=True):
+        self.docs += docs
+        return SimpleNamespace(inserted_ids=[None] * len(docs))
+
+    def find(self, query=None, projection=None):
+        return []
+
+    def update_one(self, query, update, upsert=False):
+        pass
+
+
+class _Client(dict):
+    def __missing__(self, db_name):
+        self[db_name] = _Database()
+        return self[db_name]
+
+
+class _Database(dict):
+    def __missing__(self, collection_name):
+        self[collection_name] = _Collection()
+        return self[collection_name]
+
+
+class _Handler:
+    def __init__(self, codes):
+        self.codes = codes
+        self.sessions = {}  # date -> sp_1min_realtime 문서
+        self.profile = SimpleNamespace(write_chunk=1000)
+        self._client = _Client()  # 컬렉션은 처음 쓸 때 만든다
+
+    def find_items(self, query, db_name=None, collection_name=None, projection=None):
+        return [{'stock_code': code} for code in self.codes]
+
+    def find_item(self, query, db_name=None, collection_name=None):
+        assert (db_name, collection_name) == ('sp_common', REALTIME_SESSION_COLLECTION)
+        return self.sessions.get(query['date'])
+
+    def upsert_item(self, query, update, db_name=None, collection_name=None):
+        assert (db_name, collection_name) == ('sp_common', REALTIME_SESSION_COLLECTION)
+        self.sessions[query['date']] = dict(update['$set'])
+
+    def load_index_snapshot(self, db_name):
+        return {}
+
+    def indexes_deferred(self, db_name):
+        return False
+
+    def ensure_collection_indexes(self, db_name, collection_name, background=True):
+        pass
+
+    def has_index(self, db_name, collection_name, name, unique=False):
+        return True
+
+    def wait_index_builds(self):
+        return 0
+
+
+class _Bot:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, msg):
+        self.messages.append(msg)
+
+
+# sleep 한 만큼만 시간이 흐르는 시계
+class _Clock:
+    def __init__(self, start):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    async def sleep(self, seconds):
+        self.time += timedelta(seconds=seconds)
+        await asyncio.sleep(0)  # 체결을 보내는 task 가 실행되도록 양보
+
+
+def _run_session(start, ticks):
+    handler = _Handler(['A000010', 'A000020'])
+    clock = _Clock(start)
+    crawler = RealtimeCrawler(FakeTickSource(ticks), handler, _Bot(), now=clock.now, sleep=clock.sleep)
+    asyncio.run(crawler.run())
+    return handler, crawler
+
+
+def test_crawler_run_writes_bars_and_complete_session():
+    ticks = [
+        Tick('A000010', 90001, 1000, 10),
+        Tick('A000010', 90030, 1010, 5),
+        Tick('A000020', 90101, 500, 1),
+        Tick('A000010', 153002, 1020, 3),  # 장 마감 동시호가
+    ]
+    handler, crawler = _run_session(datetime(2024, 8, 9, 8, 59), ticks)
+
+    docs = handler._client['sp_1min']['A000010'].docs
+    assert [doc['date'] for doc in docs] == [202408090901, 202408091530]
+    assert (docs[0]['open'], docs[0]['high'], docs[0]['close'], docs[0]['volume']) == (1000, 1010, 1010, 15)
+    assert [doc['date'] for doc in handler._client['sp_1min']['A000020'].docs] == [202408090902]
+    assert crawler.bar_count == 3
+
+    session = handler.sessions[20240809]
+    assert session['complete'] and session['start'] == 85900 and session['end'] >= 153100
+    assert session['codes'] == ['A000010', 'A000020'] and session['ticks'] == 4
+    # 장 전체를 받은 날은 저녁 배치가 당일 분봉을 다시 받지 않는다
+    assert incomplete_session_codes(handler, 20240809) == set()
+
+
+def test_late_start_session_refetched_by_batch():
+    handler, crawler = _run_session(datetime(2024, 8, 9, 10, 0), [Tick('A000010', 100001, 1000, 1)])
+    session = handler.sessions[20240809]
+    assert not session['complete'] and session['start'] == 100000
+    assert [doc['date'] for doc in handler._client['sp_1min']['A000010'].docs] == [202408091001]
+
+    refetch_codes = incomplete_session_codes(handler, 20240809)
+    assert refetch_codes == {'A000010', 'A000020'}
+    assert incomplete_session_codes(handler, 20240808) == set()  # 실시간 수집 기록이 없는 날
+
+    # 실시간 수집이 끊긴 날은 watermark 가 당일 15:30 이어도 당일 전체를 다시 받는다
+    watermark = 202408091530
+    from_date, start_date, end_date = fetch_range(watermark, 20240809, 'A000010' in refetch_codes)
+    assert (from_date, start_date, end_date) == (202408090000, 20240809, 20240809)
+    from_date, start_date, end_date = fetch_range(watermark, 20240809)
+    assert start_date > end_date  # 완전한 날은 받을 기간이 없음
+
+
+if __name__ == "__main__":
+    test_bar_label()
+    test_builder_from_fake_feed()
+    test_crawler_run_writes_bars_and_complete_session()
+    test_late_start_session_refetched_by_batch()
+    print("ok")
@@ -0,0 +1,46 @@
+import os
+import sys
+import asyncio
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # api 모듈이 있는 경로를 추가
+from api.creonAPI import CpStockChart, CpCodeMgr, CpStockUniWeek
+from api.rateLimiter import CpRateLimiter
+from api.recorder import RecordingBackend, ReplayBackend, read_capture
+from api.simulator import SimulatorBackend
+
+
+def fetch_all(backend):
+    limiter = CpRateLimiter(capacity=10 ** 6, window=1.0)
+    chart = CpStockChart(limiter, backend)
+    uni_week = CpStockUniWeek(limiter, backend)
+    code_mgr = CpCodeMgr(backend)
+
+    async def main():
+        codes = list(code_mgr.get_code_list(1))
+        results = []
+        for code in codes:
+            results.append(await chart.RequestMT(code, 'm', 1, 200000))
+            results.append(await chart.RequestDWM(code, 'D', 14))
+            results.append(await uni_week.request_stock_data(code, 200, from_date=20240101))
+        return codes, results
+    return asyncio.run(main())
+
+
+def test_record_and_replay():
+    path = os.path.join(tempfile.mkdtemp(), 'capture.bin')
+    backend = RecordingBackend(SimulatorBackend(end_date=20240809, n_kospi=3, n_kosdaq=0, minute_days=10, limit=10 ** 6), path)
+    codes, recorded = fetch_all(backend)
+    backend.close()
+    assert any(record['kind'] == 'call' for record in read_capture(path))
+
+    replayed_codes, replayed = fetch_all(ReplayBackend(path))
+    assert replayed_codes == codes
+    for a, b in zip(recorded, replayed):
+        assert a.page_count == b.page_count
+        for col in a.columns:
+            assert (a.columns[col] == b.columns[col]).all()
+
+
+if __name__ == "__main__":
+    test_record_and_replay()
+    print("ok")
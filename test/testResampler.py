@@ -0,0 +1,39 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # util 모듈이 있는 경로를 추가
+import numpy as np
+from util.resampler import minute_keys, week_keys, month_keys, resample
+
+
+def test_period_keys():
+    dates = np.array([202408090901, 202408090903, 202408090904, 202408091520, 202408091530], dtype=np.int64)
+    assert minute_keys(dates, 3).tolist() == [202408090903, 202408090903, 202408090906, 202408091521, 202408091530]
+    # 60분봉의 마지막 구간은 15:30 에 끝난다
+    assert minute_keys(dates, 60).tolist() == [202408091000, 202408091000, 202408091000, 202408091530, 202408091530]
+    days = np.array([20240101, 20240105, 20240107, 20240108, 20240229], dtype=np.int64)
+    assert week_keys(days).tolist() == [20240101, 20240101, 20240101, 20240108, 20240226]
+    assert month_keys(days).tolist() == [20240101, 20240101, 20240101, 20240101, 20240201]
+
+
+def test_resample_ohlcv():
+    bars = {'date': np.array([901, 902, 903, 904], dtype=np.int64),
+            'open': np.array([10, 11, 12, 13], dtype=np.int32),
+            'high': np.array([15, 18, 13, 14], dtype=np.int32),
+            'low': np.array([9, 10, 8, 12], dtype=np.int32),
+            'close': np.array([11, 12, 13, 14], dtype=np.int32),
+            'volume': np.array([1, 2, 3, 4], dtype=np.int64)}
+    result = resample(bars, [3, 3, 3, 6])
+    assert result['date'].tolist() == [3, 6]
+    assert result['open'].tolist() == [10, 13]
+    assert result['high'].tolist() == [18, 14]
+    assert result['low'].tolist() == [8, 12]
+    assert result['close'].tolist() == [13, 14]
+    assert result['volume'].tolist() == [6, 4]
+    assert 'value' not in result
+    assert resample({col: values[:0] for col, values in bars.items()}, [])['date'].tolist() == []
+
+
+if __name__ == "__main__":
+    test_period_keys()
+    test_resample_ohlcv()
+    print("ok")
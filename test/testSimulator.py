@@ -0,0 +1,158 @@
+import os
+import sys
+import asyncio
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # api 모듈이 있는 경로를 추가
+from api.creonAPI import CpStockChart, CpCodeMgr, CpStockUniWeek, CpMarketEye
+from api.rateLimiter import CpRateLimiter
+from api.simulator import SimulatorBackend
+from util.utils import gap_start_date
+from util.chartFrame import chart_bars, price_upserts
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        self.now += seconds
+
+
+def make_backend(**kwargs):
+    clock = FakeClock()
+    backend = SimulatorBackend(end_date=20240809, n_kospi=20, n_kosdaq=20, minute_days=30,
+                               clock=clock, sleep=clock.sleep, **kwargs)
+    limiter = CpRateLimiter(status=backend.cp_status(), clock=clock, sleep=clock.async_sleep)
+    return backend, limiter, clock
+
+
+def test_code_mgr():
+    backend, _, _ = make_backend()
+    code_mgr = CpCodeMgr(backend=backend)
+    codes = code_mgr.get_code_list(1) + code_mgr.get_code_list(2)
+    assert len(codes) == 40
+    assert code_mgr.get_market_kind(codes[0]) == 1
+    assert code_mgr.get_code_name('U001') == 'KOSPI'
+
+
+def test_daily_paging_is_deterministic():
+    backend, limiter, _ = make_backend()
+    chart = CpStockChart(limiter, backend)
+    result = asyncio.run(chart.RequestDWM('A000010', 'D', 5000))
+    assert result.size == 5000
+    assert result.page_count == 2
+    assert result.newest_date == 20240809
+    assert list(result.columns['date'][:2]) == [20240809, 20240808]
+
+    backend2, limiter2, _ = make_backend()
+    again = asyncio.run(CpStockChart(limiter2, backend2).RequestDWM('A000010', 'D', 5000))
+    assert (again.columns['close'] == result.columns['close']).all()
+
+
+def test_minute_bars():
+    backend, limiter, _ = make_backend()
+    result = asyncio.run(CpStockChart(limiter, backend).RequestMT('A000010', 'm', 1, 200000))
+    assert result.size == 30 * 381  # minute_days 만큼만 제공
+    assert result.newest_date == 202408091530
+    assert result.columns['date'][1] == 202408091520
+    assert result.columns['date'].dtype == np.int64
+    assert result.columns['close'].dtype == np.int32
+    assert result.columns['volume'].dtype == np.int64
+
+
+def test_minute_pages_are_streamed():
+    backend, limiter, _ = make_backend()
+    chart = CpStockChart(limiter, backend)
+
+    async def collect():
+        return [page async for page in chart.StreamMT('A000010', 'm', 1, 200000)]
+    pages = asyncio.run(collect())
+    assert len(pages) == 5  # 30일 * 381 행 / 페이지 2856 행
+    assert max(page.size for page in pages) == 2856  # 한 페이지씩만 메모리에 올림
+
+    result = asyncio.run(chart.RequestMT('A000010', 'm', 1, 200000))
+    streamed = np.concatenate([page.columns['date'] for page in pages])
+    assert (streamed == result.columns['date']).all()
+    assert pages[0].newest_date == result.newest_date and pages[-1].oldest_date == result.oldest_date
+
+
+def test_bars_to_upserts():
+    backend, limiter, _ = make_backend()
+    result = asyncio.run(CpStockChart(limiter, backend).RequestMT('A000010', 'm', 1, 200000))
+    bars = chart_bars(result, ['open', 'close', 'volume'], from_date=202408091518)
+    assert list(bars['date']) == [202408091519, 202408091520, 202408091530]
+    operations = price_upserts(bars)
+    doc = operations[-1]._doc['$set']
+    assert doc['date'] == 202408091530
+    assert all(type(v) is int for v in doc.values())  # numpy 타입은 BSON 으로 저장할 수 없음
+
+
+def test_gap_request_by_period():
+    backend, limiter, _ = make_backend()
+    chart = CpStockChart(limiter, backend)
+    # 금요일(20240802) 까지 저장되어 있으면 월요일부터 요청
+    start_date = gap_start_date(20240802)
+    assert start_date == 20240805
+    result = asyncio.run(chart.RequestDWM('A000010', 'D', 14, from_date=20240802,
+                                          start_date=start_date, end_date=20240809))
+    assert list(result.columns['date']) == [20240809, 20240808, 20240807, 20240806, 20240805]
+    assert backend.request_count == 1
+
+    # 분봉은 장 마감(15:30)까지 받은 날이 아니면 그 날부터 다시 요청
+    assert gap_start_date(202408081530) == 20240809
+    assert gap_start_date(202408091000) == 20240809
+    result = asyncio.run(chart.RequestMT('A000010', 'm', 1, 200000, from_date=202408081530,
+                                         start_date=20240809, end_date=20240809))
+    assert result.size == 381
+    assert result.oldest_date == 202408090901
+
+
+def test_rate_limit_is_enforced():
+    backend, limiter, clock = make_backend()
+    chart = CpStockChart(limiter, backend)
+
+    async def main():
+        for _ in range(100):
+            await chart.RequestDWM('A000010', 'D', 10)
+    asyncio.run(main())
+    assert backend.throttled_count == 0
+    assert clock.now >= 15.0  # 60건을 넘으면 다음 창까지 기다려야 함
+
+
+def test_uni_week():
+    backend, limiter, _ = make_backend()
+    result = asyncio.run(CpStockUniWeek(limiter, backend).request_stock_data('A000010', 200, from_date=20240701))
+    assert result.oldest_date >= 20240701
+    assert result.newest_date == 20240809
+
+
+def test_market_eye_snapshot():
+    backend, limiter, _ = make_backend()
+    codes = CpCodeMgr(backend=backend).get_code_list(1)
+    snapshot = asyncio.run(CpMarketEye(limiter, backend).request(codes))
+    assert snapshot['code'] == list(codes)
+    assert backend.request_count == 1  # 200 종목까지 한 번에
+
+    daily = asyncio.run(CpStockChart(limiter, backend).RequestDWM(codes[3], 'D', 1))
+    for col in ('open', 'high', 'low', 'close', 'volume', 'value'):
+        assert snapshot[col][3] == daily.columns[col][0]
+    assert snapshot['close'][3] * snapshot['shares'][3] == daily.columns['marketC'][0]
+
+
+if __name__ == "__main__":
+    test_code_mgr()
+    test_daily_paging_is_deterministic()
+    test_minute_bars()
+    test_minute_pages_are_streamed()
+    test_bars_to_upserts()
+    test_gap_request_by_period()
+    test_rate_limit_is_enforced()
+    test_uni_week()
+    test_market_eye_snapshot()
+    print("ok")
@@ -0,0 +1,78 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # util 모듈이 있는 경로를 추가
+import numpy as np
+from util.watermark import WatermarkStore
+
+
+# update_one 호출만 기록하는 컬렉션
+class _Collection:
+    def __init__(self):
+        self.updates = []
+
+    def update_one(self, query, update, upsert=False):
+        self.updates.append((query, update, upsert))
+
+
+class _Handler:
+    def __init__(self, collection, prices=None):
+        self._client = dict(prices or {}, sp_common={'sp_watermark': collection})
+
+
+# 종목 컬렉션: aggregate 는 요약 한 건, find_one 은 조회한 조건만 기록
+class _PriceCollection:
+    def __init__(self):
+        self.queries = []
+
+    def aggregate(self, pipeline):
+        return [{'latest': 20240809, 'earliest': 20240801, 'count': 7}]
+
+    def find_one(self, query, projection=None, sort=None):
+        self.queries.append(query)
+        return {'date': 20240808}
+
+
+def test_record_keeps_range_and_count():
+    collection = _Collection()
+    store = WatermarkStore(_Handler(collection))
+
+    store.record('sp_day', 'A000010', np.array([20240807, 20240808], dtype=np.int64), inserted=2, fields=('marketC',))
+    store.record('sp_day', 'A000010', [20240808, 20240809], inserted=1)
+    assert store.latest('sp_day', 'A000010') == 20240809
+    assert store.earliest('sp_day', 'A000010') == 20240807
+    assert store.get('sp_day', 'A000010')['count'] == 3
+    assert store.field_date('sp_day', 'A000010', 'marketC') == 20240808
+    assert store.latest('sp_1min', 'A000010', 0) == 0
+
+    query, update, upsert = collection.updates[-1]
+    assert query == {'db': 'sp_day', 'code': 'A000010'} and upsert
+    assert update == {'$max': {'latest': 20240809}, '$min': {'earliest': 20240808}, '$inc': {'count': 1}}
+
+
+def test_record_field_capped_at_latest():
+    store = WatermarkStore(_Handler(_Collection()))
+    store.record('sp_day', 'A000010', [20240808], inserted=1)
+    # upsert=False 로 채우므로 DB 에 없는 20240809 행은 반영되지 않음
+    store.record_field('sp_day', 'A000010', 'diff_rate', [20240807, 20240809])
+    assert store.field_date('sp_day', 'A000010', 'diff_rate') == 20240808
+    store.record_field('sp_day', 'A000010', 'diff_rate', [20240801])
+    assert store.field_date('sp_day', 'A000010', 'diff_rate') == 20240808
+
+
+def test_scan_reads_fields_only_for_daily_db():
+    minute, day = _PriceCollection(), _PriceCollection()
+    store = WatermarkStore(_Handler(_Collection(), {'sp_1min': {'A000010': minute}, 'sp_day': {'A000010': day}}))
+    # 분봉에는 diff_rate/marketC 가 없으므로 인덱스 없는 $exists 조회를 하지 않는다
+    assert store.scan('sp_1min', 'A000010') == {'db': 'sp_1min', 'code': 'A000010', 'latest': 20240809,
+                                                'earliest': 20240801, 'count': 7}
+    assert minute.queries == []
+    mark = store.scan('sp_day', 'A000010')
+    assert mark['diff_rate_date'] == 20240808 and mark['marketC_date'] == 20240808
+    assert len(day.queries) == 2
+
+
+if __name__ == "__main__":
+    test_record_keeps_range_and_count()
+    test_record_field_capped_at_latest()
+    test_scan_reads_fields_only_for_daily_db()
+    print("ok")
@@ -2,17 +2,104 @@ from common.importConfig import *
 import pymongo
 from pymongo import MongoClient
 from pymongo.cursor import CursorType
+from pymongo.errors import DuplicateKeyError, OperationFailure
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import date
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from api.chartData import column_dtypes
+from util.barLayout import (BUCKET_DBS, PARTITION_PREFIXES, TIMESERIES_COLLECTION, TIMESERIES_DBS, partition_names,
+                            partition_range)
+from util.chartFrame import bar_datetimes
+
+# DB 별로 모든 컬렉션에 있어야 하는 인덱스 {db_name: [(name, keys, options)]}
+INDEX_REGISTRY = {}
+DUPLICATE_KEY_VIOLATIONS = 359  # collMod unique 변경 시 중복 값이 있는 경우의 오류 코드
+
+
+def declare_index(db_name, keys, name, **options):
+    INDEX_REGISTRY.setdefault(db_name, []).append((name, keys, options))
+
+
+def declared_indexes(db_name):
+    """db_name 에 선언된 인덱스. 파티션 DB(sp_1min_p2024 등)는 뒤의 기간을 뗀 이름(sp_1min_p)으로 찾는다"""
+    if db_name in INDEX_REGISTRY:
+        return INDEX_REGISTRY[db_name]
+    prefix = db_name.rstrip('0123456789')
+    if len(db_name) - len(prefix) in (4, 6):
+        return INDEX_REGISTRY.get(prefix, ())
+    return ()
+
+
+# 새 분봉/일봉은 insert_many 로 추가하므로 date 중복을 인덱스로 막는다
+declare_index('sp_1min', [('date', pymongo.ASCENDING)], 'date_1', unique=True)
+declare_index('sp_day', [('date', pymongo.ASCENDING)], 'date_1', unique=True)
+declare_index('sp_1min_bucket', [('date', pymongo.ASCENDING)], 'date_1', unique=True)  # 하루 한 문서
+declare_index('sp_1min_p', [('date', pymongo.ASCENDING)], 'date_1', unique=True)  # 기간별 파티션 DB
+# 1분봉/일봉으로 만드는 bar (util.resampler)
+for _db_name in ('sp_3min', 'sp_5min', 'sp_15min', 'sp_60min', 'sp_week', 'sp_month'):
+    declare_index(_db_name, [('date', pymongo.ASCENDING)], 'date_1', unique=True)
+# time-series 컬렉션은 unique 인덱스를 만들 수 없다. 종목별 date 범위 조회용
+declare_index('sp_1min_ts', [('code', pymongo.ASCENDING), ('date', pymongo.ASCENDING)], 'code_1_date_1')
+declare_index('sp_day_ts', [('code', pymongo.ASCENDING), ('date', pymongo.ASCENDING)], 'code_1_date_1')
+
+
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'value')
+# load_bars 가 한 번의 aggregate 로 받는 행 수. 컬럼별 배열 한 문서로 받으므로 16MB 문서 제한 안쪽으로
+COLUMN_CHUNK = 50000
+
+
+# 연결 설정 묶음
+class MongoProfile(NamedTuple):
+    client_options: dict  # MongoClient 인자 (write concern, 압축, pool 크기)
+    batch_size: int  # 조회 cursor 의 batch 크기
+    write_chunk: int  # insert_many 한 번에 보낼 문서 수
+    defer_indexes: bool  # 적재 전에 보조 인덱스를 지우고 끝난 뒤 다시 만든다 (bulk_load)
+
+
+MONGO_PROFILES = {
+    # 매일 저녁 수집: 드라이버 기본 설정 (write concern 을 바꾸지 않음)
+    'safe': MongoProfile(client_options={},
+                         batch_size=1000, write_chunk=10000, defer_indexes=False),
+    # 처음 전체 기간을 적재할 때: journal 을 기다리지 않고, 압축해서 크게 보낸다
+    # 중간에 mongod 가 죽으면 마지막 몇 초의 데이터는 잃을 수 있으므로 watermark 검증(util.watermark --verify) 후 재실행
+    'bulk': MongoProfile(client_options={'w': 1, 'journal': False, 'compressors': 'zstd,snappy,zlib',
+                                         'zlibCompressionLevel': 1, 'maxPoolSize': 32, 'minPoolSize': 4},
+                         batch_size=20000, write_chunk=50000, defer_indexes=True),
+}
+
 
 class MongoDBHandler:
     
-    def __init__(self):
-        importConf = importConfig()
-        host = importConf.select_section("MONGODB")["host"]
-        port = importConf.select_section("MONGODB")["port"]
-        self._client = MongoClient(host, int(port))
+    def __init__(self, profile='safe', uri=None):
+        """
+        :param profile: MONGO_PROFILES 의 이름
+        :param uri: 지정하면 config.ini 대신 이 주소로 연결 (mongodb://host:port)
+        """
+        self.profile_name = profile
+        self.profile = MONGO_PROFILES[profile]
+        if uri is None:
+            importConf = importConfig()
+            host = importConf.select_section("MONGODB")["host"]
+            port = importConf.select_section("MONGODB")["port"]
+            self._client = MongoClient(host, int(port), **self.profile.client_options)
+        else:
+            self._client = MongoClient(uri, **self.profile.client_options)
         self._session = None
+        self._deferred = set()  # 인덱스를 나중에 만드는 DB (bulk_load 중)
+        self._index_cache = {}  # (db_name, collection_name) -> {인덱스 이름: unique 여부}
+        self._index_pending = set()  # 만들고 있는 (db_name, collection_name, 인덱스 이름)
+        self._index_failed = set()  # 중복 값이 있어 unique 로 만들지 못한 인덱스
+        self._index_lock = threading.Lock()
+        self._index_builder = None
+        self._index_builds = []
+        self._timeseries = set()  # 있는 것을 확인한 time-series 컬렉션 (db_name, collection_name)
 
     def start_session(self):
         if self._session is None:
@@ -30,6 +117,158 @@ class MongoDBHandler:
         if field_name not in current_indexes:
             self._client[db_name][collection_name].create_index([(field_name, pymongo.ASCENDING)], unique=True)
 
+    def load_index_snapshot(self, db_name):
+        """DB 의 모든 컬렉션 인덱스를 한 번에 읽어서 보관 (listIndexes)"""
+        snapshot = {}
+        for collection_name in self.list_collections(db_name):
+            indexes = self._client[db_name][collection_name].list_indexes()
+            snapshot[(db_name, collection_name)] = {index['name']: bool(index.get('unique')) for index in indexes}
+        with self._index_lock:
+            self._index_cache.update(snapshot)
+        return snapshot
+
+    def has_index(self, db_name, collection_name, name, unique=False):
+        """캐시 기준으로 인덱스가 만들어져 있는지 (만들고 있는 중이면 False)"""
+        indexes = self._index_cache.get((db_name, collection_name), {})
+        return name in indexes and (indexes[name] or not unique)
+
+    def ensure_indexes(self, db_name, background=True, upgrade=True):
+        """
+        INDEX_REGISTRY 에 선언된 인덱스가 없는 컬렉션을 찾아서 만든다
+        :param background: True 면 별도 스레드에서 만들고 바로 반환
+        :param upgrade: unique 로 선언했지만 unique 가 아닌 인덱스(이전 버전에서 만든 date_1)도 바꾼다
+        :return: 인덱스를 만들 컬렉션 수
+        """
+        self.load_index_snapshot(db_name)
+        collection_names = [name for db, name in list(self._index_cache) if db == db_name]
+        return sum(self.ensure_collection_indexes(db_name, name, background, upgrade) for name in collection_names)
+
+    def ensure_collection_indexes(self, db_name, collection_name, background=True, upgrade=False):
+        """
+        저장 경로에서 호출. 캐시만 확인하므로 이미 있는 경우 DB 를 조회하지 않는다
+        :return: 만들 인덱스가 있으면 True
+        """
+        if db_name in self._deferred:
+            return False
+        with self._index_lock:
+            indexes = self._index_cache.setdefault((db_name, collection_name), {})
+            missing = []
+            for name, keys, options in declared_indexes(db_name):
+                key = (db_name, collection_name, name)
+                if key in self._index_pending or key in self._index_failed:
+                    continue
+                if name not in indexes or (upgrade and options.get('unique') and not indexes[name]):
+                    self._index_pending.add(key)
+                    missing.append((name, keys, options))
+        if not missing:
+            return False
+        if background:
+            if self._index_builder is None:
+                self._index_builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix='index-build')
+            self._index_builds.append(self._index_builder.submit(self._create_indexes, db_name, collection_name, missing))
+        else:
+            self._create_indexes(db_name, collection_name, missing)
+        return True
+
+    def _create_indexes(self, db_name, collection_name, specs):
+        collection = self._client[db_name][collection_name]
+        try:
+            for name, keys, options in specs:
+                unique = bool(options.get('unique'))
+                try:
+                    if name in self._index_cache[(db_name, collection_name)]:
+                        self._make_unique(collection, name, keys)
+                    else:
+                        collection.create_index(keys, name=name, **options)
+                except DuplicateKeyError:
+                    # 이미 중복된 값이 있으면 unique 없이 두고 이 컬렉션은 upsert 로만 저장
+                    if name not in self._index_cache[(db_name, collection_name)]:
+                        collection.create_index(keys, name=name)
+                    unique = False
+                    with self._index_lock:
+                        self._index_failed.add((db_name, collection_name, name))
+                with self._index_lock:
+                    self._index_cache[(db_name, collection_name)][name] = unique
+        finally:
+            with self._index_lock:
+                self._index_pending.difference_update((db_name, collection_name, spec[0]) for spec in specs)
+
+    def _make_unique(self, collection, name, keys):
+        """기존 인덱스를 unique 로 변경. MongoDB 6.0 이상은 인덱스를 유지한 채 바꾸고, 이전 버전은 다시 만든다"""
+        try:
+            db = collection.database
+            db.command({'collMod': collection.name, 'index': {'name': name, 'prepareUnique': True}})
+            db.command({'collMod': collection.name, 'index': {'name': name, 'unique': True}})
+            return
+        except OperationFailure as e:
+            if e.code == DUPLICATE_KEY_VIOLATIONS:
+                raise DuplicateKeyError(str(e), e.code, e.details)
+        collection.drop_index(name)
+        try:
+            collection.create_index(keys, name=name, unique=True)
+        except DuplicateKeyError:
+            collection.create_index(keys, name=name)
+            raise
+
+    def ensure_timeseries(self, db_name, collection_name, time_field, meta_field, granularity):
+        """time-series 컬렉션이 없으면 만든다. 한 번 확인한 컬렉션은 다시 조회하지 않는다"""
+        key = (db_name, collection_name)
+        if key in self._timeseries:
+            return
+        with self._index_lock:
+            if key in self._timeseries:
+                return
+            db = self._client[db_name]
+            if collection_name not in db.list_collection_names(filter={'name': collection_name}):
+                db.create_collection(collection_name, timeseries={'timeField': time_field, 'metaField': meta_field,
+                                                                  'granularity': granularity})
+            self._timeseries.add(key)
+
+    def indexes_deferred(self, db_name):
+        return db_name in self._deferred
+
+    @contextmanager
+    def bulk_load(self, db_name):
+        """
+        profile 이 defer_indexes 이면 DB 의 선언된 인덱스를 지우고 적재한 뒤 다시 만든다.
+        적재 중에는 unique 인덱스 없이 watermark 이후의 bar 를 insert 하므로 처음 적재할 때만 사용한다.
+        """
+        if not self.profile.defer_indexes:
+            yield
+            return
+        names = [spec[0] for spec in declared_indexes(db_name)]
+        for collection_name in self.list_collections(db_name):
+            collection = self._client[db_name][collection_name]
+            for name in set(names) & set(collection.index_information()):
+                collection.drop_index(name)
+        self._forget_indexes(db_name)
+        self._deferred.add(db_name)
+        try:
+            yield
+        finally:
+            self._deferred.discard(db_name)
+            self.wait_index_builds()
+            self.ensure_indexes(db_name, background=False)
+
+    def _forget_indexes(self, db_name):
+        with self._index_lock:
+            for key in [key for key in self._index_cache if key[0] == db_name]:
+                del self._index_cache[key]
+            self._timeseries = {key for key in self._timeseries if key[0] != db_name}
+
+    def drop_database(self, db_name):
+        """DB 를 지우고 인덱스 캐시도 비운다 (파티션 정리)"""
+        self.wait_index_builds()
+        self._client.drop_database(db_name)
+        self._forget_indexes(db_name)
+
+    def wait_index_builds(self):
+        """백그라운드 인덱스 생성이 끝날 때까지 기다린다. 실패한 경우 예외 발생"""
+        builds, self._index_builds = self._index_builds, []
+        for future in builds:
+            future.result()
+        return len(builds)
+
     def validate_params(self, db_name, collection_name):
         if not db_name or not collection_name:
             raise Exception("Database name and collection name must be provided.")
@@ -71,6 +310,7 @@ class MongoDBHandler:
             find_options['projection'] = projection
         
         cursor = self._client[db_name][collection_name].find(condition, **find_options, session=session)
+        cursor = cursor.batch_size(self.profile.batch_size)
         
         if sort:
             cursor = cursor.sort(sort)
@@ -112,6 +352,14 @@ class MongoDBHandler:
             raise Exception("Both condition and update value must be provided")
         return self._client[db_name][collection_name].update_one(filter=condition, update=update_value, session=session)
     
+    def bulk_write(self, operations=None, db_name=None, collection_name=None, ordered=False, session=None):
+        self.validate_params(db_name, collection_name)
+        if not isinstance(operations, list):
+            raise Exception("operations type should be list")
+        if not operations:
+            return None
+        return self._client[db_name][collection_name].bulk_write(operations, ordered=ordered, session=session)
+
     def aggregate(self, pipeline=None, db_name=None, collection_name=None, session=None):
         self.validate_params(db_name, collection_name)
         if pipeline is None or not isinstance(pipeline, list):
@@ -142,16 +390,124 @@ class MongoDBHandler:
         if collection_name is not None and not collection_name:
             raise Exception("Collection name must be provided when specified.")
     
+    def bar_sources(self, code, start, end, freq):
+        """freq(저장 방식의 DB 이름)에서 code 의 bar 가 있는 (컬렉션, 조건) 목록, date 순서"""
+        if freq in TIMESERIES_DBS.values():
+            return [(self._client[freq][TIMESERIES_COLLECTION], {'code': code})]
+        if freq in PARTITION_PREFIXES:
+            names = [name for name in partition_names(self, freq)
+                     if partition_range(name, freq)[1] >= start and (end is None or partition_range(name, freq)[0] <= end)]
+            return [(self._client[name][code], {}) for name in names]
+        return [(self._client[freq][code], {})]
+
+    def iter_bars(self, code, start=0, end=None, freq='sp_1min', fields=BAR_FIELDS, chunk=COLUMN_CHUNK):
+        """
+        date 범위의 bar 를 chunk 행씩 컬럼 배열로 읽는다 (메모리보다 큰 범위를 나누어 처리할 때)
+        서버에서 date 인덱스 범위로 찾아 $push 로 컬럼별 배열 한 문서를 만들어 보내므로 행마다 dict 를 만들지 않는다.
+        :param start: 이 date 이상 (sp_1min 은 YYYYMMDDHHMM, sp_day 는 YYYYMMDD)
+        :param end: 이 date 이하 (None 이면 끝까지)
+        :param freq: 'sp_1min', 'sp_day' 또는 저장 방식의 DB 이름 (sp_1min_bucket, sp_1min_ts, sp_day_ts, sp_1min_p)
+        :param fields: date 외에 읽을 항목. 없는 값은 정수 항목은 0, 실수 항목은 NaN
+        :return: {'date': int64 ndarray, 'datetime': datetime64[ms] ndarray, 항목: ndarray} iterator, 과거 -> 최신 순서
+        """
+        if freq in BUCKET_DBS:
+            yield from self._iter_bucket_bars(freq, code, start, end, fields, chunk)
+            return
+        dtypes = column_dtypes(fields, code)
+        group = {'_id': None, 'date': {'$push': '$date'}}
+        for field in fields:
+            missing = float('nan') if np.issubdtype(dtypes[field], np.floating) else 0
+            group[field] = {'$push': {'$ifNull': ['$' + field, missing]}}
+        for collection, condition in self.bar_sources(code, start, end, freq):
+            date_range = {'$gte': start}
+            while True:
+                if end is not None:
+                    date_range['$lte'] = end
+                result = list(collection.aggregate([{'$match': dict(condition, date=date_range)}, {'$sort': {'date': 1}},
+                                                    {'$limit': chunk}, {'$group': group}]))
+                if not result:
+                    break
+                bars = {'date': np.array(result[0]['date'], dtype=np.int64)}
+                bars.update((field, np.array(result[0][field], dtype=dtypes[field])) for field in fields)
+                bars['datetime'] = bar_datetimes(bars['date'])
+                yield bars
+                if len(bars['date']) < chunk:
+                    break
+                date_range = {'$gt': int(bars['date'][-1])}
+
+    def load_bars(self, code, start=0, end=None, freq='sp_1min', fields=BAR_FIELDS, as_frame=False):
+        """
+        date 범위의 bar 를 한 번에 컬럼 배열로 읽는다 (iter_bars 참고)
+        :param as_frame: True 면 datetime index 를 가진 DataFrame 으로 반환
+        """
+        chunks = list(self.iter_bars(code, start, end, freq, fields))
+        if len(chunks) == 1:
+            bars = chunks[0]
+        else:
+            dtypes = column_dtypes(fields, code)
+            empty = {'date': np.empty(0, dtype=np.int64), 'datetime': np.empty(0, dtype='datetime64[ms]')}
+            empty.update((field, np.empty(0, dtype=dtypes[field])) for field in fields)
+            bars = {col: np.concatenate([arr] + [chunk[col] for chunk in chunks]) for col, arr in empty.items()}
+        if as_frame:
+            index = pd.DatetimeIndex(bars.pop('datetime'), name='datetime')
+            return pd.DataFrame(bars, index=index, columns=['date'] + list(fields))
+        return bars
+
+    def _iter_bucket_bars(self, db_name, code, start, end, columns, chunk):
+        """하루 한 문서(bucket) 저장: bucket 을 모아 chunk 행 이상이 되면 한 번에 푼다"""
+        day_range = {'$gte': start // 10000}
+        if end is not None:
+            day_range['$lte'] = end // 10000
+        projection = dict.fromkeys(('date', 'n', 'time') + tuple(columns), 1)
+        projection['_id'] = 0
+        cursor = self._client[db_name][code].find({'date': day_range}, projection,
+                                                  batch_size=self.profile.batch_size).sort('date', 1)
+        buckets, rows = [], 0
+        for bucket in cursor:
+            buckets.append(bucket)
+            rows += bucket['n']
+            if rows >= chunk:
+                yield self._unpack_buckets(buckets, code, start, end, columns)
+                buckets, rows = [], 0
+        if buckets:
+            yield self._unpack_buckets(buckets, code, start, end, columns)
+
+    @staticmethod
+    def _unpack_buckets(buckets, code, start, end, columns):
+        total = sum(bucket['n'] for bucket in buckets)
+        dtypes = column_dtypes(columns, code)
+        bars = {'date': np.empty(total, dtype=np.int64)}
+        bars.update((col, np.empty(total, dtype=dtypes[col])) for col in columns)
+        pos = 0
+        for bucket in buckets:
+            n = bucket['n']
+            bars['date'][pos:pos + n] = np.asarray(bucket['time'], dtype=np.int64) + bucket['date'] * 10000
+            for col in columns:
+                bars[col][pos:pos + n] = bucket[col]
+            pos += n
+
+        keep = bars['date'] >= start
+        if end is not None:
+            keep &= bars['date'] <= end
+        if not keep.all():
+            bars = {col: arr[keep] for col, arr in bars.items()}
+        bars['datetime'] = bar_datetimes(bars['date'])
+        return bars
+
+    def load_bucket_bars(self, db_name, code, start=0, end=None, columns=BAR_FIELDS):
+        """
+        하루 한 문서(bucket)로 저장된 분봉을 읽어서 바로 numpy 배열로 푼다
+        :param start: 이 date(YYYYMMDDHHMM) 이상
+        :param end: 이 date 이하 (None 이면 끝까지)
+        :return: {'date': int64 ndarray(YYYYMMDDHHMM), 'datetime': datetime64[ms] ndarray, 항목: ndarray}
+        """
+        return self.load_bars(code, start, end, db_name, columns)
+
     def list_collections(self, db_name):
         db = self._client[db_name]
-        return db.list_collection_names()
+        # time-series 컬렉션이 있는 DB 의 system.buckets.*, system.views 는 제외
+        return [name for name in db.list_collection_names() if not name.startswith('system.')]
     
     def check_database_exists(self, db_name):
         self.validate_params(db_name)
         return len(self._client[db_name].list_collection_names()) > 0
-    
-    def delete_column(self, db_name, column_name):
-        self.validate_params(db_name)
-        collection_names = self.list_collections(db_name)
-        for collection_name in collection_names:
-            self._client[db_name][collection_name].update_many({}, {"$unset": {column_name: ""}})
@@ -1,22 +1,18 @@
-import win32com.client
-from pywinauto import application
-import os
 import time
 from common.importConfig import *
+from api.backend import get_backend
 
 class autoLogin:
     
-    def __init__(self):
+    def __init__(self, backend=None):
+        """
+        :param backend: 지정하지 않으면 get_backend() (실제 Creon 또는 시뮬레이터)
+        """
+        self.backend = backend or get_backend()
         self.connect(reconnect=False)
         
     def kill_client(self):
-        print("########## 기존 CYBOS 프로세스 강제 종료")
-        os.system('taskkill /IM ncStarter* /F /T')
-        os.system('taskkill /IM CpStart* /F /T')
-        os.system('taskkill /IM DibServer* /F /T')
-        os.system('wmic process where "name like \'%ncStarter%\'" call terminate')
-        os.system('wmic process where "name like \'%CpStart%\'" call terminate')
-        os.system('wmic process where "name like \'%DibServer%\'" call terminate')
+        self.backend.kill_client()
 
     def connect(self, reconnect=True):
         # 재연결이라면 기존 연결을 강제로 kill
@@ -26,7 +22,7 @@ class autoLogin:
             except Exception as e:
                 pass
                 
-        CpCybos = win32com.client.Dispatch("CpUtil.CpCybos")
+        CpCybos = self.backend.cp_status()
         
         # 접속이 되어있으면 패스, 접속이 안되어 있으면 접속한다.
         if CpCybos.IsConnect:
@@ -38,11 +34,7 @@ class autoLogin:
             pwd = importConf.select_section("Creon")["pwd"]
             pwdcert = importConf.select_section("Creon")["pwdcert"]
 
-            app = application.Application()
-            app.start(
-                        'C:\Daishin\Starter\\ncStarter.exe /prj:cp /id:{id} /pwd:{pwd} /pwdcert:{pwdcert} /autostart'.format(
-                            id=id, pwd=pwd, pwdcert=pwdcert)
-                    )
+            self.backend.start_client(id, pwd, pwdcert)
             # 연결 될때까지 무한루프
             while True:
                 if CpCybos.IsConnect:
@@ -52,4 +44,3 @@ class autoLogin:
             print('Auto Login Success')
             
         return CpCybos
-
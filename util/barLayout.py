@@ -0,0 +1,26 @@
+# coding=utf-8
+"""
+저장 방식별 DB / 컬렉션 이름. MongoDBHandler 와 store(util.barStore) 가 같이 쓴다
+"""
+MINUTE_BUCKET_DB = 'sp_1min_bucket'
+BUCKET_DBS = (MINUTE_BUCKET_DB,)
+# frequency 별 time-series 컬렉션 하나에 모든 종목 저장 ({db}.bars)
+TIMESERIES_DBS = {'sp_1min': 'sp_1min_ts', 'sp_day': 'sp_day_ts'}
+TIMESERIES_COLLECTION = 'bars'
+# 기간별 DB(sp_1min_p2024, sp_1min_p202408)에 종목별 컬렉션으로 저장
+MINUTE_PARTITION_PREFIX = 'sp_1min_p'
+PARTITION_PREFIXES = (MINUTE_PARTITION_PREFIX,)
+
+
+def partition_range(name, prefix):
+    """파티션 DB 에 들어가는 분봉 date 범위 (lo, hi), 둘 다 포함"""
+    period = name[len(prefix):]
+    scale = 10 ** (12 - len(period))
+    return int(period) * scale, (int(period) + 1) * scale - 1
+
+
+def partition_names(db_handler, prefix):
+    """prefix 뒤에 연도(YYYY) 또는 연월(YYYYMM)이 붙은 DB 목록, 과거 -> 최신 순서"""
+    names = [name for name in db_handler._client.list_database_names()
+             if name.startswith(prefix) and name[len(prefix):].isdigit() and len(name) - len(prefix) in (4, 6)]
+    return sorted(names, key=lambda name: partition_range(name, prefix))
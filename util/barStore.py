@@ -0,0 +1,751 @@
+# coding=utf-8
+import time
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import NamedTuple
+
+import numpy as np
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from api.chartData import column_dtypes
+from util.barLayout import (BUCKET_DBS, MINUTE_BUCKET_DB, MINUTE_PARTITION_PREFIX, PARTITION_PREFIXES,
+                            TIMESERIES_COLLECTION, TIMESERIES_DBS, partition_names, partition_range)
+from util.chartFrame import bar_datetimes, bar_documents, upsert_operation
+
+DUPLICATE_KEY = 11000
+TIMESERIES_GRANULARITY = {'sp_1min': 'minutes', 'sp_day': 'hours'}
+PARTITION_DIGITS = {'year': 4, 'month': 6}
+BAR_LAYOUTS = ('document', 'bucket', 'timeseries', 'partition')
+
+
+def stored_codes(db_handler, db_name):
+    """DB 에 저장된 종목코드 목록 (time-series DB 는 code 값, 파티션은 모든 파티션의 컬렉션, 그 밖에는 컬렉션 이름)"""
+    if db_name in TIMESERIES_DBS.values():
+        return db_handler._client[db_name][TIMESERIES_COLLECTION].distinct('code')
+    if db_name in PARTITION_PREFIXES:
+        codes = set()
+        for name in partition_names(db_handler, db_name):
+            codes.update(db_handler.list_collections(name))
+        return sorted(codes)
+    return db_handler.list_collections(db_name)
+
+
+def documents_to_bars(docs, columns, code=''):
+    """문서 목록 -> {'date': int64 ndarray, 항목: ndarray}"""
+    dtypes = column_dtypes(columns, code)
+    bars = {'date': np.array([doc['date'] for doc in docs], dtype=np.int64)}
+    for col in columns:
+        bars[col] = np.array([doc.get(col, 0) for doc in docs], dtype=dtypes[col])
+    return bars
+
+
+# 한 종목의 저장 묶음 (transform 단계에서 만들고 write 단계에서 저장)
+class BarBatch(NamedTuple):
+    code: str
+    dates: np.ndarray
+    inserts: list  # watermark 이후의 새 bar 문서 (insert_many)
+    upserts: list  # watermark 이전과 겹치는 bar 문서 (write 할 때 date 기준 upsert)
+    new: bool  # DB 에 아직 없는 종목
+
+
+class WriteStats:
+    """insert_many / upsert 별 저장 행 수와 시간"""
+    def __init__(self):
+        self.inserted = 0
+        self.insert_seconds = 0.0
+        self.upserted = 0
+        self.upsert_seconds = 0.0
+        self.duplicates = 0  # insert 하려다 이미 있어서 upsert 로 다시 저장한 행
+        self._lock = threading.Lock()
+
+    def add(self, inserted=0, insert_seconds=0.0, upserted=0, upsert_seconds=0.0, duplicates=0):
+        with self._lock:
+            self.inserted += inserted
+            self.insert_seconds += insert_seconds
+            self.upserted += upserted
+            self.upsert_seconds += upsert_seconds
+            self.duplicates += duplicates
+
+    def report(self):
+        lines = []
+        for kind, rows, seconds in (('insert', self.inserted, self.insert_seconds),
+                                    ('upsert', self.upserted, self.upsert_seconds)):
+            rate = rows / seconds if seconds else 0
+            lines.append("{:<7} {:>10}행 {:>9.3f}s {:>10.0f} rows/s".format(kind, rows, seconds, rate))
+        if self.duplicates:
+            lines.append("insert 중복 -> upsert {}행".format(self.duplicates))
+        return lines
+
+
+class FieldUpdates:
+    """
+    여러 종목의 항목 갱신({'date': date, 항목: 값})을 모아 두었다가 store.update_fields_many 로 한 번에 저장한다.
+    저장한 뒤 종목별로 watermark 의 항목 날짜(diff_rate_date 등)를 기록한다.
+    """
+    def __init__(self, store, field, flush_size=50000):
+        """
+        :param field: 채우는 항목 (watermark FIELD_KEYS 의 key)
+        :param flush_size: add() 가 flush 할 때가 되었다고 알려 줄 연산 수
+        """
+        self.store = store
+        self.field = field
+        self.flush_size = flush_size
+        self.written = 0
+        self._pending = {}  # code -> [{'date': date, 항목: 값}]
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def add(self, code, rows):
+        """
+        :param rows: [{'date': date, 항목: 값}] 이미 저장된 bar 에 채울 값
+        :return: 모아 둔 연산이 flush_size 이상이면 True (호출한 쪽에서 flush)
+        """
+        with self._lock:
+            self._pending.setdefault(code, []).extend(rows)
+            self._size += len(rows)
+            return self._size >= self.flush_size
+
+    def flush(self):
+        """:return: 저장한 연산 수"""
+        with self._lock:
+            pending, self._pending, self._size = self._pending, {}, 0
+        if not pending:
+            return 0
+        store = self.store
+        store.update_fields_many(pending)
+        if store.watermarks is not None:
+            for code, rows in pending.items():
+                store.watermarks.record_field(store.db_name, code, self.field, [row['date'] for row in rows])
+        count = sum(len(rows) for rows in pending.values())
+        self.written += count
+        return count
+
+
+class BarStore:
+    """
+    저장 방식별 store 의 공통 부분. db_name 은 watermark 에 기록하는 이름
+    (파티션 저장은 실제 DB 가 아니라 파티션 DB 이름의 prefix)
+    """
+    def __init__(self, db_handler, db_name, watermarks=None, clock=time.perf_counter, snapshots=None):
+        """
+        :param snapshots: 일봉 store 이면 저장할 때 같이 갱신할 DailySnapshotStore
+        """
+        self.db_handler = db_handler
+        self.db_name = db_name
+        self.watermarks = watermarks
+        self.clock = clock
+        self.snapshots = snapshots
+        self.stats = WriteStats()
+        self._deferred = {}  # code -> [earliest, latest, 추가된 행 수] (write(defer=True) 로 저장 중인 종목)
+        self._deferred_lock = threading.Lock()
+
+    def collection(self, code):
+        return self.db_handler._client[self.db_name][code]
+
+    def codes(self):
+        return stored_codes(self.db_handler, self.db_name)
+
+    def ensure_indexes(self):
+        """선언된 인덱스가 없는 컬렉션은 백그라운드에서 만든다. :return: 인덱스를 만들 컬렉션 수"""
+        return self.db_handler.ensure_indexes(self.db_name)
+
+    def load_index_snapshot(self):
+        self.db_handler.load_index_snapshot(self.db_name)
+
+    def bulk_load(self):
+        """MongoDBHandler.bulk_load 참고"""
+        return self.db_handler.bulk_load(self.db_name)
+
+    def day_filter(self, date):
+        """date(YYYYMMDD) 하루에 해당하는 date 조건"""
+        return {'$gte': date * 10000, '$lt': (date + 1) * 10000}
+
+    def delete_day(self, date, codes=None):
+        """
+        하루치 bar 를 지운다 (잘못 받은 날을 다시 받을 때). 지운 종목은 watermark 를 다시 계산한다
+        :param codes: 지울 종목 (None 이면 모든 종목, 이때는 일봉 스냅샷의 그 날도 지운다)
+        :return: 지운 행 수
+        """
+        deleted = {code: self._delete_day(code, date) for code in (self.codes() if codes is None else codes)}
+        self._refresh([code for code, count in deleted.items() if count])
+        if codes is None and self.snapshots is not None:
+            self.snapshots.delete_day(date)
+        return sum(deleted.values())
+
+    def count_day(self, date, code):
+        """delete_day 로 지워질 code 의 bar 수"""
+        return self.collection(code).count_documents({'date': self.day_filter(date)})
+
+    def _delete_day(self, code, date):
+        return self.collection(code).delete_many({'date': self.day_filter(date)}).deleted_count
+
+    def field_filter(self, code, date):
+        """code 의 date bar 하나를 찾는 조건"""
+        return {'date': date}
+
+    def field_operations(self, code, rows):
+        """
+        :param rows: [{'date': date, 항목: 값}]
+        :return: 이미 저장된 bar 의 항목만 채우는 UpdateOne 목록 (없는 bar 는 만들지 않음)
+        """
+        return [UpdateOne(self.field_filter(code, row['date']), {'$set': {k: v for k, v in row.items() if k != 'date'}})
+                for row in rows]
+
+    def update_fields_many(self, updates):
+        """
+        여러 종목의 항목을 한 번에 채운다
+        :param updates: {종목코드: [{'date': date, 항목: 값}]}
+        """
+        for code, rows in updates.items():
+            self.update_fields(code, rows)
+
+    def _snapshot_updates(self, code, rows):
+        if self.snapshots is not None:
+            self.snapshots.record(code, rows)
+
+    def _record(self, code, dates, inserted, fields, defer):
+        """write 직후 watermark 기록. defer 면 commit() 할 때까지 모아 둔다"""
+        if self.watermarks is None or len(dates) == 0:
+            return
+        if not defer:
+            self.watermarks.record(self.db_name, code, dates, inserted, fields)
+            return
+        earliest, latest = int(min(dates)), int(max(dates))
+        with self._deferred_lock:
+            mark = self._deferred.setdefault(code, [earliest, latest, 0])
+            mark[0], mark[1], mark[2] = min(mark[0], earliest), max(mark[1], latest), mark[2] + inserted
+
+    def commit(self, code, fields=()):
+        """
+        write(defer=True) 로 나누어 저장한 종목의 watermark 를 한 번에 기록한다 (종목의 모든 페이지를 저장한 뒤).
+        최신 페이지부터 저장하므로 중간에 멈춘 종목의 watermark 가 앞서 나가면 빠진 과거 기간을 다시 받지 않게 된다
+        """
+        with self._deferred_lock:
+            mark = self._deferred.pop(code, None)
+        if mark is not None and self.watermarks is not None:
+            self.watermarks.record(self.db_name, code, mark[:2], mark[2], fields)
+
+    def _refresh(self, codes):
+        if self.watermarks is not None:
+            for code in codes:
+                self.watermarks.refresh(self.db_name, code)
+
+
+class TickerBarStore(BarStore):
+    """
+    종목별 컬렉션({db_name}.{종목코드})에 bar 를 저장한다.
+    watermark(저장된 가장 최근 date) 이후의 bar 는 unique date 인덱스를 믿고 insert_many 로 추가하고,
+    겹치는 bar 만 upsert 한다. unique 인덱스가 아직 없는 컬렉션은 모두 upsert 한다.
+    """
+    def day_filter(self, date):
+        return date if self.db_name == 'sp_day' else super().day_filter(date)
+
+    def update_fields(self, code, rows):
+        """이미 저장된 bar 의 항목만 채운다. :param rows: [{'date': date, 항목: 값}]"""
+        self.collection(code).bulk_write(self.field_operations(code, rows), ordered=False)
+        self._snapshot_updates(code, rows)
+
+    def prepare(self, code, bars, watermark=None):
+        """
+        :param bars: {'date': ndarray, 항목: ndarray}, 과거 -> 최신 순서 (chart_bars 결과)
+        :param watermark: 저장된 가장 최근 date (0 이면 저장된 데이터 없음). None 이면 watermarks 에서 읽는다.
+                          한 종목을 여러 번 나누어 저장할 때는 처음 읽은 값을 넘겨야 한다.
+        """
+        if watermark is None:
+            watermark = self.watermarks.latest(self.db_name, code, 0) if self.watermarks is not None else 0
+        docs = bar_documents(bars)
+        split = int(np.searchsorted(bars['date'], watermark, side='right'))
+        return BarBatch(code, bars['date'], docs[split:], docs[:split], watermark == 0)
+
+    def write(self, batch, fields=(), defer=False):
+        """
+        :param fields: watermark 에 함께 기록할 항목 (WatermarkStore.record 참고)
+        :param defer: True 면 watermark 를 바로 기록하지 않고 commit(code) 때 기록한다 (한 종목을 나누어 저장할 때)
+        :return: 새로 추가된 행 수
+        """
+        if len(batch.dates) == 0:
+            return 0
+        collection = self.collection(batch.code)
+        inserts, upserts = batch.inserts, batch.upserts
+        # bulk_load 중에는 인덱스 없이 watermark 만 믿고 insert 한다
+        if not self.db_handler.indexes_deferred(self.db_name):
+            # 새 종목은 빈 컬렉션이므로 인덱스를 바로 만들고 insert 한다
+            self.db_handler.ensure_collection_indexes(self.db_name, batch.code, background=not batch.new)
+            if inserts and not self.db_handler.has_index(self.db_name, batch.code, 'date_1', unique=True):
+                upserts, inserts = upserts + inserts, []
+
+        inserted = 0
+        chunk = self.db_handler.profile.write_chunk
+        for i in range(0, len(inserts), chunk):
+            start = self.clock()
+            n, retry = self._insert(collection, inserts[i:i + chunk])
+            inserted += n
+            upserts = upserts + retry
+            self.stats.add(inserted=n, insert_seconds=self.clock() - start, duplicates=len(retry))
+
+        upserted = 0
+        if upserts:
+            start = self.clock()
+            upserted = collection.bulk_write([upsert_operation(doc) for doc in upserts], ordered=False).upserted_count
+            self.stats.add(upserted=len(upserts), upsert_seconds=self.clock() - start)
+
+        self._record(batch.code, batch.dates, inserted + upserted, fields, defer)
+        if self.snapshots is not None:
+            self.snapshots.record(batch.code, batch.inserts + batch.upserts)
+        return inserted + upserted
+
+    @staticmethod
+    def _insert(collection, docs):
+        """
+        :return: (추가된 행 수, 이미 있어서 upsert 로 다시 저장할 문서 목록)
+        """
+        try:
+            return len(collection.insert_many(docs, ordered=False).inserted_ids), []
+        except BulkWriteError as e:
+            errors = e.details['writeErrors']
+            if any(error['code'] != DUPLICATE_KEY for error in errors):
+                raise
+            return e.details['nInserted'], [{k: v for k, v in error['op'].items() if k != '_id'} for error in errors]
+
+
+
+def split_periods(bars, scale):
+    """
+    bar 를 date // scale 값(날짜, 연도 등)별로 나눈다
+    :param bars: {'date': ndarray, 항목: ndarray}, 과거 -> 최신 순서
+    :return: [(date // scale, {항목: ndarray}), ...]
+    """
+    keys, starts = np.unique(bars['date'] // scale, return_index=True)
+    ends = list(starts[1:]) + [len(bars['date'])]
+    return [(int(key), {col: arr[start:end] for col, arr in bars.items()})
+            for key, start, end in zip(keys, starts, ends)]
+
+
+def split_days(bars):
+    """분봉을 날짜별로 나눈다. :return: [(YYYYMMDD, {항목: ndarray}), ...]"""
+    return split_periods(bars, 10000)
+
+
+def bucket_document(day, cols):
+    """하루치 분봉 -> bucket 문서 {'date': YYYYMMDD, 'n': 행 수, 'time': [hhmm], 항목: [...]}"""
+    doc = {'date': day, 'n': len(cols['date']), 'time': (cols['date'] % 10000).tolist()}
+    for col, arr in cols.items():
+        if col != 'date':
+            doc[col] = arr.tolist()
+    return doc
+
+
+def bucket_append(day, cols):
+    """하루치 분봉을 그 날 bucket 뒤에 이어붙이는 UpdateOne"""
+    doc = bucket_document(day, cols)
+    n = doc.pop('n')
+    del doc['date']
+    return UpdateOne({'date': day}, {'$push': {col: {'$each': values} for col, values in doc.items()}, '$inc': {'n': n}})
+
+
+# 한 종목의 bucket 저장 묶음
+class BucketBatch(NamedTuple):
+    code: str
+    dates: np.ndarray
+    days: dict  # {YYYYMMDD: {항목: ndarray}}
+    inserts: list  # watermark 이후 날짜의 새 bucket 문서
+    appends: dict  # {YYYYMMDD: 이어붙이는 분봉 수} watermark 가 있는 날 bucket 뒤에 이어붙이는 날
+    merges: list  # 기존 bucket 과 겹쳐서 읽어서 합쳐야 하는 날짜
+    new: bool
+
+
+class BucketBarStore(BarStore):
+    """
+    종목별 컬렉션({db_name}.{종목코드})에 하루 한 문서(bucket)로 분봉을 저장한다.
+    {'date': 20240809, 'n': 381, 'time': [901, ..., 1530], 'open': [...], 'high': [...], ...}
+    항목 이름과 인덱스 항목이 분봉마다가 아니라 하루에 한 번만 저장된다.
+    새 날짜는 insert, 마지막 bucket 뒤에 이어지는 분봉은 $push, 그 밖에 겹치는 분봉은 bucket 을 읽어서 합친다.
+    """
+    def __init__(self, db_handler, db_name=MINUTE_BUCKET_DB, watermarks=None, clock=time.perf_counter):
+        super().__init__(db_handler, db_name, watermarks, clock)
+
+    def day_filter(self, date):
+        return date  # bucket 의 date 는 YYYYMMDD
+
+    def count_day(self, date, code):
+        bucket = self.collection(code).find_one({'date': date}, {'n': 1})
+        return bucket['n'] if bucket else 0
+
+    def _delete_day(self, code, date):
+        bucket = self.collection(code).find_one_and_delete({'date': date}, {'n': 1})
+        return bucket['n'] if bucket else 0
+
+    def prepare(self, code, bars, watermark=None):
+        """
+        :param bars: {'date': YYYYMMDDHHMM ndarray, 항목: ndarray}, 과거 -> 최신 순서
+        :param watermark: 저장된 가장 최근 분봉 date (0 이면 저장된 데이터 없음). None 이면 watermarks 에서 읽는다
+        """
+        if watermark is None:
+            watermark = self.watermarks.latest(self.db_name, code, 0) if self.watermarks is not None else 0
+        watermark_day = watermark // 10000
+        days, inserts, appends, merges = {}, [], {}, []
+        for day, cols in split_days(bars):
+            days[day] = cols
+            if day > watermark_day:
+                inserts.append(bucket_document(day, cols))
+            elif day == watermark_day and cols['date'][0] > watermark:
+                appends[day] = len(cols['date'])
+            else:
+                merges.append(day)
+        return BucketBatch(code, bars['date'], days, inserts, appends, merges, watermark == 0)
+
+    def write(self, batch, fields=(), defer=False):
+        """
+        :return: 새로 추가된 분봉 수
+        """
+        if len(batch.dates) == 0:
+            return 0
+        collection = self.collection(batch.code)
+        inserts, appends, merges = batch.inserts, batch.appends, list(batch.merges)
+        if not self.db_handler.indexes_deferred(self.db_name):
+            self.db_handler.ensure_collection_indexes(self.db_name, batch.code, background=not batch.new)
+            if inserts and not self.db_handler.has_index(self.db_name, batch.code, 'date_1', unique=True):
+                merges, inserts = merges + [doc['date'] for doc in inserts], []
+
+        inserted = 0
+        if inserts:
+            start = self.clock()
+            failed = set()
+            try:
+                collection.insert_many(inserts, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details['writeErrors']
+                if any(error['code'] != DUPLICATE_KEY for error in errors):
+                    raise
+                # 페이지 경계에서 나뉜 날은 이미 bucket 이 있으므로 합치기로 저장
+                failed = {error['op']['date'] for error in errors}
+                merges += sorted(failed)
+            inserted = sum(doc['n'] for doc in inserts if doc['date'] not in failed)
+            self.stats.add(inserted=inserted, insert_seconds=self.clock() - start,
+                           duplicates=sum(doc['n'] for doc in inserts if doc['date'] in failed))
+
+        if appends:
+            start = self.clock()
+            result = collection.bulk_write([bucket_append(day, batch.days[day]) for day in appends], ordered=False)
+            if result.matched_count < len(appends):
+                # watermark 가 실제와 다른 경우 (bucket 이 없음) 합치기로 다시 저장
+                merges += list(appends)
+            else:
+                inserted += sum(appends.values())
+            self.stats.add(upserted=sum(appends.values()), upsert_seconds=self.clock() - start)
+
+        for day in merges:
+            start = self.clock()
+            added = self._merge(collection, day, batch.days[day])
+            inserted += added
+            self.stats.add(upserted=len(batch.days[day]['date']), upsert_seconds=self.clock() - start)
+
+        self._record(batch.code, batch.dates, inserted, fields, defer)
+        return inserted
+
+    @staticmethod
+    def _merge(collection, day, cols):
+        """기존 bucket 과 합쳐서 다시 저장 (같은 시각은 새 분봉으로). :return: 새로 추가된 분봉 수"""
+        new = bucket_document(day, cols)
+        old = collection.find_one({'date': day}, {'_id': False})
+        if old is None:
+            collection.replace_one({'date': day}, new, upsert=True)
+            return new['n']
+        rows = {}
+        for doc in (old, new):
+            names = [col for col in doc if col not in ('date', 'n', 'time')]
+            for i, hhmm in enumerate(doc['time']):
+                rows[hhmm] = {col: doc[col][i] for col in names}
+        times = sorted(rows)
+        merged = {'date': day, 'n': len(times), 'time': times}
+        for col in new:
+            if col not in ('date', 'n', 'time'):
+                merged[col] = [rows[hhmm].get(col) for hhmm in times]
+        collection.replace_one({'date': day}, merged, upsert=True)
+        return merged['n'] - old['n']
+
+
+# 한 종목의 time-series 저장 묶음
+class TimeSeriesBatch(NamedTuple):
+    code: str
+    dates: np.ndarray
+    inserts: list  # watermark 이후의 새 bar 문서
+    replaces: list  # watermark 이전과 겹쳐서 지우고 다시 넣는 bar 문서
+    new: bool
+
+
+class TimeSeriesBarStore(BarStore):
+    """
+    frequency 별 time-series 컬렉션 하나({db_name}.bars)에 모든 종목의 bar 를 저장한다. (MongoDB 5.0 이상)
+    {'ts': datetime, 'code': 'A005930', 'date': 20240809, 'open': ..., ...}
+    code 가 metaField 라서 종목 수만큼 컬렉션과 인덱스가 생기지 않고, 여러 종목을 한 번에 조회할 수 있다.
+    time-series 컬렉션은 unique 인덱스를 만들 수 없으므로 watermark 이후의 bar 는 insert,
+    겹치는 bar 는 지우고 다시 insert 한다. (date 조건의 delete/update 는 MongoDB 7.0 이상)
+    """
+    def __init__(self, db_handler, frequency, watermarks=None, clock=time.perf_counter, snapshots=None):
+        """
+        :param frequency: 'sp_1min' 또는 'sp_day'
+        """
+        super().__init__(db_handler, TIMESERIES_DBS[frequency], watermarks, clock, snapshots)
+        self.frequency = frequency
+
+    def collection(self, code=None):
+        return self.db_handler._client[self.db_name][TIMESERIES_COLLECTION]
+
+    def day_filter(self, date):
+        return date if self.frequency == 'sp_day' else super().day_filter(date)
+
+    def delete_day(self, date, codes=None):
+        """모든 종목이 한 컬렉션에 있으므로 한 번에 지운다"""
+        condition = {'date': self.day_filter(date)}
+        if codes is not None:
+            condition['code'] = {'$in': list(codes)}
+        deleted_codes = self.collection().distinct('code', condition)
+        deleted = self.collection().delete_many(condition).deleted_count
+        self._refresh(deleted_codes)
+        if codes is None and self.snapshots is not None:
+            self.snapshots.delete_day(date)
+        return deleted
+
+    def count_day(self, date, code):
+        return self.collection().count_documents({'code': code, 'date': self.day_filter(date)})
+
+    def ensure_collection(self):
+        self.db_handler.ensure_timeseries(self.db_name, TIMESERIES_COLLECTION, time_field='ts', meta_field='code',
+                                          granularity=TIMESERIES_GRANULARITY[self.frequency])
+
+    def ensure_indexes(self):
+        self.ensure_collection()
+        return self.db_handler.ensure_indexes(self.db_name)
+
+    def field_filter(self, code, date):
+        """모든 종목이 한 컬렉션에 있으므로 date 조건에 code 를 더한다"""
+        return {'code': code, 'date': date}
+
+    def update_fields(self, code, rows):
+        """이미 저장된 bar 의 항목만 채운다. :param rows: [{'date': date, 항목: 값}]"""
+        self.update_fields_many({code: rows})
+
+    def update_fields_many(self, updates):
+        """모든 종목이 한 컬렉션에 있으므로 종목을 섞어서 write_chunk 개씩 보낸다"""
+        operations = [op for code, rows in updates.items() for op in self.field_operations(code, rows)]
+        chunk = self.db_handler.profile.write_chunk
+        for i in range(0, len(operations), chunk):
+            self.collection().bulk_write(operations[i:i + chunk], ordered=False)
+        for code, rows in updates.items():
+            self._snapshot_updates(code, rows)
+
+    def documents(self, code, bars):
+        docs = bar_documents(bars)
+        for doc, ts in zip(docs, bar_datetimes(bars['date']).tolist()):
+            doc['code'] = code
+            doc['ts'] = ts
+        return docs
+
+    def prepare(self, code, bars, watermark=None):
+        """
+        :param bars: {'date': ndarray, 항목: ndarray}, 과거 -> 최신 순서 (chart_bars 결과)
+        :param watermark: 저장된 가장 최근 date (0 이면 저장된 데이터 없음). None 이면 watermarks 에서 읽는다
+        """
+        if watermark is None:
+            watermark = self.watermarks.latest(self.db_name, code, 0) if self.watermarks is not None else 0
+        docs = self.documents(code, bars)
+        split = int(np.searchsorted(bars['date'], watermark, side='right'))
+        return TimeSeriesBatch(code, bars['date'], docs[split:], docs[:split], watermark == 0)
+
+    def write(self, batch, fields=(), defer=False):
+        """
+        :return: 새로 추가된 행 수
+        """
+        if len(batch.dates) == 0:
+            return 0
+        collection = self.collection()
+        self.ensure_collection()
+        if not self.db_handler.indexes_deferred(self.db_name):
+            self.db_handler.ensure_collection_indexes(self.db_name, TIMESERIES_COLLECTION)
+
+        inserted = 0
+        if batch.replaces:
+            start = self.clock()
+            dates = [doc['date'] for doc in batch.replaces]
+            deleted = collection.delete_many({'code': batch.code, 'date': {'$in': dates}}).deleted_count
+            collection.insert_many(batch.replaces, ordered=False)
+            inserted += len(batch.replaces) - deleted
+            self.stats.add(upserted=len(batch.replaces), upsert_seconds=self.clock() - start)
+
+        inserted += self.insert(batch.inserts)
+        self._record(batch.code, batch.dates, inserted, fields, defer)
+        if self.snapshots is not None:
+            self.snapshots.record(batch.code, batch.replaces + batch.inserts)
+        return inserted
+
+    def insert(self, docs):
+        """문서를 write_chunk 단위로 insert. :return: 추가된 행 수"""
+        collection = self.collection()
+        chunk = self.db_handler.profile.write_chunk
+        for i in range(0, len(docs), chunk):
+            start = self.clock()
+            collection.insert_many(docs[i:i + chunk], ordered=False)
+            self.stats.add(inserted=len(docs[i:i + chunk]), insert_seconds=self.clock() - start)
+        return len(docs)
+
+
+# 한 종목의 파티션별 저장 묶음
+class PartitionBatch(NamedTuple):
+    code: str
+    dates: np.ndarray
+    parts: list  # [(파티션 DB 이름, BarBatch), ...]
+    new: bool
+
+
+class PartitionedBarStore(BarStore):
+    """
+    분봉을 기간별 DB({prefix}{YYYY} 또는 {prefix}{YYYYMM})의 종목별 컬렉션에 나누어 저장한다.
+    조회는 기간이 겹치는 파티션만 읽고, 오래된 데이터 정리는 파티션 DB 를 통째로 지우고,
+    하루치 삭제는 그 날이 들어 있는 파티션만 조회한다. watermark 는 prefix 이름으로 종목마다 하나
+    """
+    def __init__(self, db_handler, period='year', prefix=MINUTE_PARTITION_PREFIX, watermarks=None,
+                 clock=time.perf_counter):
+        """
+        :param period: 'year' 또는 'month'
+        """
+        super().__init__(db_handler, prefix, watermarks, clock)
+        self.period = period
+        self.scale = 10 ** (12 - PARTITION_DIGITS[period])  # 분봉 date // scale = 파티션 번호
+        self._stores = {}  # 파티션 DB 이름 -> TickerBarStore
+        self._lock = threading.Lock()
+        self._bulk = None  # bulk_load 중이면 ExitStack
+        self._bulk_names = set()
+
+    def partition_name(self, key):
+        return self.db_name + str(key)
+
+    def partitions(self, start=0, end=None):
+        """start ~ end(분봉 date, 포함) 와 겹치는 파티션 DB 목록"""
+        names = partition_names(self.db_handler, self.db_name)
+        return [name for name in names
+                if partition_range(name, self.db_name)[1] >= start
+                and (end is None or partition_range(name, self.db_name)[0] <= end)]
+
+    def _store(self, name):
+        with self._lock:
+            store = self._stores.get(name)
+            if store is None:
+                store = self._stores[name] = TickerBarStore(self.db_handler, name, clock=self.clock)
+                store.stats = self.stats
+            return store
+
+    def _open(self, name):
+        """저장할 파티션. bulk_load 중에 새로 생긴 파티션도 인덱스를 나중에 만든다"""
+        store = self._store(name)
+        with self._lock:
+            if self._bulk is not None and name not in self._bulk_names:
+                self._bulk.enter_context(self.db_handler.bulk_load(name))
+                self._bulk_names.add(name)
+        return store
+
+    def collection(self, code):
+        raise TypeError("파티션 저장은 종목 컬렉션이 파티션마다 있습니다 (partitions() 참고)")
+
+    def ensure_indexes(self):
+        return sum(self.db_handler.ensure_indexes(name) for name in self.partitions())
+
+    def load_index_snapshot(self):
+        for name in self.partitions():
+            self.db_handler.load_index_snapshot(name)
+
+    @contextmanager
+    def bulk_load(self):
+        with ExitStack() as stack:
+            with self._lock:
+                for name in self.partitions():
+                    stack.enter_context(self.db_handler.bulk_load(name))
+                    self._bulk_names.add(name)
+                self._bulk = stack
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._bulk = None
+                    self._bulk_names.clear()
+
+    def prepare(self, code, bars, watermark=None):
+        """
+        :param bars: {'date': YYYYMMDDHHMM ndarray, 항목: ndarray}, 과거 -> 최신 순서
+        :param watermark: 모든 파티션에서 가장 최근 분봉 date (0 이면 저장된 데이터 없음). None 이면 watermarks 에서 읽는다
+        """
+        if watermark is None:
+            watermark = self.watermarks.latest(self.db_name, code, 0) if self.watermarks is not None else 0
+        parts = []
+        for key, cols in split_periods(bars, self.scale):
+            name = self.partition_name(key)
+            batch = self._store(name).prepare(code, cols, watermark)
+            # watermark 보다 나중 파티션은 컬렉션이 새로 생긴다
+            parts.append((name, batch._replace(new=watermark == 0 or key > watermark // self.scale)))
+        return PartitionBatch(code, bars['date'], parts, watermark == 0)
+
+    def write(self, batch, fields=(), defer=False):
+        """
+        :return: 새로 추가된 행 수
+        """
+        inserted = sum(self._open(name).write(part) for name, part in batch.parts)
+        self._record(batch.code, batch.dates, inserted, fields, defer)
+        return inserted
+
+    def load(self, code, start=0, end=None, columns=('open', 'high', 'low', 'close', 'volume', 'value')):
+        """
+        start ~ end(분봉 date, 포함) 가 들어 있는 파티션만 읽는다 (MongoDBHandler.load_bars 참고)
+        :return: {'date': int64 ndarray, 'datetime': datetime64[ms] ndarray, 항목: ndarray}, 과거 -> 최신 순서
+        """
+        return self.db_handler.load_bars(code, start, end, self.db_name, columns)
+
+    def delete_day(self, date, codes=None):
+        """그 날이 들어 있는 파티션의 종목 컬렉션만 조회한다"""
+        deleted = {}
+        for name in self.partitions(date * 10000, date * 10000 + 9999):
+            store = self._store(name)
+            for code in (store.codes() if codes is None else codes):
+                deleted[code] = deleted.get(code, 0) + store._delete_day(code, date)
+        self._refresh([code for code, count in deleted.items() if count])
+        return sum(deleted.values())
+
+    def count_day(self, date, code):
+        return sum(self._store(name).count_day(date, code)
+                   for name in self.partitions(date * 10000, date * 10000 + 9999))
+
+    def drop_before(self, date):
+        """
+        date(YYYYMMDD) 이전에 끝나는 파티션 DB 를 통째로 지운다 (보관 기간 정리)
+        :return: 지운 파티션 DB 목록
+        """
+        dropped = [name for name in partition_names(self.db_handler, self.db_name)
+                   if partition_range(name, self.db_name)[1] < date * 10000]
+        codes = set()
+        for name in dropped:
+            codes.update(self.db_handler.list_collections(name))
+            self.db_handler.drop_database(name)
+            with self._lock:
+                self._stores.pop(name, None)
+        self._refresh(sorted(codes))
+        return dropped
+
+
+def open_bar_store(db_handler, frequency, layout='document', watermarks=None, partition='year', snapshots=None):
+    """
+    저장 방식에 맞는 store
+    :param frequency: 'sp_1min' 또는 'sp_day'
+    :param layout: 'document' (종목별 컬렉션에 bar 1개 = 문서 1개), 'bucket' (분봉만, 종목/날짜별 한 문서),
+                   'timeseries' (frequency 별 time-series 컬렉션 하나), 'partition' (분봉만, 기간별 DB)
+    :param partition: 'partition' 저장의 기간 ('year' 또는 'month')
+    :param snapshots: 일봉을 저장할 때 같이 갱신할 DailySnapshotStore
+    """
+    if layout == 'document':
+        return TickerBarStore(db_handler, frequency, watermarks, snapshots=snapshots)
+    if layout == 'bucket' and frequency == 'sp_1min':
+        return BucketBarStore(db_handler, watermarks=watermarks)
+    if layout == 'timeseries':
+        return TimeSeriesBarStore(db_handler, frequency, watermarks, snapshots=snapshots)
+    if layout == 'partition' and frequency == 'sp_1min':
+        return PartitionedBarStore(db_handler, partition, watermarks=watermarks)
+    raise ValueError("{} 는 {} 저장 방식을 지원하지 않습니다".format(frequency, layout))
@@ -0,0 +1,99 @@
+# coding=utf-8
+"""
+sp_1min (분봉 1개 = 문서 1개) 을 sp_1min_bucket (종목/날짜 1개 = 문서 1개) 으로 옮기고 저장 공간을 비교한다.
+이미 옮긴 종목은 watermark 이후부터 이어서 옮긴다.
+
+python -m util.bucketMigration [--codes A005930 A000660] [--chunk 50000]
+python -m util.bucketMigration --report
+"""
+import argparse
+
+import tqdm
+
+from util.barLayout import MINUTE_BUCKET_DB
+from util.barStore import BucketBarStore, documents_to_bars
+
+SOURCE_DB = 'sp_1min'
+MINUTE_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'value')
+
+
+def to_bars(rows, code):
+    """문서 목록 -> {'date': ndarray, 항목: ndarray}"""
+    return documents_to_bars(rows, MINUTE_COLUMNS, code)
+
+
+def read_chunks(collection, code, chunk, after=0):
+    """after 이후의 분봉을 date 순서로 chunk 행씩 읽는다"""
+    cursor = collection.find({'date': {'$gt': after}}, {'_id': False}).sort('date', 1).batch_size(chunk)
+    rows = []
+    for doc in cursor:
+        rows.append(doc)
+        if len(rows) == chunk:
+            yield to_bars(rows, code)
+            rows = []
+    if rows:
+        yield to_bars(rows, code)
+
+
+def migrate_code(db_handler, store, code, chunk=50000):
+    """
+    한 종목을 옮긴다. store 의 watermark 이후의 분봉만 읽는다.
+    :return: 옮긴 분봉 수
+    """
+    after = store.watermarks.latest(store.db_name, code, 0) if store.watermarks is not None else 0
+    moved = 0
+    for bars in read_chunks(db_handler._client[SOURCE_DB][code], code, chunk, after):
+        # chunk 경계에서 나뉜 날은 마지막 bucket 에 이어붙인다 (prepare 가 watermark 로 판단)
+        store.write(store.prepare(code, bars))
+        moved += len(bars['date'])
+    return moved
+
+
+def storage_report(db_handler, db_names=(SOURCE_DB, MINUTE_BUCKET_DB)):
+    """
+    DB 별 문서 수와 저장 공간 (dbStats)
+    :return: 출력할 문자열 목록. 첫 번째 DB 대비 절감 비율을 함께 표시
+    """
+    stats = [db_handler._client[db_name].command('dbStats') for db_name in db_names]
+    lines = ["{:<16} {:>14} {:>12} {:>12} {:>12}".format('db', 'objects', 'data(MB)', 'storage(MB)', 'index(MB)')]
+    for db_name, stat in zip(db_names, stats):
+        lines.append("{:<16} {:>14} {:>12.1f} {:>12.1f} {:>12.1f}".format(
+            db_name, stat['objects'], stat['dataSize'] / 2 ** 20, stat['storageSize'] / 2 ** 20,
+            stat['indexSize'] / 2 ** 20))
+    base = stats[0]
+    for db_name, stat in zip(db_names[1:], stats[1:]):
+        saving = {key: 1 - stat[key] / base[key] if base[key] else 0.0 for key in ('storageSize', 'indexSize')}
+        lines.append("{}: storage {:.1%} 절감, index {:.1%} 절감".format(
+            db_name, saving['storageSize'], saving['indexSize']))
+    return lines
+
+
+if __name__ == "__main__":
+    from util.MongoDBHandler import MongoDBHandler
+    from util.watermark import WatermarkStore
+
+    parser = argparse.ArgumentParser(description='sp_1min -> sp_1min_bucket 변환')
+    parser.add_argument('--codes', nargs='*', help='옮길 종목코드 (기본: sp_1min 전체)')
+    parser.add_argument('--chunk', type=int, default=50000, help='한 번에 읽을 분봉 수')
+    parser.add_argument('--profile', choices=['safe', 'bulk'], default='bulk', help='MongoDB 연결 설정')
+    parser.add_argument('--report', action='store_true', help='옮기지 않고 저장 공간만 비교')
+    args = parser.parse_args()
+
+    handler = MongoDBHandler(args.profile)
+    if not args.report:
+        watermarks = WatermarkStore(handler)
+        watermarks.ensure_index()
+        watermarks.load()
+        store = BucketBarStore(handler, watermarks=watermarks)
+        codes = args.codes or sorted(handler.list_collections(SOURCE_DB))
+        progress = tqdm.tqdm(codes, ncols=100)
+        total = 0
+        with handler.bulk_load(MINUTE_BUCKET_DB):  # bulk 설정이면 인덱스는 다 옮긴 뒤에 만든다
+            for code in progress:
+                progress.set_description(code)
+                total += migrate_code(handler, store, code, args.chunk)
+        print("분봉 {}개 이동".format(total))
+        for line in store.stats.report():
+            print(line)
+    for line in storage_report(handler):
+        print(line)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+
+
+def chart_to_frame(result, columns, from_date=0):
+    """
+    ChartResult 를 DB 에 저장할 DataFrame 으로 변환
+    :param result: CpStockChart 요청 결과 (최신 -> 과거 순서)
+    :param columns: date 외에 저장할 항목
+    :param from_date: DB 에 이미 저장된 가장 최근 날짜. 이 날짜 이후의 데이터만 남긴다.
+    :return: date 컬럼을 가진 과거 -> 최신 순서의 DataFrame
+    """
+    df = pd.DataFrame({col: result.columns[col] for col in columns}, columns=columns, index=result.columns['date'])
+    if from_date != 0:
+        df = df[df.index > from_date]
+    df = df.iloc[::-1]
+    df.reset_index(inplace=True)
+    df.rename(columns={'index': 'date'}, inplace=True)
+
+    # 'date' 열을 기준으로 중복된 데이터 제거
+    df.drop_duplicates(subset='date', keep='last', inplace=True)
+    return df
+
+
+def chart_bars(result, columns, from_date=0):
+    """
+    ChartResult 를 DataFrame 을 거치지 않고 DB 에 저장할 컬럼 배열로 변환
+    :param result: CpStockChart 요청 결과 (최신 -> 과거 순서)
+    :param columns: date 외에 저장할 항목
+    :param from_date: DB 에 이미 저장된 가장 최근 날짜. 이 날짜 이후의 데이터만 남긴다.
+    :return: {'date': ndarray, 항목: ndarray}, 과거 -> 최신 순서 (dtype 은 ChartResult 그대로)
+    """
+    dates = result.columns['date'][::-1]
+    keep = slice(None)
+    if from_date != 0:
+        keep = dates > from_date
+    bars = {'date': dates[keep]}
+    for col in columns:
+        bars[col] = result.columns[col][::-1][keep]
+
+    # date 가 중복된 경우 나중 행을 남김
+    dates = bars['date']
+    if len(dates) > 1 and (np.diff(dates) <= 0).any():
+        _, first = np.unique(dates[::-1], return_index=True)
+        rows = len(dates) - 1 - first
+        bars = {col: arr[rows] for col, arr in bars.items()}
+    return bars
+
+
+def bar_documents(bars):
+    """
+    저장할 문서 목록
+    :param bars: chart_bars 결과 ({항목: ndarray}) 또는 date 컬럼을 가진 DataFrame
+    """
+    if isinstance(bars, pd.DataFrame):
+        bars = {col: bars[col].values for col in bars.columns}
+    names = list(bars)
+    # 컬럼별 tolist() 로 한 번에 python 값으로 바꾼 뒤 행으로 묶는다
+    return [dict(zip(names, row)) for row in zip(*[bars[col].tolist() for col in names])]
+
+
+def bar_datetimes(dates):
+    """
+    date 배열 -> datetime64[ms] 배열 (문자열 변환 없이 계산)
+    :param dates: YYYYMMDD 또는 YYYYMMDDHHMM 정수 배열. 시각은 한국 시간 그대로 (timezone 없음)
+    """
+    dates = np.asarray(dates, dtype=np.int64)
+    if len(dates) and dates[0] >= 10 ** 11:  # YYYYMMDDHHMM
+        days, hhmm = np.divmod(dates, 10000)
+        minutes = (hhmm // 100) * 60 + hhmm % 100
+    else:
+        days, minutes = dates, 0
+    year, month_day = np.divmod(days, 10000)
+    month, day = np.divmod(month_day, 100)
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    result = months.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')
+    return result.astype('datetime64[ms]') + np.asarray(minutes, dtype=np.int64).astype('timedelta64[m]')
+
+
+def upsert_operation(doc):
+    return UpdateOne({'date': doc['date']}, {'$set': doc}, upsert=True)
+
+
+def price_upserts(bars):
+    """
+    date 기준 upsert 연산 목록
+    :param bars: chart_bars 결과 ({항목: ndarray}) 또는 date 컬럼을 가진 DataFrame
+    """
+    return [upsert_operation(doc) for doc in bar_documents(bars)]
@@ -0,0 +1,83 @@
+# coding=utf-8
+from typing import NamedTuple
+
+from pymongo import InsertOne, UpdateMany, UpdateOne
+
+MASTER_FIELDS = ('stock_name', 'market_kind', 'stock_status')
+# 수집 완료 날짜 항목. 새로 추가되는 종목만 None 으로 만든다
+UPDATE_FLAGS = ('sp_1min', 'sp_day', 'sp_week', 'sp_month')
+
+
+class MasterDiff(NamedTuple):
+    operations: list
+    added: list
+    changed: list
+    unchanged: list
+    orphaned: list
+
+    def counts(self):
+        return {'added': len(self.added), 'changed': len(self.changed),
+                'unchanged': len(self.unchanged), 'orphaned': len(self.orphaned)}
+
+
+def diff_code_master(existing, server_rows, local_codes, date):
+    """
+    sp_all_code_name 과 서버 종목 목록을 비교해서 바뀐 종목만 쓰는 연산을 만든다
+    :param existing: sp_all_code_name 문서 목록 (stock_code, date, MASTER_FIELDS)
+    :param server_rows: (stock_code, stock_name, market_kind, stock_status) 목록
+    :param local_codes: 가격 DB 에 컬렉션이 있는 종목코드 (서버와 마스터에 모두 없으면 '없음' 으로 추가)
+    :param date: 갱신 날짜 (YYYYMMDD)
+    :return: MasterDiff
+    """
+    master = {doc['stock_code']: doc for doc in existing}
+    operations, added, changed, unchanged = [], [], [], []
+    stale = []  # 내용은 같지만 date 가 지난 종목
+    for code, name, kind, status in server_rows:
+        fields = dict(zip(MASTER_FIELDS, (name, int(kind), int(status))))
+        doc = master.get(code)
+        if doc is None:
+            added.append(code)
+            operations.append(InsertOne(dict(fields, stock_code=code, date=date, **dict.fromkeys(UPDATE_FLAGS))))
+        elif any(doc.get(key) != value for key, value in fields.items()):
+            changed.append(code)
+            operations.append(UpdateOne({'stock_code': code}, {'$set': dict(fields, date=date)}))
+        else:
+            unchanged.append(code)
+            if doc.get('date') != date:
+                stale.append(code)
+    if stale:
+        operations.append(UpdateMany({'stock_code': {'$in': stale}}, {'$set': {'date': date}}))
+
+    known = master.keys() | set(added)
+    orphaned = sorted(code for code in local_codes if code not in known)
+    for code in orphaned:
+        operations.append(InsertOne({'stock_code': code, 'stock_name': '없음', 'market_kind': 0, 'stock_status': 2,
+                                     'date': date, **dict.fromkeys(UPDATE_FLAGS)}))
+    return MasterDiff(operations, added, changed, unchanged, orphaned)
+
+
+def outtime_worklist(codes, master_docs, watermarks, db_name, exclude=('U001', 'U201')):
+    """
+    시간외 단일가(diff_rate)를 받아야 할 종목 목록. 종목 마스터와 watermark 만 보고 정한다 (종목별 DB 조회 없음)
+    :param codes: 일봉이 저장된 종목코드
+    :param master_docs: sp_all_code_name 문서 목록 (stock_code, stock_name, stock_status)
+    :param watermarks: 메모리에 읽어 둔 WatermarkStore
+    :param db_name: 일봉 store 의 db_name
+    :param exclude: 받지 않는 종목 (지수)
+    :return: [{'종목코드', '종목명', 'from_date'}, ...]. from_date 이후의 diff_rate 를 받는다
+    """
+    master = {doc['stock_code']: doc for doc in master_docs}
+    worklist = []
+    for code in codes:
+        doc = master.get(code, {})
+        if code in exclude or doc.get('stock_status', 0) != 0:
+            continue
+        latest = watermarks.latest(db_name, code)
+        if latest is None:
+            continue
+        diff_rate_date = watermarks.field_date(db_name, code, 'diff_rate')
+        if diff_rate_date and diff_rate_date >= latest:
+            continue
+        worklist.append({'종목코드': code, '종목명': doc.get('stock_name'),
+                         'from_date': diff_rate_date or watermarks.earliest(db_name, code)})
+    return worklist
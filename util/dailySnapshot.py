@@ -0,0 +1,148 @@
+# coding=utf-8
+"""
+sp_day 를 날짜 기준으로 모아 둔 snapshot (sp_snapshot.sp_day). 거래일마다 한 문서에 모든 종목의 일봉을 담는다.
+{'date': 20240809, 'bars': {'A005930': {'open': ..., 'close': ..., 'marketC': ..., 'diff_rate': ...}, ...}}
+
+"특정 날짜의 전 종목 종가" 같은 조회를 종목 수만큼이 아니라 한 번의 조회로 한다.
+sp_day store 가 저장/갱신/삭제할 때마다 같이 갱신하고, 이미 쌓인 데이터는 --rebuild 로 만든다.
+
+python -m util.dailySnapshot --rebuild [--start 20200101] [--end 20241231]
+python -m util.dailySnapshot --date 20240809
+"""
+import argparse
+import threading
+
+import pandas as pd
+from pymongo import UpdateOne
+
+SNAPSHOT_DB = 'sp_snapshot'
+SNAPSHOT_COLLECTION = 'sp_day'
+DAY_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'value', 'marketC', 'diff_rate')
+
+
+class DailySnapshotStore:
+    """
+    종목별로 들어오는 변경을 날짜별로 모아 두었다가 날짜마다 UpdateOne 하나($set bars.{종목코드}.{항목})로 저장한다.
+    수집기는 마지막에 flush() 를 호출해야 한다. 모아 둔 값이 flush_size 를 넘으면 저장 중에도 flush 한다.
+    """
+    def __init__(self, db_handler, flush_size=200000):
+        self.db_handler = db_handler
+        self.flush_size = flush_size
+        self._pending = {}  # date -> {'bars.{code}.{field}': value}
+        self._pending_size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        return self.db_handler._client[SNAPSHOT_DB][SNAPSHOT_COLLECTION]
+
+    def ensure_index(self):
+        self.collection.create_index([('date', 1)], unique=True, name='date_1')
+
+    def record(self, code, docs):
+        """
+        일봉 문서(또는 일부 항목만 있는 문서) 목록을 반영한다
+        :param docs: [{'date': YYYYMMDD, 항목: 값}, ...]
+        """
+        with self._lock:
+            for doc in docs:
+                values = self._pending.setdefault(doc['date'], {})
+                for field, value in doc.items():
+                    if field in DAY_FIELDS:
+                        values['bars.{}.{}'.format(code, field)] = value
+                        self._pending_size += 1
+            full = self._pending_size >= self.flush_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        모아 둔 변경을 저장
+        :return: 갱신한 날짜 수
+        """
+        with self._lock:
+            pending, self._pending, self._pending_size = self._pending, {}, 0
+        if not pending:
+            return 0
+        operations = [UpdateOne({'date': date}, {'$set': values}, upsert=True) for date, values in pending.items()]
+        self.collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def delete_day(self, date):
+        with self._lock:
+            self._pending_size -= len(self._pending.pop(date, {}))
+        self.collection.delete_one({'date': date})
+
+    def dates(self, start=0, end=None):
+        """snapshot 이 있는 날짜 목록"""
+        condition = {'$gte': start} if end is None else {'$gte': start, '$lte': end}
+        return [doc['date'] for doc in self.collection.find({'date': condition}, {'date': 1, '_id': 0}).sort('date', 1)]
+
+    def frame(self, date, fields=DAY_FIELDS, codes=None):
+        """
+        한 날짜의 (종목 x 항목) DataFrame. 문서 하나만 읽는다
+        :param codes: 지정하면 이 종목들만 (없는 종목은 NaN 행)
+        :return: 종목코드 index, 값이 없는 칸은 NaN (지수는 가격이 실수라서 항목 dtype 은 값에 따라 정해진다).
+                 저장된 snapshot 이 없으면 빈 DataFrame
+        """
+        doc = self.collection.find_one({'date': date}, {'bars': 1, '_id': 0}) or {'bars': {}}
+        df = pd.DataFrame.from_dict(doc['bars'], orient='index', columns=list(fields))
+        if codes is not None:
+            df = df.reindex(list(codes))
+        df.index.name = 'code'
+        df.sort_index(inplace=True)
+        return df
+
+    def rebuild(self, store, start=0, end=None, window=250, progress=None):
+        """
+        sp_day store 에 저장된 일봉으로 snapshot 을 다시 만든다. window 거래일씩 모든 종목을 읽어서 날짜별로 저장
+        :param store: sp_day 의 BarStore (TickerBarStore 또는 TimeSeriesBarStore)
+        :param progress: 구간마다 호출할 함수 progress(구간 첫 날짜, 구간 마지막 날짜)
+        :return: 만든 snapshot 수
+        """
+        codes = store.codes()
+        projection = dict.fromkeys(('date',) + DAY_FIELDS, 1)
+        projection['_id'] = 0
+        # 구간 경계는 KOSPI 지수(U001)의 거래일로 정한다
+        trading_days = []
+        if 'U001' in codes:
+            trading_days = self.db_handler.load_bars('U001', start, end, store.db_name, ())['date'].tolist()
+        bounds = trading_days[::window][1:]  # 다음 구간의 첫 날짜
+        windows = zip([start] + bounds, [bound - 1 for bound in bounds] + [end if end is not None else 99991231])
+        count = 0
+        for lo, hi in windows:
+            days = {}
+            for code in codes:
+                # 값이 없는 항목(marketC, diff_rate)을 0 으로 채우지 않도록 문서 그대로 읽는다
+                for collection, condition in self.db_handler.bar_sources(code, lo, hi, store.db_name):
+                    for doc in collection.find(dict(condition, date={'$gte': lo, '$lte': hi}), projection):
+                        days.setdefault(doc.pop('date'), {})[code] = doc
+            for date, bars in days.items():
+                self.collection.replace_one({'date': date}, {'date': date, 'bars': bars}, upsert=True)
+            count += len(days)
+            if progress:
+                progress(lo, hi)
+        return count
+
+
+if __name__ == "__main__":
+    from util.MongoDBHandler import MongoDBHandler
+    from util.barStore import open_bar_store
+
+    parser = argparse.ArgumentParser(description='sp_day 날짜별 snapshot (sp_snapshot.sp_day)')
+    parser.add_argument('--rebuild', action='store_true', help='저장된 일봉으로 snapshot 을 다시 만든다')
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--end', type=int, default=None)
+    parser.add_argument('--day-layout', choices=['document', 'timeseries'], default='document', help='일봉 저장 방식')
+    parser.add_argument('--date', type=int, help='이 날짜의 snapshot 출력')
+    args = parser.parse_args()
+
+    handler = MongoDBHandler()
+    snapshots = DailySnapshotStore(handler)
+    snapshots.ensure_index()
+    if args.rebuild:
+        store = open_bar_store(handler, 'sp_day', args.day_layout)
+        count = snapshots.rebuild(store, args.start, args.end, progress=lambda lo, hi: print("{} ~ {}".format(lo, hi)))
+        print("snapshot {}일 생성".format(count))
+    if args.date:
+        print(snapshots.frame(args.date))
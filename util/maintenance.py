@@ -0,0 +1,210 @@
+# coding=utf-8
+"""
+모든 종목 컬렉션에 같은 작업을 하는 관리 작업 (특정 날짜 삭제, 항목 삭제 등)을 여러 스레드로 나누어 실행한다.
+종목마다 끝나면 sp_common.sp_maintenance 에 기록하므로 중단된 뒤 같은 작업을 다시 실행하면 끝난 종목은 건너뛴다.
+작업이 모두 끝나면 기록을 지운다. --dry-run 은 바뀔 문서 수만 센다.
+
+python -m util.maintenance --delete-day 20240808 --db sp_day [--dry-run]
+python -m util.maintenance --unset diff_rate --db sp_day [--start 20240516] [--dry-run]   # 시간외 단일가 다시 받기
+"""
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple
+
+from util.barStore import stored_codes
+from util.watermark import FIELD_KEYS
+
+MAINTENANCE_COLLECTION = 'sp_maintenance'  # sp_common 에 {'job': 작업 이름, 'unit': 종목코드, 'count': 바뀐 문서 수}
+
+
+class MaintenanceJob:
+    """
+    종목(unit)마다 실행하는 관리 작업. name 은 작업 내용(대상, 날짜 등)까지 포함해야 한다 (중단 후 이어서 실행하는 key)
+    """
+    name = ''
+
+    def units(self):
+        """작업할 종목코드 목록"""
+        raise NotImplementedError
+
+    def count(self, unit):
+        """바뀔 문서 수 (dry run)"""
+        raise NotImplementedError
+
+    def apply(self, unit):
+        """:return: 바뀐 문서 수"""
+        raise NotImplementedError
+
+    def finish(self):
+        """모든 종목이 끝난 뒤 한 번"""
+
+
+class DeleteDay(MaintenanceJob):
+    """하루치 bar 를 모든 종목에서 지운다 (잘못 받은 날을 다시 받을 때). 종목마다 store.delete_day 로 지운다"""
+    def __init__(self, store, date):
+        """
+        :param store: 지울 bar 의 store (저장 방식에 맞게 조회)
+        :param date: YYYYMMDD
+        """
+        self.store = store
+        self.date = date
+        self.name = 'delete_day {} {}'.format(store.db_name, date)
+
+    def units(self):
+        return self.store.codes()
+
+    def count(self, unit):
+        return self.store.count_day(self.date, unit)
+
+    def apply(self, unit):
+        return self.store.delete_day(self.date, codes=[unit])
+
+    def finish(self):
+        if self.store.snapshots is not None:
+            self.store.snapshots.delete_day(self.date)
+
+
+class UnsetField(MaintenanceJob):
+    """모든 종목의 bar 에서 항목 하나를 지운다 (잘못 받은 diff_rate 를 지우고 다시 받을 때 등)"""
+    def __init__(self, db_handler, db_name, field, start=0, end=None, watermarks=None):
+        """
+        :param db_name: 저장 방식의 DB 이름 (sp_day, sp_day_ts, sp_1min_p 등)
+        :param start: 이 date 이상의 bar 만 (기본: 전체)
+        :param end: 이 date 이하의 bar 만 (None 이면 끝까지)
+        :param watermarks: 지정하면 watermark 로 관리하는 항목(diff_rate, marketC)의 날짜를 다시 계산한다
+        """
+        self.db_handler = db_handler
+        self.db_name = db_name
+        self.field = field
+        self.start = start
+        self.end = end
+        self.watermarks = watermarks
+        self.name = 'unset {} {} {}~{}'.format(db_name, field, start, end or '')
+
+    def units(self):
+        return stored_codes(self.db_handler, self.db_name)
+
+    def _sources(self, unit):
+        date = {'$gte': self.start} if self.end is None else {'$gte': self.start, '$lte': self.end}
+        return [(collection, dict(condition, date=date, **{self.field: {'$exists': True}}))
+                for collection, condition in self.db_handler.bar_sources(unit, self.start, self.end, self.db_name)]
+
+    def count(self, unit):
+        return sum(collection.count_documents(condition) for collection, condition in self._sources(unit))
+
+    def apply(self, unit):
+        modified = sum(collection.update_many(condition, {'$unset': {self.field: ''}}).modified_count
+                       for collection, condition in self._sources(unit))
+        if modified and self.watermarks is not None and self.field in FIELD_KEYS:
+            self.watermarks.refresh(self.db_name, unit)
+        return modified
+
+
+class MaintenanceResult(NamedTuple):
+    name: str
+    units: int  # 대상 종목 수
+    skipped: int  # 이전 실행에서 이미 끝나서 건너뛴 종목 수
+    count: int  # 바뀐 (dry run 이면 바뀔) 문서 수
+    dry_run: bool
+
+
+class MaintenanceRunner:
+    def __init__(self, db_handler, workers=4, throttle=0.0, sleep=time.sleep):
+        """
+        :param workers: 동시에 작업할 종목 수
+        :param throttle: 스레드마다 종목 하나를 끝낸 뒤 쉬는 시간(초). 수집 중인 DB 의 부하를 줄일 때
+        """
+        self.workers = workers
+        self.throttle = throttle
+        self.sleep = sleep
+        self._checkpoints = db_handler._client['sp_common'][MAINTENANCE_COLLECTION]
+
+    def ensure_index(self):
+        self._checkpoints.create_index([('job', 1), ('unit', 1)], unique=True, name='job_1_unit_1')
+
+    def finished_units(self, job):
+        """이전 실행에서 끝난 종목"""
+        return {doc['unit'] for doc in self._checkpoints.find({'job': job.name}, {'unit': 1})}
+
+    def reset(self, job):
+        """기록을 지워서 처음부터 다시 실행하게 한다"""
+        self._checkpoints.delete_many({'job': job.name})
+
+    def _run_unit(self, job, unit, dry_run):
+        if dry_run:
+            return job.count(unit)
+        count = job.apply(unit)
+        self._checkpoints.update_one({'job': job.name, 'unit': unit}, {'$set': {'count': count}}, upsert=True)
+        if self.throttle:
+            self.sleep(self.throttle)
+        return count
+
+    def run(self, job, dry_run=False, progress=None):
+        """
+        :param dry_run: True 면 바꾸지 않고 바뀔 문서 수만 센다 (기록도 남기지 않음)
+        :param progress: 종목마다 호출할 함수 progress(unit, count)
+        :return: MaintenanceResult
+        """
+        units = job.units()
+        if not dry_run:
+            self.ensure_index()  # 종목마다 기록하고 이어서 실행할 때 job 으로 조회
+        finished = set() if dry_run else self.finished_units(job)
+        todo = [unit for unit in units if unit not in finished]
+        total = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='maintenance') as executor:
+            futures = {executor.submit(self._run_unit, job, unit, dry_run): unit for unit in todo}
+            for future in as_completed(futures):
+                count = future.result()
+                total += count
+                if progress:
+                    progress(futures[future], count)
+        if not dry_run:
+            job.finish()
+            self.reset(job)
+        return MaintenanceResult(job.name, len(units), len(units) - len(todo), total, dry_run)
+
+
+if __name__ == "__main__":
+    import tqdm
+
+    from util.MongoDBHandler import MongoDBHandler
+    from util.barStore import open_bar_store
+    from util.dailySnapshot import DailySnapshotStore
+    from util.watermark import WatermarkStore
+
+    parser = argparse.ArgumentParser(description='모든 종목 컬렉션 관리 작업 (중단하면 이어서 실행)')
+    parser.add_argument('--delete-day', type=int, help='이 날짜(YYYYMMDD)의 bar 를 모든 종목에서 삭제')
+    parser.add_argument('--unset', help='이 항목을 모든 종목의 bar 에서 삭제 (예: diff_rate)')
+    parser.add_argument('--db', choices=['sp_1min', 'sp_day'], required=True)
+    parser.add_argument('--layout', choices=['document', 'bucket', 'timeseries', 'partition'], default='document',
+                        help='저장 방식')
+    parser.add_argument('--partition', choices=['year', 'month'], default='year')
+    parser.add_argument('--start', type=int, default=0, help='--unset 대상 date 이상')
+    parser.add_argument('--end', type=int, default=None, help='--unset 대상 date 이하')
+    parser.add_argument('--dry-run', action='store_true', help='바뀔 문서 수만 센다')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--throttle', type=float, default=0.0, help='종목마다 쉬는 시간(초)')
+    parser.add_argument('--reset', action='store_true', help='이전 실행 기록을 지우고 처음부터')
+    args = parser.parse_args()
+
+    handler = MongoDBHandler()
+    watermarks = WatermarkStore(handler)
+    watermarks.load()
+    snapshots = DailySnapshotStore(handler) if args.db == 'sp_day' else None
+    store = open_bar_store(handler, args.db, args.layout, watermarks, args.partition, snapshots=snapshots)
+    if args.delete_day:
+        job = DeleteDay(store, args.delete_day)
+    elif args.unset:
+        job = UnsetField(handler, store.db_name, args.unset, args.start, args.end, watermarks)
+    else:
+        parser.error('--delete-day 또는 --unset 을 지정해야 합니다')
+
+    runner = MaintenanceRunner(handler, args.workers, args.throttle)
+    if args.reset:
+        runner.reset(job)
+    bar = tqdm.tqdm(ncols=100, desc=job.name)
+    result = runner.run(job, args.dry_run, lambda unit, count: bar.update(1))
+    bar.close()
+    print("{}: 종목 {}개 (이어서 건너뜀 {}개), 문서 {}개 {}".format(
+        result.name, result.units, result.skipped, result.count, '대상' if result.dry_run else '처리'))
@@ -0,0 +1,131 @@
+# coding=utf-8
+import asyncio
+import inspect
+import time
+
+_DONE = object()  # 단계의 입력이 끝났음을 알리는 값
+
+
+# 단계별 처리 시간 통계
+class StageStats:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0  # 처리한 항목 수
+        self.busy = 0.0  # 항목을 처리한 시간 (worker 합계, 초)
+        self.idle = 0.0  # 입력 queue 가 비어서 기다린 시간
+        self.blocked = 0.0  # 다음 단계 queue 가 가득 차서 기다린 시간 (backpressure)
+        self.max_depth = 0  # 입력 queue 의 최대 길이
+        self._depth_sum = 0
+        self._depth_samples = 0
+
+    def sample_depth(self, depth):
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_sum += depth
+        self._depth_samples += 1
+
+    @property
+    def avg_depth(self):
+        return self._depth_sum / self._depth_samples if self._depth_samples else 0.0
+
+    def __str__(self):
+        return '{}: items={} busy={:.1f}s idle={:.1f}s blocked={:.1f}s queue(avg={:.1f}, max={})'.format(
+            self.name, self.items, self.busy, self.idle, self.blocked, self.avg_depth, self.max_depth)
+
+
+# 크기가 제한된 queue 로 연결된 단계들을 동시에 실행하는 파이프라인
+class Pipeline:
+    """
+    pipeline = Pipeline(maxsize=8)
+    pipeline.add_stage('fetch', fetch)        # 요청 (rate limit)
+    pipeline.add_stage('transform', transform)
+    pipeline.add_stage('write', write)
+    await pipeline.run(codes)
+
+    각 단계의 함수는 코루틴 함수이고, 반환값이 다음 단계의 입력이 된다. None 을 반환하면 다음 단계로 넘기지 않는다.
+    async generator 함수이면 yield 한 값을 하나씩 다음 단계로 넘긴다 (한 종목을 페이지 단위로 나누어 넘기는 경우).
+    다음 단계의 queue 가 가득 차면 앞 단계는 자리가 날 때까지 기다린다.
+    """
+    def __init__(self, maxsize=8, clock=time.perf_counter):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._stages = []  # (func, StageStats)
+
+    def add_stage(self, name, func, workers=1):
+        self._stages.append((func, StageStats(name, workers)))
+        return self
+
+    @property
+    def stats(self):
+        return [stats for _, stats in self._stages]
+
+    def report(self):
+        """단계별 통계 문자열 목록"""
+        return [str(stats) for stats in self.stats]
+
+    async def run(self, items):
+        # Queue 는 실행 중인 이벤트 루프 안에서 만든다
+        queues = [asyncio.Queue(self.maxsize) for _ in self._stages]
+        remaining = [stats.workers for _, stats in self._stages]
+        tasks = [asyncio.ensure_future(self._feed(items, queues[0]))]
+        for i, (func, stats) in enumerate(self._stages):
+            for _ in range(stats.workers):
+                tasks.append(asyncio.ensure_future(self._work(i, func, stats, queues, remaining)))
+
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        return self.stats
+
+    async def _emit_all(self, output, stats, next_queue, start):
+        clock = self.clock
+        t = start
+        async for result in output:
+            t2 = clock()
+            stats.busy += t2 - t
+            t = t2
+            if next_queue is not None and result is not None:
+                await next_queue.put(result)
+                t = clock()
+                stats.blocked += t - t2
+        stats.busy += clock() - t
+        stats.items += 1
+
+    async def _feed(self, items, queue):
+        for item in items:
+            await queue.put(item)
+        for _ in range(self._stages[0][1].workers):
+            await queue.put(_DONE)
+
+    async def _work(self, i, func, stats, queues, remaining):
+        clock = self.clock
+        queue = queues[i]
+        next_queue = queues[i + 1] if i + 1 < len(queues) else None
+        while True:
+            stats.sample_depth(queue.qsize())
+            t0 = clock()
+            item = await queue.get()
+            t1 = clock()
+            stats.idle += t1 - t0
+            if item is _DONE:
+                break
+            output = func(item)
+            if inspect.isasyncgen(output):
+                await self._emit_all(output, stats, next_queue, t1)
+                continue
+            result = await output
+            t2 = clock()
+            stats.busy += t2 - t1
+            stats.items += 1
+            if next_queue is not None and result is not None:
+                await next_queue.put(result)
+                stats.blocked += clock() - t2
+
+        # 이 단계의 마지막 worker 가 끝나면 다음 단계에 끝을 알림
+        remaining[i] -= 1
+        if remaining[i] == 0 and next_queue is not None:
+            for _ in range(self._stages[i + 1][1].workers):
+                await next_queue.put(_DONE)
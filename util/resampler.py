@@ -0,0 +1,195 @@
+# coding=utf-8
+"""
+저장된 1분봉(sp_1min)과 일봉(sp_day)으로 3/5/15/60분봉과 주봉/월봉을 만든다. API 요청 없이 DB 만 읽는다.
+
+sp_3min, sp_5min, sp_15min, sp_60min : 09:00 부터 N분 구간, date 는 구간이 끝나는 시각 (1분봉과 같이 0903, 0906, ...)
+                                       15:30 동시호가 bar 는 마지막 구간에 합친다 (60분봉은 1430 다음이 1530)
+sp_week  : 월요일 ~ 일요일, date 는 그 주 월요일 (YYYYMMDD)
+sp_month : date 는 그 달 1일 (YYYYMM01)
+
+수집기는 원본을 저장한 뒤 update() 로 저장된 가장 최근 bar(아직 끝나지 않았을 수 있는 구간)부터 다시 만든다.
+처음 만들거나 원본을 고친 뒤에는 --rebuild 로 전체 기간을 다시 만든다.
+
+python -m util.resampler [--frequency sp_1min] [--codes A005930] [--rebuild] [--workers 4]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from util.barStore import open_bar_store
+from util.chartFrame import bar_datetimes
+
+# 만드는 DB -> (원본 DB, 구간: 분 또는 'week', 'month')
+RESAMPLE_TARGETS = {
+    'sp_3min': ('sp_1min', 3),
+    'sp_5min': ('sp_1min', 5),
+    'sp_15min': ('sp_1min', 15),
+    'sp_60min': ('sp_1min', 60),
+    'sp_week': ('sp_day', 'week'),
+    'sp_month': ('sp_day', 'month'),
+}
+RESAMPLE_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'value')
+SESSION_OPEN = 9 * 60  # 09:00 (분)
+SESSION_CLOSE = 15 * 60 + 30  # 15:30 (분)
+
+
+def minute_keys(dates, minutes):
+    """
+    1분봉 date(YYYYMMDDHHMM) -> N분 구간이 끝나는 시각의 date
+    """
+    days, hhmm = np.divmod(np.asarray(dates, dtype=np.int64), 10000)
+    elapsed = (hhmm // 100) * 60 + hhmm % 100 - SESSION_OPEN
+    ends = np.minimum(SESSION_OPEN - (-elapsed // minutes) * minutes, SESSION_CLOSE)
+    return days * 10000 + (ends // 60) * 100 + ends % 60
+
+
+def week_keys(dates):
+    """일봉 date(YYYYMMDD) -> 그 주 월요일의 date"""
+    days = bar_datetimes(dates).astype('datetime64[D]')
+    # 1970-01-01 은 목요일
+    mondays = days - ((days.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+    months = mondays.astype('datetime64[M]')
+    year = months.astype('datetime64[Y]').astype(np.int64) + 1970
+    month = months.astype(np.int64) % 12 + 1
+    day = (mondays - months.astype('datetime64[D]')).astype(np.int64) + 1
+    return year * 10000 + month * 100 + day
+
+
+def month_keys(dates):
+    """일봉 date(YYYYMMDD) -> 그 달 1일의 date"""
+    return np.asarray(dates, dtype=np.int64) // 100 * 100 + 1
+
+
+def period_keys(dates, period):
+    """:param period: 분(int) 또는 'week', 'month'"""
+    if period == 'week':
+        return week_keys(dates)
+    if period == 'month':
+        return month_keys(dates)
+    return minute_keys(dates, period)
+
+
+def resample(bars, keys):
+    """
+    같은 key 의 연속된 bar 를 하나로 묶는다
+    :param bars: {'date': ndarray, 항목: ndarray}, 과거 -> 최신 순서 (load_bars 결과)
+    :param keys: bar 마다 묶을 구간의 date (bars['date'] 와 같은 길이, 정렬된 순서)
+    :return: {'date': 구간 date, 항목: ndarray}. open 은 첫 값, close 는 마지막 값, high/low 는 최대/최소, 나머지는 합
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    fields = [field for field in RESAMPLE_FIELDS if field in bars]
+    if len(keys) == 0:
+        return dict({'date': keys}, **{field: bars[field][:0] for field in fields})
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    result = {'date': keys[starts]}
+    for field in fields:
+        values = bars[field]
+        if field == 'open':
+            result[field] = values[starts]
+        elif field == 'close':
+            result[field] = values[ends]
+        elif field == 'high':
+            result[field] = np.maximum.reduceat(values, starts)
+        elif field == 'low':
+            result[field] = np.minimum.reduceat(values, starts)
+        else:
+            result[field] = np.add.reduceat(values, starts)
+    return result
+
+
+class Resampler:
+    """
+    원본 store 의 종목마다 원본을 한 번 읽어서 같은 원본의 모든 대상을 만든다.
+    대상은 종목별 컬렉션(TickerBarStore)에 저장하고 watermark 로 어디까지 만들었는지 관리한다.
+    """
+    def __init__(self, db_handler, sources, watermarks, targets=tuple(RESAMPLE_TARGETS)):
+        """
+        :param sources: {'sp_1min': 분봉 store, 'sp_day': 일봉 store} (수집기와 같은 저장 방식)
+        :param targets: 만들 DB (RESAMPLE_TARGETS 의 key)
+        """
+        self.db_handler = db_handler
+        self.sources = sources
+        self.watermarks = watermarks
+        self.stores = {target: open_bar_store(db_handler, target, watermarks=watermarks) for target in targets}
+
+    def targets(self, frequency):
+        """frequency('sp_1min', 'sp_day') 로 만드는 대상"""
+        return [target for target in self.stores if RESAMPLE_TARGETS[target][0] == frequency]
+
+    def update_code(self, code, frequency, rebuild=False):
+        """
+        한 종목의 대상 bar 를 만든다
+        :param rebuild: True 면 전체 기간을 다시 만든다. False 면 대상에 저장된 가장 최근 구간부터
+        :return: 새로 추가된 행 수
+        """
+        targets = self.targets(frequency)
+        marks = {target: 0 if rebuild else self.watermarks.latest(target, code, 0) for target in targets}
+        # 가장 최근 구간이 시작하는 원본 date. 분봉은 그 날 처음부터 읽는다
+        starts = [mark // 10000 * 10000 if frequency == 'sp_1min' else mark for mark in marks.values()]
+        bars = self.db_handler.load_bars(code, min(starts, default=0), None, self.sources[frequency].db_name,
+                                         RESAMPLE_FIELDS)
+        if len(bars['date']) == 0:
+            return 0
+        written = 0
+        for target in targets:
+            store, mark = self.stores[target], marks[target]
+            resampled = resample(bars, period_keys(bars['date'], RESAMPLE_TARGETS[target][1]))
+            keep = resampled['date'] >= mark
+            resampled = {col: values[keep] for col, values in resampled.items()}
+            written += store.write(store.prepare(code, resampled, watermark=mark))
+        return written
+
+    def update(self, frequency, codes=None, rebuild=False, workers=4, progress=None):
+        """
+        :param frequency: 원본 ('sp_1min' 또는 'sp_day')
+        :param codes: 만들 종목 (기본: 원본에 저장된 전체 종목)
+        :param progress: 종목마다 호출할 함수 progress(code, rows)
+        :return: 새로 추가된 행 수
+        """
+        if not self.targets(frequency):
+            return 0
+        codes = self.sources[frequency].codes() if codes is None else codes
+        total = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='resample') as executor:
+            futures = {executor.submit(self.update_code, code, frequency, rebuild): code for code in codes}
+            for future in as_completed(futures):
+                rows = future.result()
+                total += rows
+                if progress:
+                    progress(futures[future], rows)
+        return total
+
+
+if __name__ == "__main__":
+    import tqdm
+
+    from util.MongoDBHandler import MongoDBHandler
+    from util.watermark import WatermarkStore
+
+    parser = argparse.ArgumentParser(description='1분봉/일봉으로 N분봉, 주봉, 월봉 만들기')
+    parser.add_argument('--frequency', choices=['sp_1min', 'sp_day'], action='append', help='원본 (기본: 둘 다)')
+    parser.add_argument('--codes', nargs='*', help='만들 종목코드 (기본: 원본 DB 전체)')
+    parser.add_argument('--rebuild', action='store_true', help='전체 기간을 다시 만든다')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--minute-layout', choices=['document', 'bucket', 'timeseries', 'partition'],
+                        default='document', help='원본 분봉 저장 방식')
+    parser.add_argument('--minute-partition', choices=['year', 'month'], default='year')
+    parser.add_argument('--day-layout', choices=['document', 'timeseries'], default='document', help='원본 일봉 저장 방식')
+    args = parser.parse_args()
+
+    handler = MongoDBHandler()
+    watermarks = WatermarkStore(handler)
+    watermarks.ensure_index()
+    watermarks.load()
+    resampler = Resampler(handler, {
+        'sp_1min': open_bar_store(handler, 'sp_1min', args.minute_layout, watermarks, args.minute_partition),
+        'sp_day': open_bar_store(handler, 'sp_day', args.day_layout, watermarks),
+    }, watermarks)
+    for frequency in args.frequency or ['sp_1min', 'sp_day']:
+        codes = args.codes or resampler.sources[frequency].codes()
+        bar = tqdm.tqdm(total=len(codes), ncols=100, desc=frequency)
+        total = resampler.update(frequency, codes, args.rebuild, args.workers, lambda code, rows: bar.update(1))
+        bar.close()
+        print("{}: {}행 추가".format(', '.join(resampler.targets(frequency)), total))
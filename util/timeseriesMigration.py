@@ -0,0 +1,132 @@
+# coding=utf-8
+"""
+종목별 컬렉션(sp_1min, sp_day)을 frequency 별 time-series 컬렉션(sp_1min_ts.bars, sp_day_ts.bars)으로 옮긴다.
+종목 단위로 여러 스레드에서 옮기고, 진행 상황을 sp_common.sp_migration 에 기록한다.
+중단된 뒤 다시 실행하면 끝난 종목은 건너뛰고, 옮기다 멈춘 종목은 지우고 처음부터 다시 옮긴다.
+
+python -m util.timeseriesMigration --frequency sp_day [--codes A005930 A000660] [--workers 8] [--chunk 50000]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import tqdm
+
+from util.barStore import TimeSeriesBarStore
+from util.chartFrame import bar_datetimes
+from util.watermark import FIELD_KEYS
+
+MIGRATION_COLLECTION = 'sp_migration'  # sp_common 에 {'target': db, 'code': 종목코드, 'state': 'copying'|'done'}
+
+
+class TimeSeriesMigration:
+    def __init__(self, db_handler, store, chunk=50000):
+        """
+        :param store: 옮겨 넣을 TimeSeriesBarStore (store.frequency 가 원본 DB)
+        :param chunk: 한 번에 읽어서 insert 할 문서 수
+        """
+        self.db_handler = db_handler
+        self.store = store
+        self.chunk = chunk
+        self._checkpoints = db_handler._client['sp_common'][MIGRATION_COLLECTION]
+
+    def ensure_index(self):
+        self._checkpoints.create_index([('target', 1), ('code', 1)], unique=True, name='target_1_code_1')
+
+    def states(self):
+        """{종목코드: state}"""
+        return {doc['code']: doc['state']
+                for doc in self._checkpoints.find({'target': self.store.db_name}, {'code': 1, 'state': 1})}
+
+    def _set_state(self, code, state, rows=0):
+        self._checkpoints.update_one({'target': self.store.db_name, 'code': code},
+                                     {'$set': {'state': state, 'rows': rows}}, upsert=True)
+
+    def migrate_code(self, code, state=None):
+        """
+        한 종목을 옮긴다
+        :param state: 이전 실행의 진행 상태 ('copying' 이면 옮기던 데이터를 지우고 다시)
+        :return: 옮긴 행 수
+        """
+        if state == 'done':
+            return 0
+        store, watermarks = self.store, self.store.watermarks
+        if state == 'copying':
+            # metaField 조건의 delete 라서 MongoDB 5.1 이상이면 가능
+            store.collection().delete_many({'code': code})
+            watermarks.forget(store.db_name, code)
+        self._set_state(code, 'copying')
+
+        source = self.db_handler._client[store.frequency][code]
+        cursor = source.find({}, {'_id': False}).sort('date', 1).batch_size(self.chunk)
+        rows, docs = 0, []
+        for doc in cursor:
+            docs.append(doc)
+            if len(docs) == self.chunk:
+                rows += self._copy(code, docs)
+                docs = []
+        if docs:
+            rows += self._copy(code, docs)
+        self._set_state(code, 'done', rows)
+        return rows
+
+    def _copy(self, code, docs):
+        dates = np.array([doc['date'] for doc in docs], dtype=np.int64)
+        store = self.store
+        for doc, ts in zip(docs, bar_datetimes(dates).tolist()):
+            doc['code'], doc['ts'] = code, ts
+        store.insert(docs)
+        store.watermarks.record(store.db_name, code, dates, len(docs))
+        # diff_rate, marketC 처럼 일부 행에만 있는 항목은 실제로 있는 date 까지만 기록
+        for field in FIELD_KEYS:
+            field_dates = [doc['date'] for doc in docs if field in doc]
+            if field_dates:
+                store.watermarks.record_field(store.db_name, code, field, field_dates)
+        return len(docs)
+
+    def run(self, codes, workers=4, progress=None):
+        """
+        :param codes: 옮길 종목코드 목록
+        :param progress: 종목마다 호출할 함수 progress(code, rows)
+        :return: 옮긴 행 수
+        """
+        self.ensure_index()  # 종목마다 진행 상태를 기록하고 target 으로 조회
+        states = self.states()
+        store = self.store
+        store.ensure_collection()
+        total = 0
+        with self.db_handler.bulk_load(store.db_name):  # bulk 설정이면 인덱스는 다 옮긴 뒤에 만든다
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='migration') as executor:
+                futures = {executor.submit(self.migrate_code, code, states.get(code)): code for code in codes}
+                for future in as_completed(futures):
+                    rows = future.result()
+                    total += rows
+                    if progress:
+                        progress(futures[future], rows)
+        return total
+
+
+if __name__ == "__main__":
+    from util.MongoDBHandler import MongoDBHandler
+    from util.watermark import WatermarkStore
+
+    parser = argparse.ArgumentParser(description='종목별 컬렉션 -> time-series 컬렉션 변환')
+    parser.add_argument('--frequency', choices=['sp_1min', 'sp_day'], required=True)
+    parser.add_argument('--codes', nargs='*', help='옮길 종목코드 (기본: 원본 DB 전체)')
+    parser.add_argument('--workers', type=int, default=4, help='동시에 옮길 종목 수')
+    parser.add_argument('--chunk', type=int, default=50000, help='한 번에 읽을 문서 수')
+    parser.add_argument('--profile', choices=['safe', 'bulk'], default='bulk', help='MongoDB 연결 설정')
+    args = parser.parse_args()
+
+    handler = MongoDBHandler(args.profile)
+    watermarks = WatermarkStore(handler)
+    watermarks.ensure_index()
+    watermarks.load()
+    migration = TimeSeriesMigration(handler, TimeSeriesBarStore(handler, args.frequency, watermarks), args.chunk)
+    codes = args.codes or sorted(handler.list_collections(args.frequency))
+    bar = tqdm.tqdm(total=len(codes), ncols=100)
+    total = migration.run(codes, args.workers, lambda code, rows: bar.update(1))
+    bar.close()
+    print("{}행 이동".format(total))
+    for line in migration.store.stats.report():
+        print(line)
@@ -43,6 +43,43 @@ def cvt_dt_to_int(date_time):
     return int(date_time.strftime("%Y%m%d%H%M"))
 
 
+def next_trading_date(date):
+    # date(YYYYMMDD) 의 다음 거래일. 주말만 제외 (이외의 공휴일은 체크안함)
+    next_date = dt.datetime.strptime(str(date), "%Y%m%d") + dt.timedelta(days=1)
+    while next_date.weekday() >= 5:
+        next_date = next_date + dt.timedelta(days=1)
+    return int(next_date.strftime("%Y%m%d"))
+
+
+def gap_start_date(from_date):
+    """
+    DB 에 저장된 마지막 데이터(from_date) 이후를 기간으로 요청할 때의 시작일(YYYYMMDD)
+    :param from_date: 일봉 YYYYMMDD, 분봉 YYYYMMDDHHMM
+    """
+    if from_date > 99999999:  # 분봉
+        day, hhmm = divmod(from_date, 10000)
+        # 15:30 종가까지 받은 날은 다음 거래일부터, 아니면 그 날의 나머지부터
+        return next_trading_date(day) if hhmm >= 1530 else day
+    return next_trading_date(from_date)
+
+
+def fetch_range(watermark, latest_date, refetch=False):
+    """
+    DB 에 없는 기간만 요청할 범위
+    :param watermark: 저장된 가장 최근 date (0 이면 저장된 데이터 없음)
+    :param latest_date: 받을 마지막 날짜 (YYYYMMDD)
+    :param refetch: 실시간 수집이 중간에 끊긴 종목이면 True. 마지막 분봉이 latest_date 이어도 그 날 전체를 다시 받는다
+    :return: (from_date, start_date, end_date). start_date > end_date 면 받을 기간이 없음
+    """
+    from_date = watermark
+    start_date = gap_start_date(from_date) if from_date else 0
+    end_date = latest_date or 0
+    if refetch and from_date // 10000 == latest_date:
+        start_date = latest_date
+        from_date = latest_date * 10000
+    return from_date, start_date, end_date
+
+
 def preformat_cjk(string, width, align='<', fill=' '):
     count = (width - sum(1 + (unicodedata.east_asian_width(c) in "WF")
                          for c in string))
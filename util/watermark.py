@@ -0,0 +1,246 @@
+# coding=utf-8
+"""
+종목별 저장 현황(watermark)을 sp_common.sp_watermark 에 관리한다.
+
+{'db': 'sp_day', 'code': 'A005930', 'latest': 20240809, 'earliest': 19900103, 'count': 8500,
+ 'diff_rate_date': 20240808, 'marketC_date': 20240809}
+
+수집기는 시작할 때 한 번 읽어서 dict 로 사용하고, bulk_write 할 때마다 같이 갱신한다.
+컬렉션을 직접 조회해서 다시 만들거나 검증할 때:
+
+python -m util.watermark --rebuild [--db sp_day]
+python -m util.watermark --verify [--db sp_day]
+"""
+import argparse
+import threading
+
+from util.barLayout import (BUCKET_DBS, MINUTE_BUCKET_DB, MINUTE_PARTITION_PREFIX, PARTITION_PREFIXES, TIMESERIES_DBS,
+                            TIMESERIES_COLLECTION, partition_names)
+from util.barStore import stored_codes
+from util.resampler import RESAMPLE_TARGETS
+
+WATERMARK_COLLECTION = 'sp_watermark'
+PRICE_DBS = (('sp_1min', 'sp_day', MINUTE_BUCKET_DB, MINUTE_PARTITION_PREFIX) + tuple(TIMESERIES_DBS.values())
+             + tuple(RESAMPLE_TARGETS))
+# 값이 있는 가장 최근 date 를 따로 관리하는 항목 -> watermark key
+FIELD_KEYS = {
+    'diff_rate': 'diff_rate_date',
+    'marketC': 'marketC_date',
+}
+# FIELD_KEYS 항목이 저장되는 DB (일봉). 다른 DB 는 항목을 찾느라 인덱스 없이 전체를 읽지 않도록 조회하지 않는다
+FIELD_DBS = ('sp_day', TIMESERIES_DBS['sp_day'])
+
+
+class WatermarkStore:
+    def __init__(self, db_handler, collection_name=WATERMARK_COLLECTION):
+        self.db_handler = db_handler
+        self._collection = db_handler._client['sp_common'][collection_name]
+        self._marks = {}  # db -> {code: watermark}
+        self._lock = threading.Lock()  # 저장 단계의 여러 스레드에서 갱신
+
+    def load(self):
+        """sp_common 의 watermark 를 모두 읽어서 dict 로 보관. 읽은 종목 수 반환"""
+        marks = {}
+        for doc in self._collection.find({}, {'_id': False}):
+            marks.setdefault(doc['db'], {})[doc['code']] = doc
+        with self._lock:
+            self._marks = marks
+        return sum(len(codes) for codes in marks.values())
+
+    def get(self, db_name, code):
+        return self._marks.get(db_name, {}).get(code)
+
+    def codes(self, db_name):
+        return list(self._marks.get(db_name, {}))
+
+    def latest(self, db_name, code, default=None):
+        mark = self.get(db_name, code)
+        return mark['latest'] if mark else default
+
+    def earliest(self, db_name, code, default=None):
+        mark = self.get(db_name, code)
+        return mark['earliest'] if mark else default
+
+    def field_date(self, db_name, code, field, default=None):
+        """field('diff_rate', 'marketC') 값이 저장된 가장 최근 date"""
+        mark = self.get(db_name, code)
+        return mark.get(FIELD_KEYS[field], default) if mark else default
+
+    def _apply(self, db_name, code, max_values, min_values=None, inc=None):
+        update = {'$max': max_values}
+        if min_values:
+            update['$min'] = min_values
+        if inc is not None:
+            update['$inc'] = {'count': inc}
+        self._collection.update_one({'db': db_name, 'code': code}, update, upsert=True)
+
+        with self._lock:
+            mark = self._marks.setdefault(db_name, {}).setdefault(code, {'db': db_name, 'code': code})
+            for key, value in max_values.items():
+                mark[key] = max(mark.get(key, value), value)
+            for key, value in (min_values or {}).items():
+                mark[key] = min(mark.get(key, value), value)
+            if inc is not None:
+                mark['count'] = mark.get('count', 0) + inc
+
+    def record(self, db_name, code, dates, inserted=0, fields=()):
+        """
+        가격 데이터 bulk_write 직후 호출
+        :param dates: 저장한 행들의 date
+        :param inserted: 새로 추가된 행 수 (BulkWriteResult.upserted_count 등)
+        :param fields: 함께 저장한 항목 중 FIELD_KEYS 에 있는 항목
+        """
+        if len(dates) == 0:
+            return
+        latest, earliest = int(max(dates)), int(min(dates))
+        max_values = {'latest': latest}
+        for field in fields:
+            max_values[FIELD_KEYS[field]] = latest
+        self._apply(db_name, code, max_values, {'earliest': earliest}, inserted)
+
+    def record_field(self, db_name, code, field, dates):
+        """
+        이미 있는 행에 field 만 채운 경우 (upsert=False) 호출
+        DB 에 없는 date 는 갱신되지 않으므로 latest 이후의 date 는 무시한다.
+        """
+        if len(dates) == 0:
+            return
+        date = int(max(dates))
+        latest = self.latest(db_name, code)
+        if latest is not None:
+            date = min(date, latest)
+        self._apply(db_name, code, {FIELD_KEYS[field]: date})
+
+    def scan(self, db_name, code):
+        """컬렉션을 직접 조회해서 watermark 계산. 데이터가 없으면 None"""
+        if db_name in BUCKET_DBS:
+            return self._scan_buckets(db_name, code, self.db_handler._client[db_name][code])
+        if db_name in PARTITION_PREFIXES:
+            return self._scan_partitions(db_name, code)
+        if db_name in TIMESERIES_DBS.values():
+            # 모든 종목이 한 컬렉션에 있으므로 code 로 거른다
+            collection, match = self.db_handler._client[db_name][TIMESERIES_COLLECTION], {'code': code}
+        else:
+            collection, match = self.db_handler._client[db_name][code], {}
+        summary = list(collection.aggregate([
+            {'$match': match},
+            {'$group': {'_id': None, 'latest': {'$max': '$date'}, 'earliest': {'$min': '$date'}, 'count': {'$sum': 1}}}
+        ]))
+        if not summary or summary[0]['count'] == 0:
+            return None
+        mark = {'db': db_name, 'code': code, 'latest': summary[0]['latest'],
+                'earliest': summary[0]['earliest'], 'count': summary[0]['count']}
+        fields = FIELD_KEYS.items() if db_name in FIELD_DBS else ()
+        for field, key in fields:
+            entry = collection.find_one(dict(match, **{field: {'$exists': True}}), {'date': 1}, sort=[('date', -1)])
+            if entry:
+                mark[key] = entry['date']
+        return mark
+
+    def _scan_partitions(self, db_name, code):
+        """파티션 DB 마다 계산해서 합친다"""
+        marks = [self.scan(name, code) for name in partition_names(self.db_handler, db_name)]
+        marks = [mark for mark in marks if mark]
+        if not marks:
+            return None
+        mark = {'db': db_name, 'code': code, 'latest': max(mark['latest'] for mark in marks),
+                'earliest': min(mark['earliest'] for mark in marks), 'count': sum(mark['count'] for mark in marks)}
+        for key in FIELD_KEYS.values():
+            values = [part[key] for part in marks if key in part]
+            if values:
+                mark[key] = max(values)
+        return mark
+
+    @staticmethod
+    def _scan_buckets(db_name, code, collection):
+        """하루 한 문서(bucket) 저장: date 는 첫/마지막 bucket 의 time 으로 만들고 count 는 분봉 수"""
+        summary = list(collection.aggregate([
+            {'$group': {'_id': None, 'latest': {'$max': '$date'}, 'earliest': {'$min': '$date'}, 'count': {'$sum': '$n'}}}
+        ]))
+        if not summary or summary[0]['count'] == 0:
+            return None
+        summary = summary[0]
+        latest = collection.find_one({'date': summary['latest']}, {'time': {'$slice': -1}})
+        earliest = collection.find_one({'date': summary['earliest']}, {'time': {'$slice': 1}})
+        return {'db': db_name, 'code': code, 'count': summary['count'],
+                'latest': summary['latest'] * 10000 + latest['time'][0],
+                'earliest': summary['earliest'] * 10000 + earliest['time'][0]}
+
+    def rebuild(self, db_names=PRICE_DBS, progress=None):
+        """
+        모든 가격 컬렉션을 조회해서 watermark 를 다시 만든다
+        :param progress: 종목마다 호출할 함수 progress(db_name, code)
+        :return: 다시 만든 종목 수
+        """
+        count = 0
+        for db_name in db_names:
+            codes = stored_codes(self.db_handler, db_name)
+            self._collection.delete_many({'db': db_name, 'code': {'$nin': codes}})
+            for code in codes:
+                count += self.refresh(db_name, code) is not None
+                if progress:
+                    progress(db_name, code)
+        self.load()
+        return count
+
+    def has_price_data(self, db_names=PRICE_DBS):
+        """가격 DB 에 저장된 종목이 하나라도 있는지 (watermark 가 비어 있을 때 처음 실행인지 확인)"""
+        return any(stored_codes(self.db_handler, db_name) for db_name in db_names)
+
+    def refresh(self, db_name, code):
+        """한 종목의 watermark 를 컬렉션을 조회해서 다시 만든다 (데이터를 지운 뒤). :return: 새 watermark"""
+        mark = self.scan(db_name, code)
+        if mark is None:
+            self.forget(db_name, code)
+            return None
+        self._collection.replace_one({'db': db_name, 'code': code}, mark, upsert=True)
+        with self._lock:
+            self._marks.setdefault(db_name, {})[code] = dict(mark)
+        return mark
+
+    def verify(self, db_names=PRICE_DBS):
+        """
+        저장된 watermark 와 실제 컬렉션을 비교
+        :return: [(db, code, key, 저장된 값, 실제 값), ...]
+        """
+        self.load()
+        mismatches = []
+        for db_name in db_names:
+            codes = set(stored_codes(self.db_handler, db_name)) | set(self.codes(db_name))
+            for code in sorted(codes):
+                actual = self.scan(db_name, code) or {}
+                stored = self.get(db_name, code) or {}
+                for key in ('latest', 'earliest', 'count') + tuple(FIELD_KEYS.values()):
+                    if stored.get(key) != actual.get(key):
+                        mismatches.append((db_name, code, key, stored.get(key), actual.get(key)))
+        return mismatches
+
+    def forget(self, db_name, code):
+        """종목의 watermark 를 지운다 (데이터를 지우고 다시 저장할 때)"""
+        self._collection.delete_one({'db': db_name, 'code': code})
+        with self._lock:
+            self._marks.get(db_name, {}).pop(code, None)
+
+    def ensure_index(self):
+        self._collection.create_index([('db', 1), ('code', 1)], unique=True, name='db_1_code_1')
+
+
+if __name__ == "__main__":
+    from util.MongoDBHandler import MongoDBHandler
+
+    parser = argparse.ArgumentParser(description='sp_common.sp_watermark 재생성 / 검증')
+    parser.add_argument('--rebuild', action='store_true', help='가격 컬렉션을 조회해서 watermark 를 다시 만든다')
+    parser.add_argument('--verify', action='store_true', help='watermark 와 실제 컬렉션을 비교한다')
+    parser.add_argument('--db', choices=PRICE_DBS, action='append', help='대상 DB (기본: 전체)')
+    args = parser.parse_args()
+    db_names = tuple(args.db) if args.db else PRICE_DBS
+
+    store = WatermarkStore(MongoDBHandler())
+    store.ensure_index()
+    if args.rebuild:
+        print("watermark 재생성: {}개 종목".format(store.rebuild(db_names)))
+    if args.verify or not args.rebuild:
+        mismatches = store.verify(db_names)
+        for mismatch in mismatches:
+            print("불일치 {} {} {}: 저장={} 실제={}".format(*mismatch))
+        print("불일치 {}건".format(len(mismatches)))